@@ -189,7 +189,9 @@ Type=simple
 User=pi
 WorkingDirectory=/opt/fermentation-monitor
 Environment=PYTHONPATH=/opt/fermentation-monitor/python
-ExecStart=/usr/bin/python3 /opt/fermentation-monitor/python/main.py
+ExecStart=/usr/bin/python3 /opt/fermentation-monitor/python/main.py --mode wsgi
+KillSignal=SIGTERM
+TimeoutStopSec=45
 Restart=always
 RestartSec=10
 
@@ -0,0 +1,7 @@
+"""Analytics over stored fermentation time series."""
+
+from .decimation import decimate, lttb_indices, minmax_indices
+from .growth import GrowthFit, GrowthFitter, GrowthTracker
+
+__all__ = ['decimate', 'lttb_indices', 'minmax_indices',
+           'GrowthFit', 'GrowthFitter', 'GrowthTracker']
@@ -0,0 +1,103 @@
+"""
+Shape-preserving decimation of time series for charting.
+
+Both methods return indices into the input rather than new values, so
+several columns of the same rows can be reduced consistently. Output size
+is bounded by the requested point count however long the input is.
+"""
+
+from typing import Callable, Dict
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    Keeps the first and last point and, from each of threshold - 2 equal
+    buckets in between, the point forming the largest triangle with the
+    previously kept point and the average of the next bucket. Peaks and
+    trend changes survive; flat stretches collapse.
+
+    Args:
+        x: Increasing sample positions (timestamps)
+        y: Sample values
+        threshold: Number of points to keep
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    count = len(x)
+    if threshold >= count or threshold < 3:
+        return np.arange(count)
+
+    # Bucket boundaries for the interior points [1, count - 1)
+    edges = np.linspace(1, count - 1, threshold - 1).astype(np.int64)
+    # Bucket averages from prefix sums, all at once
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = edges[1:] - edges[:-1]
+    mean_x = (sum_x[edges[1:]] - sum_x[edges[:-1]]) / sizes
+    mean_y = (sum_y[edges[1:]] - sum_y[edges[:-1]]) / sizes
+    # The point after the last bucket is the final sample
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        low, high = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        # Twice the triangle area for every candidate in the bucket
+        area = np.abs((ax - next_x[bucket]) * (y[low:high] - ay) -
+                      (ax - x[low:high]) * (next_y[bucket] - ay))
+        previous = low + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Min/max bucketing.
+
+    Splits the series into threshold // 2 buckets and keeps the lowest and
+    highest point of each, so every spike is preserved. Fully vectorized.
+
+    Args:
+        x: Increasing sample positions (timestamps)
+        y: Sample values
+        threshold: Maximum number of points to keep
+
+    Returns:
+        Sorted indices of the kept points
+    """
+    y = np.asarray(y, dtype=np.float64)
+    count = len(y)
+    buckets = threshold // 2
+    if threshold >= count or buckets < 1:
+        return np.arange(count)
+
+    edges = np.linspace(0, count, buckets + 1).astype(np.int64)
+    bucket_of = np.repeat(np.arange(buckets), edges[1:] - edges[:-1])
+    # Sorting by (bucket, value) puts each bucket's minimum first and maximum last
+    order = np.lexsort((y, bucket_of))
+    keep = np.concatenate((order[edges[:-1]], order[edges[1:] - 1]))
+    return np.unique(keep)
+
+
+METHODS: Dict[str, Callable[[np.ndarray, np.ndarray, int], np.ndarray]] = {
+    'lttb': lttb_indices,
+    'minmax': minmax_indices,
+}
+
+
+def decimate(x: np.ndarray, y: np.ndarray, threshold: int,
+             method: str = 'lttb') -> np.ndarray:
+    """Indices of at most threshold points chosen by the named method."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown decimation method: {method}")
+    return METHODS[method](x, y, threshold)
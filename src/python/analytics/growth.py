@@ -0,0 +1,356 @@
+"""
+Incremental growth-curve fitting and peak-time prediction per session.
+
+Dough rise follows a sigmoid: lag, near-exponential rise, then a plateau at
+the peak. For a fixed capacity K both supported models become a straight
+line in a transformed value z:
+
+    logistic  y = K / (1 + exp(-r (t - tm)))   z = ln(y / (K - y))
+    gompertz  y = K exp(-exp(-r (t - tm)))     z = -ln(ln(K / y))
+
+and z = r t - r tm. A weighted line fit only needs six running sums (plus
+one for points above K, which the curve cannot reach), so each session keeps
+those sums for every K on a fixed grid. New points are
+added in O(new points x grid) and a fit is a closed-form solve per grid
+value followed by picking the K with the smallest residual; history is
+never re-read. All sessions live in one array, so updating or fitting
+hundreds of them is a handful of numpy operations.
+"""
+
+from typing import Dict, Iterable, Optional
+import math
+import threading
+import numpy as np
+
+
+class LogisticModel:
+    name = 'logistic'
+
+    @staticmethod
+    def linearize(y, capacity):
+        """Transformed values and delta-method weights.
+
+        The weight is 0 where y is outside (0, K).
+        """
+        valid = (y > 0) & (y < capacity)
+        safe_y = np.where(valid, y, 0.5 * capacity)
+        z = np.log(safe_y / (capacity - safe_y))
+        # Var(z) ~ (dz/dy)^2 Var(y) with dz/dy = K / (y (K - y))
+        weight = np.where(valid, (safe_y * (capacity - safe_y) / capacity) ** 2, 0.0)
+        return np.where(valid, z, 0.0), weight
+
+    @staticmethod
+    def value(t, capacity, rate, midpoint):
+        return capacity / (1.0 + np.exp(-rate * (t - midpoint)))
+
+    @staticmethod
+    def time_at(fraction, rate, midpoint):
+        """Time at which the curve reaches fraction of its capacity."""
+        return midpoint + math.log(fraction / (1.0 - fraction)) / rate
+
+
+class GompertzModel:
+    name = 'gompertz'
+
+    @staticmethod
+    def linearize(y, capacity):
+        valid = (y > 0) & (y < capacity)
+        safe_y = np.where(valid, y, 0.5 * capacity)
+        log_ratio = np.log(capacity / safe_y)
+        z = -np.log(log_ratio)
+        # dz/dy = 1 / (y ln(K / y))
+        weight = np.where(valid, (safe_y * log_ratio) ** 2, 0.0)
+        return np.where(valid, z, 0.0), weight
+
+    @staticmethod
+    def value(t, capacity, rate, midpoint):
+        return capacity * np.exp(-np.exp(-rate * (t - midpoint)))
+
+    @staticmethod
+    def time_at(fraction, rate, midpoint):
+        return midpoint - math.log(-math.log(fraction)) / rate
+
+
+MODELS = {
+    'logistic': LogisticModel,
+    'gompertz': GompertzModel,
+}
+
+# Running sums kept per (session, capacity): w, w t, w z, w t^2, w t z, w z^2,
+# points used, and squared excess of points at or above K
+_SUMS = 8
+
+
+class GrowthFit:
+    """Fitted growth curve of one session; times are Unix timestamps."""
+
+    def __init__(self, session_id, model, capacity: float, rate: float, midpoint: float,
+                 rmse: float, points: int, status: str, peak_fraction: float = 0.95):
+        """
+        Initialize GrowthFit.
+
+        Args:
+            session_id: Session the fit belongs to
+            model: Growth model class from MODELS
+            capacity: Fitted final rise K (metric units)
+            rate: Growth rate r per hour
+            midpoint: Time of the fastest rise (inflection point)
+            rmse: Approximate root mean square residual in metric units
+            points: Number of points used
+            status: 'fitted', or 'unconstrained' until the rise has passed its
+                inflection point
+            peak_fraction: Fraction of K taken as the peak
+        """
+        self.session_id = session_id
+        self.model = model
+        self.capacity = capacity
+        self.rate = rate
+        self.midpoint = midpoint
+        self.rmse = rmse
+        self.points = points
+        self.status = status
+        self.peak_fraction = peak_fraction
+
+    def value_at(self, timestamp):
+        hours = (np.asarray(timestamp, dtype=np.float64) - self.midpoint) / 3600.0
+        return self.model.value(hours, self.capacity, self.rate, 0.0)
+
+    def time_to(self, value: float) -> Optional[float]:
+        """Time at which the curve reaches value, or None if it never does."""
+        if not 0 < value < self.capacity:
+            return None
+        hours = self.model.time_at(value / self.capacity, self.rate, 0.0)
+        return self.midpoint + hours * 3600.0
+
+    @property
+    def peak_time(self) -> float:
+        return self.time_to(self.peak_fraction * self.capacity)
+
+    def to_dict(self) -> dict:
+        return {
+            'session_id': self.session_id,
+            'model': self.model.name,
+            'status': self.status,
+            'capacity': self.capacity,
+            'rate_per_hour': self.rate,
+            'inflection_time': self.midpoint,
+            'peak_time': self.peak_time,
+            'rmse': self.rmse,
+            'points': self.points,
+        }
+
+
+class GrowthFitter:
+    """Running least-squares sums for many sessions over a grid of capacities."""
+
+    def __init__(self, model: str = 'logistic', capacities: Optional[np.ndarray] = None,
+                 min_points: int = 8, peak_fraction: float = 0.95):
+        """
+        Initialize GrowthFitter.
+
+        Args:
+            model: Name of the growth model (see MODELS)
+            capacities: Candidate final rises K; defaults to 96 values from 5 to
+                1000, for a rise in percent such as area_change
+            min_points: Fewest usable points before a session is fitted
+            peak_fraction: Fraction of K reported as the peak
+        """
+        if model not in MODELS:
+            raise ValueError(f"Unknown growth model: {model}")
+        self.model = MODELS[model]
+        if capacities is None:
+            capacities = np.geomspace(5.0, 1000.0, 96)
+        self.capacities = np.asarray(capacities, dtype=np.float64)
+        self.min_points = min_points
+        self.peak_fraction = peak_fraction
+
+        self._index: Dict[object, int] = {}
+        self._session_ids = []
+        self._sums = np.zeros((0, len(self.capacities), _SUMS))
+        self._origin = np.zeros(0)
+        self._last_time = np.zeros(0)
+        # Fits are cached per session and re-solved only after new points arrive
+        self._fits: Dict[object, GrowthFit] = {}
+        self._dirty = set()
+
+    def __len__(self):
+        return len(self._session_ids)
+
+    def _rows_for(self, session_ids: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+        first_new = len(self._session_ids)
+        rows = np.empty(len(session_ids), dtype=np.int64)
+        for position, session_id in enumerate(session_ids.tolist()):
+            row = self._index.get(session_id)
+            if row is None:
+                row = self._index[session_id] = len(self._session_ids)
+                self._session_ids.append(session_id)
+            rows[position] = row
+
+        if len(self._session_ids) > len(self._origin):
+            # Grow geometrically so adding sessions one by one stays cheap
+            capacity = max(len(self._session_ids), 2 * len(self._origin))
+            self._sums = _grow(self._sums, capacity, 0.0)
+            self._origin = _grow(self._origin, capacity, np.inf)
+            self._last_time = _grow(self._last_time, capacity, -np.inf)
+        if len(self._session_ids) > first_new:
+            # Times are fitted in hours from each session's first point, for
+            # conditioning
+            new = rows >= first_new
+            np.minimum.at(self._origin, rows[new], timestamps[new])
+        return rows
+
+    def add(self, session_ids: Iterable, timestamps: Iterable, values: Iterable):
+        """Add points of any number of sessions; NaN values are ignored."""
+        values = np.asarray(values, dtype=np.float64)
+        keep = ~np.isnan(values)
+        session_ids = np.asarray(session_ids)[keep]
+        timestamps = np.asarray(timestamps, dtype=np.float64)[keep]
+        values = values[keep]
+        if len(values) == 0:
+            return
+
+        rows = self._rows_for(session_ids, timestamps)
+        np.maximum.at(self._last_time, rows, timestamps)
+        t = ((timestamps - self._origin[rows]) / 3600.0)[:, None]
+        y = values[:, None]
+        z, w = self.model.linearize(y, self.capacities[None, :])
+        # The curve never exceeds K, so a point above it costs its full distance
+        excess = np.maximum(y - self.capacities[None, :], 0.0) ** 2
+        terms = np.stack((w, w * t, w * z, w * t * t, w * t * z, w * z * z,
+                          (w > 0).astype(np.float64), excess), axis=-1)
+
+        # Sum the terms of each session in one pass over the sorted rows
+        order = np.argsort(rows, kind='stable')
+        sorted_rows = rows[order]
+        starts = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        self._sums[sorted_rows[starts]] += np.add.reduceat(terms[order], starts, axis=0)
+        self._dirty.update(sorted_rows[starts].tolist())
+
+    def fit_all(self) -> Dict[object, GrowthFit]:
+        """Fits of every session with enough data.
+
+        Only sessions with new points are re-solved.
+        """
+        if self._dirty:
+            rows = np.fromiter(self._dirty, dtype=np.int64)
+            self._dirty.clear()
+            for row, fit in zip(rows.tolist(), self._solve(rows)):
+                self._store(row, fit)
+        return dict(self._fits)
+
+    def fit(self, session_id) -> Optional[GrowthFit]:
+        row = self._index.get(session_id)
+        if row is None:
+            return None
+        if row in self._dirty:
+            self._dirty.discard(row)
+            self._store(row, self._solve(np.array([row]))[0])
+        return self._fits.get(session_id)
+
+    def _store(self, row: int, fit: Optional[GrowthFit]):
+        if fit is None:
+            self._fits.pop(self._session_ids[row], None)
+        else:
+            self._fits[self._session_ids[row]] = fit
+
+    def _solve(self, rows: np.ndarray) -> list:
+        """Closed-form weighted line fit for every (row, K), then the best K per row."""
+        sw, swt, swz, swtt, swtz, swzz, n, excess = np.moveaxis(self._sums[rows], -1, 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            denominator = sw * swtt - swt * swt
+            slope = (sw * swtz - swt * swz) / denominator
+            intercept = (swz - slope * swt) / sw
+            # The weighted residual in z approximates the squared residual in the metric
+            residual = np.maximum(swzz - intercept * swz - slope * swtz, 0.0) + excess
+
+            usable = ((n >= self.min_points) & (denominator > 1e-12 * sw * sw)
+                      & (slope > 0))
+            residual = np.where(usable, residual, np.inf)
+        best = np.argmin(residual, axis=1)
+
+        fits = []
+        for position, row in enumerate(rows.tolist()):
+            k = best[position]
+            if not np.isfinite(residual[position, k]):
+                fits.append(None)
+                continue
+            rate = float(slope[position, k])
+            midpoint = float(self._origin[row] - intercept[position, k] / rate * 3600.0)
+            # Before the inflection point K is barely constrained by the data
+            constrained = (k < len(self.capacities) - 1
+                           and self._last_time[row] >= midpoint)
+            fits.append(GrowthFit(
+                self._session_ids[row], self.model, float(self.capacities[k]), rate,
+                midpoint,
+                float(math.sqrt(residual[position, k] / max(n[position, k], 1.0))),
+                int(n[position, k]), 'fitted' if constrained else 'unconstrained',
+                self.peak_fraction))
+        return fits
+
+
+def _grow(array: np.ndarray, length: int, fill: float) -> np.ndarray:
+    grown = np.full((length,) + array.shape[1:], fill)
+    grown[:len(array)] = array
+    return grown
+
+
+class GrowthTracker:
+    """Keeps a GrowthFitter up to date with the database, reading each row once."""
+
+    def __init__(self, database, model: str = 'logistic', metric: str = 'area_change',
+                 batch_size: int = 2000):
+        """
+        Initialize GrowthTracker.
+
+        Args:
+            database: Database holding the image metrics
+            model: Growth model name (see MODELS)
+            metric: Image metric column treated as the rise; the default
+                capacity grid expects it in percent
+            batch_size: Rows read per query when catching up
+        """
+        self.database = database
+        self.metric = metric
+        self.batch_size = batch_size
+        self.fitter = GrowthFitter(model)
+
+        self.last_id = 0
+        self._lock = threading.Lock()
+
+    def update(self) -> int:
+        """Fold rows added since the last call into the fits.
+
+        Returns the number of rows read.
+        """
+        with self._lock:
+            total = 0
+            while True:
+                rows = self.database.get_session_metric_points(
+                    self.metric, self.last_id, self.batch_size)
+                if not rows:
+                    break
+                ids, session_ids, timestamps, values = zip(*rows)
+                values = [np.nan if value is None else value for value in values]
+                self.fitter.add(session_ids, timestamps, values)
+                self.last_id = ids[-1]
+                total += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+            return total
+
+    def predict(self, session_id, target: Optional[float] = None) -> Optional[dict]:
+        """Catch up with the database and return the session's prediction.
+
+        Returns None if the session cannot be fitted yet.
+        """
+        self.update()
+        with self._lock:
+            fit = self.fitter.fit(session_id)
+        if fit is None:
+            return None
+        prediction = fit.to_dict()
+        prediction['metric'] = self.metric
+        if target is not None:
+            prediction['target'] = target
+            prediction['target_time'] = fit.time_to(target)
+        return prediction
@@ -0,0 +1,106 @@
+"""
+Cross-process change detection for the fermentation database.
+
+Database write notifications only fire in the process that made the write.
+When the web server runs in separate processes from the analysis loop,
+ChangeTailer watches the shared SQLite file instead: PRAGMA data_version
+changes whenever another connection commits, and a few index-only queries
+then tell which tables changed, so cached responses are invalidated within
+one polling interval.
+"""
+
+import sqlite3
+import threading
+
+# Cheap per-table fingerprints; MIN/MAX on the integer primary key are
+# answered from the ends of the b-tree
+TABLE_SIGNATURES = {
+    'sensor_data': 'SELECT MIN(id), MAX(id) FROM sensor_data',
+    'image_metrics': 'SELECT MIN(id), MAX(id) FROM image_metrics',
+    'fermentation_sessions': '''
+        SELECT COUNT(*), MAX(id), TOTAL(end_time), SUM(status = 'active')
+        FROM fermentation_sessions
+    ''',
+}
+
+
+class ChangeTailer:
+    """Polls the database file and reports tables written by other processes."""
+
+    def __init__(self, database, interval=1.0):
+        """
+        Initialize ChangeTailer.
+
+        Args:
+            database: Database whose write listeners are notified of changes
+            interval: Seconds between checks
+        """
+        self.database = database
+        self.interval = interval
+
+        self.checks = 0
+        self.changes = 0
+
+        self._connection = None
+        self._data_version = None
+        self._signatures = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.poll()
+        self._thread = threading.Thread(target=self._run_loop, name="db-change-tailer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _run_loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Change tailer poll failed: {e}")
+
+    def poll(self):
+        """Check once and notify every table that changed; returns their names."""
+        if self._connection is None:
+            # data_version is per connection, so the tailer keeps its own
+            self._connection = sqlite3.connect(self.database.db_path,
+                                               check_same_thread=False)
+        self.checks += 1
+
+        data_version = self._connection.execute('PRAGMA data_version').fetchone()[0]
+        if data_version == self._data_version:
+            return []
+        first_poll = self._data_version is None
+        self._data_version = data_version
+
+        changed = []
+        for table, sql in TABLE_SIGNATURES.items():
+            signature = self._connection.execute(sql).fetchone()
+            if self._signatures.get(table) != signature:
+                self._signatures[table] = signature
+                if not first_poll:
+                    changed.append(table)
+
+        for table in changed:
+            self.changes += 1
+            self.database._notify_write(table)
+        return changed
+
+    def get_stats(self):
+        return {
+            'checks': self.checks,
+            'changes': self.changes,
+        }
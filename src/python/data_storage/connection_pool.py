@@ -0,0 +1,175 @@
+"""
+Thread-safe SQLite connection pool.
+
+Connections are opened once, configured for WAL journaling and reused, so
+each query no longer pays connect/close and the sqlite3 statement cache
+keeps prepared statements warm across calls.
+"""
+
+from contextlib import contextmanager
+import sqlite3
+import threading
+import time
+
+
+class PoolStats:
+    """Counters describing connection checkouts."""
+
+    def __init__(self):
+        self.connections_opened = 0
+        self.acquisitions = 0
+        self.waits = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def to_dict(self):
+        return {
+            'connections_opened': self.connections_opened,
+            'acquisitions': self.acquisitions,
+            'waits': self.waits,
+            'total_wait_ms': self.total_wait * 1000.0,
+            'avg_wait_ms': (self.total_wait / self.acquisitions * 1000.0
+                            if self.acquisitions else 0.0),
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
+
+
+class ConnectionPool:
+    """
+    Pool of reusable SQLite connections.
+
+    A thread checks out one connection and keeps it for nested use until its
+    outermost block exits. Idle connections are reused most-recently-used
+    first so their page and statement caches stay warm.
+    """
+
+    def __init__(self, db_path, max_connections=8, timeout=30.0,
+                 synchronous='NORMAL', cache_size_kb=8192, statement_cache=128):
+        """
+        Initialize ConnectionPool.
+
+        Args:
+            db_path: SQLite database file
+            max_connections: Upper bound of simultaneously open connections
+            timeout: Seconds to wait for a free connection or a database lock
+            synchronous: SQLite synchronous pragma (NORMAL is durable with WAL)
+            cache_size_kb: Page cache per connection in KiB
+            statement_cache: Prepared statements cached per connection
+        """
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.synchronous = synchronous
+        self.cache_size_kb = cache_size_kb
+        self.statement_cache = statement_cache
+
+        self.stats = PoolStats()
+
+        self._idle = []
+        self._open_count = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._local = threading.local()
+        self._closed = False
+
+    def _open(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                               check_same_thread=False,
+                               cached_statements=self.statement_cache)
+        conn.row_factory = sqlite3.Row  # Enable dict-like access
+        # Must precede the WAL switch to take effect on a new database file
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        conn.execute(f'PRAGMA cache_size = -{int(self.cache_size_kb)}')
+        conn.execute('PRAGMA temp_store = MEMORY')
+        conn.execute(f'PRAGMA busy_timeout = {int(self.timeout * 1000)}')
+        return conn
+
+    def _acquire(self):
+        start = time.time()
+        waited = False
+        with self._lock:
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if self._open_count < self.max_connections:
+                    self._open_count += 1
+                    conn = None
+                    break
+                waited = True
+                remaining = start + self.timeout - time.time()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(
+                        "Timed out waiting for a database connection")
+                self._available.wait(remaining)
+
+            wait = time.time() - start
+            self.stats.acquisitions += 1
+            self.stats.total_wait += wait
+            self.stats.max_wait = max(self.stats.max_wait, wait)
+            if waited:
+                self.stats.waits += 1
+
+        if conn is None:
+            try:
+                conn = self._open()
+            except Exception:
+                with self._lock:
+                    self._open_count -= 1
+                    self._available.notify()
+                raise
+            with self._lock:
+                self.stats.connections_opened += 1
+        return conn
+
+    def _release(self, conn):
+        if conn.in_transaction:
+            # Never hand an open transaction to the next user
+            conn.rollback()
+        with self._lock:
+            if self._closed:
+                conn.close()
+                return
+            self._idle.append(conn)
+            self._available.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the current thread."""
+        held = getattr(self._local, 'conn', None)
+        if held is not None:
+            # Nested use on the same thread shares the outer connection
+            yield held
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        try:
+            yield conn
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._local.conn = None
+            self._release(conn)
+
+    def close(self):
+        """Close all connections; connections in use are closed when returned."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for conn in idle:
+            conn.close()
+
+    def get_stats(self):
+        with self._lock:
+            stats = self.stats.to_dict()
+            stats['open_connections'] = self._open_count
+            stats['idle_connections'] = len(self._idle)
+            stats['max_connections'] = self.max_connections
+        return stats
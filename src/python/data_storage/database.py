@@ -1,18 +1,61 @@
-import sqlite3
 import json
+import threading
 import time
 from pathlib import Path
-from contextlib import contextmanager
+
+from .connection_pool import ConnectionPool
+from .rollups import (RESOLUTIONS, ROLLUP_COLUMNS, create_rollup_schema,
+                      choose_resolution, series_query)
+from .write_behind import ROWS_WRITTEN, WRITE_SECONDS, WriteBehindQueue
+
+INSERT_SENSOR_DATA = '''
+    INSERT INTO sensor_data (timestamp, temperature, humidity)
+    VALUES (?, ?, ?)
+'''
+
+INSERT_IMAGE_METRICS = '''
+    INSERT INTO image_metrics (
+        timestamp, volume_change, surface_activity,
+        bubble_count, texture_variance, dough_area, area_change,
+        bubble_size, bubble_coverage, source_id, session_id
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+STATEMENT_TABLES = {
+    INSERT_SENSOR_DATA: 'sensor_data',
+    INSERT_IMAGE_METRICS: 'image_metrics',
+}
 
 class Database:
-    def __init__(self, db_path="/opt/fermentation-monitor/data/fermentation.db"):
+    def __init__(self, db_path="/opt/fermentation-monitor/data/fermentation.db",
+                 pool_size=8, write_behind=False, durability='batched',
+                 batch_size=500, flush_interval=1.0, max_buffer=10000):
         self.db_path = db_path
         
         # Create data directory if it doesn't exist
         Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
         
+        # Reused WAL-mode connections instead of one connect() per query
+        self.pool = ConnectionPool(self.db_path, max_connections=pool_size)
+
         self._init_database()
         
+        # Per-table change counters so readers can tell when cached results are stale
+        self._versions = {}
+        self._modified = {}
+        self._version_lock = threading.Lock()
+        self._write_listeners = []
+
+        # With write_behind, store_* calls are buffered and committed in batches
+        self.writer = WriteBehindQueue(
+            self.pool,
+            durability=durability if write_behind else 'sync',
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+            max_buffer=max_buffer,
+            on_commit=self._on_batch_committed
+        )
+        
     def _init_database(self):
         """Initialize database tables"""
         with self._get_connection() as conn:
@@ -38,10 +81,24 @@ class Database:
                     surface_activity REAL,
                     bubble_count INTEGER,
                     texture_variance REAL,
+                    dough_area REAL,
+                    area_change REAL,
+                    bubble_size REAL,
+                    bubble_coverage REAL,
                     image_path TEXT,
+                    source_id TEXT,
+                    session_id INTEGER,
                     created_at DATETIME DEFAULT CURRENT_TIMESTAMP
                 )
             ''')
+            self._add_missing_columns(cursor, 'image_metrics', {
+                'source_id': 'TEXT',
+                'session_id': 'INTEGER',
+                'dough_area': 'REAL',
+                'area_change': 'REAL',
+                'bubble_size': 'REAL',
+                'bubble_coverage': 'REAL'
+            })
             
             # Fermentation sessions table
             cursor.execute('''
@@ -56,44 +113,113 @@ class Database:
                 )
             ''')
             
+            # Time-series indexes for range queries
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_sensor_data_timestamp
+                ON sensor_data (timestamp)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_image_metrics_timestamp
+                ON image_metrics (timestamp)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_image_metrics_source
+                ON image_metrics (source_id, timestamp)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_image_metrics_session
+                ON image_metrics (session_id, timestamp)
+            ''')
+
+            # Downsampled rollups maintained by insert triggers
+            for table in ROLLUP_COLUMNS:
+                create_rollup_schema(cursor, table)
+
             conn.commit()
             
-    @contextmanager
+    def _add_missing_columns(self, cursor, table, columns):
+        """Upgrade tables created by older versions in place"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row['name'] for row in cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+
     def _get_connection(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable dict-like access
-        try:
-            yield conn
-        finally:
-            conn.close()
+        return self.pool.connection()
+
+    def get_pool_stats(self):
+        """Connection pool usage and wait time"""
+        return self.pool.get_stats()
+
+    def add_write_listener(self, callback):
+        """Register callback(table) invoked after new data is committed"""
+        self._write_listeners.append(callback)
+
+    def get_data_version(self, table):
+        """Return (version, last_modified) of a table; version grows on every write"""
+        with self._version_lock:
+            return self._versions.get(table, 0), self._modified.get(table)
+
+    def _notify_write(self, table):
+        with self._version_lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+            self._modified[table] = time.time()
+        for listener in self._write_listeners:
+            listener(table)
+
+    def _on_batch_committed(self, statements):
+        for statement in statements:
+            self._notify_write(STATEMENT_TABLES[statement])
+
+    def flush(self, timeout=None):
+        """Wait until all buffered writes are committed"""
+        return self.writer.flush(timeout)
+
+    def get_writer_stats(self):
+        """Write-behind buffer statistics"""
+        return self.writer.get_stats()
+
+    def close(self):
+        """Flush pending writes and close all pooled connections"""
+        self.writer.stop()
+        self.pool.close()
             
     def store_sensor_data(self, data):
         """Store sensor readings"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO sensor_data (timestamp, temperature, humidity)
-                VALUES (?, ?, ?)
-            ''', (data['timestamp'], data['temperature'], data['humidity']))
-            conn.commit()
+        self.writer.put(INSERT_SENSOR_DATA, (
+            data['timestamp'],
+            data['temperature'],
+            data['humidity']
+        ))
             
     def store_image_metrics(self, metrics):
         """Store image analysis results"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO image_metrics (
-                    timestamp, volume_change, surface_activity, 
-                    bubble_count, texture_variance
-                ) VALUES (?, ?, ?, ?, ?)
-            ''', (
-                metrics['timestamp'],
-                metrics['volume_change'],
-                metrics['surface_activity'],
-                metrics['bubble_count'],
-                metrics['texture_variance']
-            ))
+        self.writer.put(INSERT_IMAGE_METRICS, self._image_metrics_row(metrics))
+            
+    def store_image_metrics_batch(self, metrics_list):
+        """Store many image analysis results in a single transaction"""
+        rows = [self._image_metrics_row(metrics) for metrics in metrics_list]
+        with WRITE_SECONDS.labels('bulk').time(), self._get_connection() as conn:
+            conn.executemany(INSERT_IMAGE_METRICS, rows)
             conn.commit()
+        ROWS_WRITTEN.labels('bulk').inc(len(rows))
+        self._notify_write('image_metrics')
+
+    def _image_metrics_row(self, metrics):
+        return (
+            metrics['timestamp'],
+            metrics.get('volume_change'),
+            metrics.get('surface_activity'),
+            metrics.get('bubble_count'),
+            metrics.get('texture_variance'),
+            metrics.get('dough_area'),
+            metrics.get('area_change'),
+            metrics.get('bubble_size'),
+            metrics.get('bubble_coverage'),
+            metrics.get('source_id'),
+            metrics.get('session_id')
+        )
             
     def get_recent_sensor_data(self, hours=24):
         """Get sensor data from the last N hours"""
@@ -109,19 +235,168 @@ class Database:
             
             return [dict(row) for row in cursor.fetchall()]
             
-    def get_recent_image_metrics(self, hours=24):
-        """Get image metrics from the last N hours"""
-        cutoff_time = time.time() - (hours * 3600)
-        
+    def get_latest_sensor_data(self, max_age=None):
+        """Get the newest sensor reading, optionally no older than max_age seconds"""
+        return self._get_latest('sensor_data', max_age)
+
+    def get_latest_image_metrics(self, max_age=None):
+        """Get the newest image metrics row, optionally no older than max_age seconds"""
+        return self._get_latest('image_metrics', max_age)
+
+    def _get_latest(self, table, max_age):
+        cutoff_time = time.time() - max_age if max_age is not None else float('-inf')
+
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM image_metrics 
-                WHERE timestamp > ? 
+            cursor.execute(f'''
+                SELECT * FROM {table}
+                WHERE timestamp > ?
                 ORDER BY timestamp DESC
+                LIMIT 1
             ''', (cutoff_time,))
+
+            row = cursor.fetchone()
+            return dict(row) if row is not None else None
+
+    def get_recent_image_metrics(self, hours=24, source_id=None):
+        """Get image metrics from the last N hours, optionally for one source"""
+        cutoff_time = time.time() - (hours * 3600)
+        
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            if source_id is None:
+                cursor.execute('''
+                    SELECT * FROM image_metrics
+                    WHERE timestamp > ?
+                    ORDER BY timestamp DESC
+                ''', (cutoff_time,))
+            else:
+                cursor.execute('''
+                    SELECT * FROM image_metrics
+                    WHERE timestamp > ? AND source_id = ?
+                    ORDER BY timestamp DESC
+                ''', (cutoff_time, source_id))
+            
+            return [dict(row) for row in cursor.fetchall()]
             
+    def get_sensor_data_since(self, since=None, after_id=None, limit=1000):
+        """Sensor rows newer than a timestamp or id, oldest first"""
+        return self._get_since('sensor_data', since, after_id, limit)
+
+    def get_image_metrics_since(self, since=None, after_id=None, limit=1000,
+                                source_id=None):
+        """Image metrics rows newer than a timestamp or id, oldest first"""
+        return self._get_since('image_metrics', since, after_id, limit, source_id)
+
+    def get_last_id(self, table):
+        """Largest row id of sensor_data or image_metrics (0 if empty)"""
+        if table not in ('sensor_data', 'image_metrics'):
+            raise ValueError(f"Unknown table: {table}")
+        with self._get_connection() as conn:
+            return conn.execute(f'SELECT max(id) FROM {table}').fetchone()[0] or 0
+
+    def _get_since(self, table, since, after_id, limit, source_id=None):
+        # after_id walks the primary key; since uses the timestamp index
+        if after_id is not None:
+            condition, params, order = 'id > ?', [after_id], 'id'
+        else:
+            condition, params, order = 'timestamp > ?', [since or 0], 'timestamp, id'
+        if source_id is not None:
+            condition += ' AND source_id = ?'
+            params.append(source_id)
+        params.append(limit)
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT * FROM {table}
+                WHERE {condition}
+                ORDER BY {order}
+                LIMIT ?
+            ''', params)
+
             return [dict(row) for row in cursor.fetchall()]
+
+    def get_session_metric_points(self, metric, after_id=0, limit=1000):
+        """(id, session_id, timestamp, value) of session-tagged metrics after an id"""
+        if metric not in ROLLUP_COLUMNS['image_metrics']:
+            raise ValueError(f"Unknown image metric: {metric}")
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT id, session_id, timestamp, {metric} FROM image_metrics
+                WHERE id > ? AND session_id IS NOT NULL
+                ORDER BY id
+                LIMIT ?
+            ''', (after_id, limit))
+
+            return [tuple(row) for row in cursor.fetchall()]
+
+    def get_session(self, session_id):
+        """Get one fermentation session, or None"""
+        with self._get_connection() as conn:
+            row = conn.execute('SELECT * FROM fermentation_sessions WHERE id = ?',
+                               (session_id,)).fetchone()
+            return dict(row) if row is not None else None
+
+    def get_sensor_data_series(self, start, end=None, max_points=500):
+        """Sensor history in [start, end) at the finest resolution within max_points"""
+        return self._get_series('sensor_data', start, end, max_points)
+
+    def get_image_metrics_series(self, start, end=None, max_points=500, source_id=None):
+        """Image metric history in [start, end) at the finest fitting resolution"""
+        return self._get_series('image_metrics', start, end, max_points, source_id)
+
+    def _get_series(self, table, start, end, max_points, source_id=None):
+        """
+        Returns {'resolution': seconds (0 = raw rows), 'points': [...]}; rollup
+        points carry the bucket start as timestamp, the row count and
+        <metric>/<metric>_min/<metric>_max per column.
+        """
+        end = time.time() if end is None else end
+        columns = ROLLUP_COLUMNS[table]
+        source_filter = "AND source_id = ?" if source_id is not None else ""
+        params = (start, end) + ((source_id,) if source_id is not None else ())
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # Only count as far as the budget; long ranges stop early
+            cursor.execute(f'''
+                SELECT count(*) FROM (
+                    SELECT 1 FROM {table}
+                    WHERE timestamp >= ? AND timestamp < ? {source_filter}
+                    LIMIT ?
+                )
+            ''', params + (max_points + 1,))
+            raw_count = cursor.fetchone()[0]
+
+            # Raw rows older than the retention period only survive in the rollups
+            oldest_raw = cursor.execute(
+                f'SELECT min(timestamp) FROM {table}').fetchone()[0]
+            oldest_rollup = cursor.execute(f'''
+                SELECT min(bucket) FROM {table}_rollup WHERE resolution = ?
+            ''', (RESOLUTIONS[0],)).fetchone()[0]
+            raw_complete = (oldest_rollup is None or
+                            (oldest_raw is not None and
+                             oldest_raw < max(start, oldest_rollup + RESOLUTIONS[0])))
+            resolution = choose_resolution(start, end, max_points, raw_count,
+                                           raw_complete)
+
+            if resolution == 0:
+                cursor.execute(f'''
+                    SELECT timestamp, {", ".join(columns)} FROM {table}
+                    WHERE timestamp >= ? AND timestamp < ? {source_filter}
+                    ORDER BY timestamp
+                ''', params)
+            else:
+                bucket_start = (start // resolution) * resolution
+                cursor.execute(series_query(table, resolution, source_id),
+                               (bucket_start, end) + params[2:])
+
+            return {
+                'resolution': resolution,
+                'points': [dict(row) for row in cursor.fetchall()]
+            }
             
     def create_session(self, name, notes=""):
         """Create a new fermentation session"""
@@ -132,7 +407,21 @@ class Database:
                 VALUES (?, ?, ?)
             ''', (name, time.time(), notes))
             conn.commit()
-            return cursor.lastrowid
+        self._notify_write('fermentation_sessions')
+        return cursor.lastrowid
+            
+    def end_session(self, session_id, status='completed'):
+        """Mark a fermentation session as finished"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE fermentation_sessions
+                SET end_time = ?, status = ?
+                WHERE id = ?
+            ''', (time.time(), status, session_id))
+            conn.commit()
+        self._notify_write('fermentation_sessions')
+        return cursor.rowcount > 0
             
     def get_active_sessions(self):
         """Get all active fermentation sessions"""
@@ -0,0 +1,256 @@
+"""
+Bulk export of metric history in compact columnar formats.
+
+Rows are streamed from a SQLite cursor with fetchmany() and written batch by
+batch, so memory use stays constant however long the exported range is.
+
+Formats:
+    csv      gzip-compressed CSV, streamed as it is produced
+    npz      one numpy array per column (NULL as NaN), built via memory-mapped
+             temporary columns
+    parquet  Arrow/Parquet with one row group per batch (requires pyarrow)
+
+Usage (from src/python):
+    python -m data_storage.export out.npz --table image_metrics --session-id 3
+"""
+
+from typing import BinaryIO, Iterator, List, Optional, Sequence
+import argparse
+import csv
+import io
+import os
+import tempfile
+import time
+import zipfile
+import zlib
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_COLUMNS = {
+    'sensor_data': ('id', 'timestamp', 'temperature', 'humidity'),
+    'image_metrics': ('id', 'timestamp', 'volume_change', 'surface_activity',
+                      'bubble_count', 'texture_variance', 'dough_area', 'area_change',
+                      'bubble_size', 'bubble_coverage', 'source_id', 'session_id'),
+}
+
+# Columns not listed here are exported as float64 with NULL as NaN
+COLUMN_DTYPES = {
+    'id': np.dtype(np.int64),
+    'source_id': np.dtype('U64'),
+}
+
+FORMATS = {
+    'csv': ('application/gzip', 'csv.gz'),
+    'npz': ('application/octet-stream', 'npz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+}
+
+
+def available_formats() -> List[str]:
+    return [name for name in FORMATS if name != 'parquet' or pyarrow is not None]
+
+
+def supports_session_filter(table: str) -> bool:
+    return 'session_id' in EXPORT_COLUMNS[table]
+
+
+def _range_filter(start, end, session_id):
+    conditions = ['timestamp >= ?', 'timestamp < ?']
+    params = [start or 0, end if end is not None else time.time()]
+    if session_id is not None:
+        conditions.append('session_id = ?')
+        params.append(session_id)
+    return ' AND '.join(conditions), params
+
+
+def _select(conn, table, start, end, session_id):
+    condition, params = _range_filter(start, end, session_id)
+    return conn.execute(f'''
+        SELECT {", ".join(EXPORT_COLUMNS[table])} FROM {table}
+        WHERE {condition}
+        ORDER BY timestamp
+    ''', params)
+
+
+def _fetch_batches(cursor, batch_size):
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield [tuple(row) for row in rows]
+
+
+def iter_batches(database, table: str, start: Optional[float] = None,
+                 end: Optional[float] = None, session_id: Optional[int] = None,
+                 batch_size: int = 5000) -> Iterator[list]:
+    """Yield lists of row tuples in timestamp order, batch_size rows at a time."""
+    with database._get_connection() as conn:
+        cursor = _select(conn, table, start, end, session_id)
+        yield from _fetch_batches(cursor, batch_size)
+
+
+def iter_csv_gz(batches: Iterator[list], columns: Sequence[str]) -> Iterator[bytes]:
+    """Gzip-compressed CSV, yielded in chunks as the batches arrive."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        chunk = compressor.compress(text.getvalue().encode())
+        text.seek(0)
+        text.truncate()
+        if chunk:
+            yield chunk
+    yield compressor.compress(text.getvalue().encode()) + compressor.flush()
+
+
+def write_npz(batches: Iterator[list], columns: Sequence[str], row_count: int,
+              out: BinaryIO):
+    """
+    Write an .npz archive with one array per column.
+
+    Batches are scattered into memory-mapped temporary .npy files, which are
+    then copied into the zip one column at a time.
+    """
+    with tempfile.TemporaryDirectory() as temp_dir:
+        arrays = [np.lib.format.open_memmap(os.path.join(temp_dir, f"{name}.npy"),
+                                            mode='w+', shape=(row_count,),
+                                            dtype=COLUMN_DTYPES.get(name, np.float64))
+                  for name in columns]
+        filled = 0
+        for rows in batches:
+            for index, array in enumerate(arrays):
+                values = [row[index] for row in rows]
+                if array.dtype.kind == 'f':
+                    values = [np.nan if value is None else value for value in values]
+                elif array.dtype.kind == 'U':
+                    values = ['' if value is None else value for value in values]
+                array[filled:filled + len(rows)] = values
+            filled += len(rows)
+        for array in arrays:
+            array.flush()
+        del arrays
+
+        with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED,
+                             allowZip64=True) as archive:
+            for name in columns:
+                source = os.path.join(temp_dir, f"{name}.npy")
+                with open(source, 'rb') as column, \
+                        archive.open(f"{name}.npy", 'w', force_zip64=True) as entry:
+                    while True:
+                        block = column.read(1 << 20)
+                        if not block:
+                            break
+                        entry.write(block)
+    return filled
+
+
+def write_parquet(batches: Iterator[list], columns: Sequence[str], out: BinaryIO):
+    """Write a Parquet file with one row group per batch."""
+    if pyarrow is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+    types = {'id': pyarrow.int64(), 'source_id': pyarrow.string()}
+    schema = pyarrow.schema([(name, types.get(name, pyarrow.float64()))
+                             for name in columns])
+    count = 0
+    with pyarrow.parquet.ParquetWriter(out, schema, compression='zstd') as writer:
+        for rows in batches:
+            table = pyarrow.Table.from_arrays(
+                [pyarrow.array([row[index] for row in rows], type=field.type)
+                 for index, field in enumerate(schema)],
+                schema=schema)
+            writer.write_table(table)
+            count += len(rows)
+    return count
+
+
+def export(database, table: str, fmt: str, out: BinaryIO, start=None, end=None,
+           session_id=None, batch_size: int = 5000) -> int:
+    """Write a time range of a table to out in the given format.
+
+    Returns the number of rows written.
+    """
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    if fmt not in available_formats():
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if session_id is not None and not supports_session_filter(table):
+        raise ValueError(f"{table} cannot be filtered by session")
+    columns = EXPORT_COLUMNS[table]
+    end = time.time() if end is None else end
+
+    if fmt == 'npz':
+        # The column files are sized up front, so count and read in one snapshot
+        with database._get_connection() as conn:
+            conn.execute('BEGIN')
+            try:
+                condition, params = _range_filter(start, end, session_id)
+                row_count = conn.execute(
+                    f'SELECT count(*) FROM {table} WHERE {condition}',
+                    params).fetchone()[0]
+                cursor = _select(conn, table, start, end, session_id)
+                return write_npz(_fetch_batches(cursor, batch_size), columns,
+                                 row_count, out)
+            finally:
+                conn.rollback()
+
+    batches = iter_batches(database, table, start, end, session_id, batch_size)
+    if fmt == 'parquet':
+        return write_parquet(batches, columns, out)
+
+    count = 0
+
+    def counted():
+        nonlocal count
+        for rows in batches:
+            count += len(rows)
+            yield rows
+
+    for chunk in iter_csv_gz(counted(), columns):
+        out.write(chunk)
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export metric history in a columnar format")
+    parser.add_argument('output', help="Output file")
+    parser.add_argument('--db',
+                        default="/opt/fermentation-monitor/data/fermentation.db")
+    parser.add_argument('--table', choices=list(EXPORT_COLUMNS),
+                        default='image_metrics')
+    parser.add_argument('--format', choices=list(FORMATS),
+                        help="Export format (default: from the output file extension)")
+    parser.add_argument('--start', type=float,
+                        help="Start timestamp (default: beginning)")
+    parser.add_argument('--end', type=float, help="End timestamp (default: now)")
+    parser.add_argument('--session-id', type=int,
+                        help="Only rows of this fermentation session")
+    args = parser.parse_args()
+    if args.session_id is not None and not supports_session_filter(args.table):
+        parser.error(f"{args.table} cannot be filtered by session")
+
+    fmt = args.format
+    if fmt is None:
+        fmt = next((name for name, (_, suffix) in FORMATS.items()
+                    if args.output.endswith(suffix)), 'csv')
+
+    from .database import Database
+
+    database = Database(args.db)
+    started = time.time()
+    with open(args.output, 'wb') as out:
+        count = export(database, args.table, fmt, out, args.start, args.end,
+                       args.session_id)
+    database.close()
+    print(f"Exported {count} rows to {args.output} in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
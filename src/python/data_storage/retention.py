@@ -0,0 +1,237 @@
+"""
+Retention and compaction for the fermentation database.
+
+RetentionManager trims raw rows and rollup buckets past their retention
+period, archives ended fermentation sessions to gzip-compressed JSON Lines
+files and reclaims freed pages with incremental vacuum. All deletes run in
+small transactions with short pauses in between, so writers are never
+blocked for long. A database file created without auto_vacuum only gets
+the deletes; converting it takes a full VACUUM, which is left to the
+one-off maintenance step `main.py --enable-incremental-vacuum`.
+"""
+
+from pathlib import Path
+import gzip
+import json
+import re
+import threading
+import time
+
+from .rollups import RESOLUTIONS, ROLLUP_COLUMNS, rollup_table
+
+DAY = 86400
+
+
+class RetentionPolicy:
+    """How long each kind of data is kept."""
+
+    def __init__(self, raw_days=30, rollup_days=None, archive_after_days=7,
+                 archive_dir="/opt/fermentation-monitor/data/archive",
+                 batch_size=500, batch_pause=0.05, vacuum_pages=256):
+        """
+        Initialize RetentionPolicy.
+
+        Args:
+            raw_days: Days raw sensor and image rows are kept (None keeps them forever)
+            rollup_days: Days kept per rollup resolution,
+                         e.g. {60: 90, 600: 365, 3600: None}
+            archive_after_days: Days after a session ended before it is archived
+                                (None disables archiving)
+            archive_dir: Directory for session archives
+            batch_size: Rows deleted per transaction
+            batch_pause: Seconds slept between transactions
+            vacuum_pages: Free pages reclaimed per incremental vacuum step
+        """
+        self.raw_days = raw_days
+        if rollup_days is None:
+            rollup_days = {60: 90, 600: 365, 3600: None}
+        self.rollup_days = rollup_days
+        self.archive_after_days = archive_after_days
+        self.archive_dir = Path(archive_dir)
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.vacuum_pages = vacuum_pages
+
+
+class RetentionManager:
+    """Applies a RetentionPolicy periodically on a background thread."""
+
+    def __init__(self, database, policy=None, interval=3600.0):
+        self.database = database
+        self.policy = policy if policy is not None else RetentionPolicy()
+        self.interval = interval
+
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run_loop, name="db-retention")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run_loop(self):
+        if not self.incremental_vacuum_enabled():
+            print(f"Incremental vacuum is not enabled on {self.database.db_path}; "
+                  "old rows are deleted but the file will not shrink. Run "
+                  "main.py --enable-incremental-vacuum while the monitor is stopped.")
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Retention run failed: {e}")
+            self._stop.wait(self.interval)
+
+    def run_once(self, now=None):
+        """Apply the policy once and return what was removed."""
+        now = time.time() if now is None else now
+        policy = self.policy
+        result = {'raw_deleted': 0, 'rollups_deleted': 0, 'sessions_archived': 0}
+
+        if policy.raw_days is not None:
+            cutoff = now - policy.raw_days * DAY
+            for table in ROLLUP_COLUMNS:
+                deleted = self._delete_in_batches(
+                    f'''DELETE FROM {table} WHERE id IN (
+                            SELECT id FROM {table} WHERE timestamp < ?
+                            ORDER BY timestamp LIMIT ?)''', (cutoff,))
+                if deleted:
+                    self.database._notify_write(table)
+                result['raw_deleted'] += deleted
+
+        for resolution in RESOLUTIONS:
+            days = policy.rollup_days.get(resolution)
+            if days is None:
+                continue
+            cutoff = now - days * DAY
+            for table in ROLLUP_COLUMNS:
+                target = rollup_table(table)
+                result['rollups_deleted'] += self._delete_in_batches(
+                    f'''DELETE FROM {target} WHERE rowid IN (
+                            SELECT rowid FROM {target}
+                            WHERE resolution = ? AND bucket < ?
+                            LIMIT ?)''', (resolution, cutoff))
+
+        if policy.archive_after_days is not None:
+            for session in self._ended_sessions(now - policy.archive_after_days * DAY):
+                self.archive_session(session)
+                result['sessions_archived'] += 1
+
+        result['pages_freed'] = (self.incremental_vacuum()
+                                 if self.incremental_vacuum_enabled() else 0)
+        self.last_run = now
+        return result
+
+    def archive_session(self, session):
+        """Write a session and its metrics to a compressed file.
+
+        The raw rows are dropped once the archive is complete.
+        """
+        policy = self.policy
+        policy.archive_dir.mkdir(parents=True, exist_ok=True)
+        name = re.sub(r'[^A-Za-z0-9_-]+', '_', session['name'])[:40]
+        path = policy.archive_dir / f"session_{session['id']}_{name}.jsonl.gz"
+        temp_path = path.with_name(path.name + '.tmp')
+
+        # Stream rows straight from the cursor so memory use stays flat
+        with self.database._get_connection() as conn, \
+                gzip.open(temp_path, 'wt') as archive:
+            archive.write(json.dumps({'session': session}) + '\n')
+            cursor = conn.execute('''
+                SELECT * FROM image_metrics WHERE session_id = ? ORDER BY timestamp
+            ''', (session['id'],))
+            while True:
+                rows = cursor.fetchmany(policy.batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    archive.write(json.dumps(dict(row)) + '\n')
+        temp_path.replace(path)
+
+        self._delete_in_batches('''DELETE FROM image_metrics WHERE id IN (
+                                       SELECT id FROM image_metrics
+                                       WHERE session_id = ? LIMIT ?)''',
+                                (session['id'],))
+        with self.database._get_connection() as conn:
+            conn.execute('''
+                UPDATE fermentation_sessions SET status = 'archived' WHERE id = ?
+            ''', (session['id'],))
+            conn.commit()
+        self.database._notify_write('image_metrics')
+        self.database._notify_write('fermentation_sessions')
+        return str(path)
+
+    def incremental_vacuum_enabled(self):
+        """Whether the database file was created with incremental auto_vacuum."""
+        with self.database._get_connection() as conn:
+            return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+    def enable_incremental_vacuum(self):
+        """
+        Convert a database created without auto_vacuum.
+
+        This needs a one-off full VACUUM, which blocks writers while it runs
+        and temporarily needs as much free disk space as the database, so it
+        is only run as an explicit maintenance step, never by the manager.
+        """
+        with self.database._get_connection() as conn:
+            mode = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            if mode == 2:
+                return False
+            conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            conn.execute('VACUUM')
+        return True
+
+    def incremental_vacuum(self):
+        """Return freed pages to the file system a few pages at a time."""
+        freed = 0
+        while not self._stop.is_set():
+            with self.database._get_connection() as conn:
+                free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+                if free == 0:
+                    break
+                pages = int(self.policy.vacuum_pages)
+                conn.execute(f'PRAGMA incremental_vacuum({pages})').fetchall()
+                after = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if after >= free:
+                # Nothing left that incremental vacuum can release
+                break
+            freed += free - after
+            time.sleep(self.policy.batch_pause)
+        if freed:
+            with self.database._get_connection() as conn:
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchall()
+        return freed
+
+    def _ended_sessions(self, ended_before):
+        with self.database._get_connection() as conn:
+            cursor = conn.execute('''
+                SELECT * FROM fermentation_sessions
+                WHERE status NOT IN ('active', 'archived')
+                  AND end_time IS NOT NULL AND end_time < ?
+                ORDER BY end_time
+            ''', (ended_before,))
+            return [dict(row) for row in cursor.fetchall()]
+
+    def _delete_in_batches(self, sql, params):
+        """Run a LIMIT-ed delete repeatedly, one short transaction per batch."""
+        deleted = 0
+        while not self._stop.is_set():
+            with self.database._get_connection() as conn:
+                cursor = conn.execute(sql, params + (self.policy.batch_size,))
+                conn.commit()
+                count = cursor.rowcount
+            deleted += count
+            if count < self.policy.batch_size:
+                break
+            time.sleep(self.policy.batch_pause)
+        return deleted
@@ -0,0 +1,182 @@
+"""
+Downsampled rollup tables for time-series history.
+
+Every raw table listed in ROLLUP_COLUMNS gets a companion <table>_rollup
+table holding count/min/max/sum per metric for fixed-size time buckets at
+each resolution in RESOLUTIONS. Rollups are maintained by AFTER INSERT
+triggers, so every write path (single rows, write-behind batches, bulk
+back-fills and other processes) keeps them current inside the same
+transaction.
+"""
+
+# Bucket sizes in seconds, finest first
+RESOLUTIONS = (60, 600, 3600)
+
+# Raw table -> numeric columns aggregated in its rollup table
+ROLLUP_COLUMNS = {
+    'sensor_data': ('temperature', 'humidity'),
+    'image_metrics': ('volume_change', 'surface_activity', 'bubble_count',
+                      'texture_variance', 'dough_area', 'area_change', 'bubble_size',
+                      'bubble_coverage'),
+}
+
+# Raw tables whose rollups are additionally split by source
+SOURCE_COLUMN = {
+    'image_metrics': 'source_id',
+}
+
+
+def rollup_table(table):
+    return f"{table}_rollup"
+
+
+def _source_expression(table, row_alias):
+    column = SOURCE_COLUMN.get(table)
+    if column is None:
+        return "''"
+    return f"coalesce({row_alias}.{column}, '')"
+
+
+def _upsert_clause(columns):
+    assignments = ['count = count + excluded.count']
+    for column in columns:
+        low, high, total = f"{column}_min", f"{column}_max", f"{column}_sum"
+        assignments.append(f"{low} = min(coalesce({low}, excluded.{low}), "
+                           f"coalesce(excluded.{low}, {low}))")
+        assignments.append(f"{high} = max(coalesce({high}, excluded.{high}), "
+                           f"coalesce(excluded.{high}, {high}))")
+        assignments.append(f"{total} = coalesce({total}, 0) + "
+                           f"coalesce(excluded.{total}, 0)")
+    return ("ON CONFLICT(resolution, source_id, bucket) DO UPDATE SET "
+            + ", ".join(assignments))
+
+
+def create_rollup_schema(cursor, table):
+    """
+    Create the rollup table and its trigger for a raw table.
+
+    Existing raw rows are aggregated into the rollup the first time it is
+    created. Returns True if the rollup table was newly created.
+    """
+    columns = ROLLUP_COLUMNS[table]
+    target = rollup_table(table)
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?",
+                   (target,))
+    exists = cursor.fetchone() is not None
+    if exists:
+        _add_missing_rollup_columns(cursor, table)
+
+    metric_columns = ",\n".join(
+        f"{column}_min REAL, {column}_max REAL, {column}_sum REAL"
+        for column in columns)
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {target} (
+            resolution INTEGER NOT NULL,
+            source_id TEXT NOT NULL DEFAULT '',
+            bucket REAL NOT NULL,
+            count INTEGER NOT NULL,
+            {metric_columns},
+            PRIMARY KEY (resolution, source_id, bucket)
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE INDEX IF NOT EXISTS idx_{target}_bucket
+        ON {target} (resolution, bucket)
+    ''')
+
+    insert_columns = ", ".join(
+        ['resolution', 'source_id', 'bucket', 'count'] +
+        [f"{column}_{kind}" for column in columns for kind in ('min', 'max', 'sum')])
+    statements = []
+    for resolution in RESOLUTIONS:
+        values = ", ".join(
+            [str(resolution), _source_expression(table, 'NEW'),
+             f"CAST(NEW.timestamp / {resolution} AS INTEGER) * {resolution}", '1'] +
+            [f"NEW.{column}" for column in columns for _ in range(3)])
+        statements.append(f"INSERT INTO {target} ({insert_columns}) VALUES ({values}) "
+                          f"{_upsert_clause(columns)};")
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_rollup_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            {" ".join(statements)}
+        END
+    ''')
+
+    if not exists:
+        backfill_rollups(cursor, table)
+    return not exists
+
+
+def _add_missing_rollup_columns(cursor, table):
+    """Upgrade a rollup table created before new metric columns were added."""
+    target = rollup_table(table)
+    cursor.execute(f'PRAGMA table_info({target})')
+    existing = {row[1] for row in cursor.fetchall()}
+    missing = [f"{column}_{kind}" for column in ROLLUP_COLUMNS[table]
+               for kind in ('min', 'max', 'sum') if f"{column}_{kind}" not in existing]
+    if not missing:
+        return
+    for name in missing:
+        cursor.execute(f'ALTER TABLE {target} ADD COLUMN {name} REAL')
+    # The trigger is recreated with the new columns; older buckets keep NULLs for them
+    cursor.execute(f'DROP TRIGGER IF EXISTS {table}_rollup_insert')
+
+
+def backfill_rollups(cursor, table):
+    """Aggregate all existing raw rows into a freshly created rollup table."""
+    columns = ROLLUP_COLUMNS[table]
+    target = rollup_table(table)
+    insert_columns = ", ".join(
+        ['resolution', 'source_id', 'bucket', 'count'] +
+        [f"{column}_{kind}" for column in columns for kind in ('min', 'max', 'sum')])
+    aggregates = ", ".join(
+        f"min({column}), max({column}), sum({column})" for column in columns)
+    for resolution in RESOLUTIONS:
+        # WHERE true disambiguates the upsert clause from a join constraint
+        cursor.execute(f'''
+            INSERT INTO {target} ({insert_columns})
+            SELECT {resolution}, {_source_expression(table, 'raw')},
+                   CAST(raw.timestamp / {resolution} AS INTEGER) * {resolution},
+                   count(*), {aggregates}
+            FROM {table} AS raw WHERE true
+            GROUP BY 2, 3
+            {_upsert_clause(columns)}
+        ''')
+
+
+def choose_resolution(start, end, max_points, raw_count, raw_complete=True):
+    """
+    Pick the finest resolution whose bucket count fits the point budget.
+
+    Returns 0 for raw rows, otherwise a bucket size from RESOLUTIONS (the
+    coarsest one if even that exceeds the budget). Raw rows are only used
+    when retention has not already removed part of the range.
+    """
+    if raw_complete and raw_count <= max_points:
+        return 0
+    span = max(0.0, end - start)
+    for resolution in RESOLUTIONS:
+        if span / resolution <= max_points:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+def series_query(table, resolution, source_id=None):
+    """SQL returning one averaged row per bucket in [start, end)."""
+    columns = ROLLUP_COLUMNS[table]
+    target = rollup_table(table)
+    selected = ", ".join(
+        f"min({column}_min) AS {column}_min, max({column}_max) AS {column}_max, "
+        f"sum({column}_sum) / sum(count) AS {column}"
+        for column in columns)
+    source_filter = "AND source_id = ?" if source_id is not None else ""
+    return f'''
+        SELECT bucket AS timestamp, sum(count) AS count, {selected}
+        FROM {target}
+        WHERE resolution = {int(resolution)}
+          AND bucket >= ? AND bucket < ? {source_filter}
+        GROUP BY bucket
+        ORDER BY bucket
+    '''
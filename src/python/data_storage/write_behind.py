@@ -0,0 +1,266 @@
+"""
+Write-behind buffering for high-rate inserts.
+
+Rows are queued by the caller and written by a background thread, many rows
+per transaction with executemany(), once the buffer reaches a size threshold
+or the oldest row has waited long enough. A batch that keeps failing is
+written row by row so that a single bad row is discarded instead of blocking
+everything queued after it.
+"""
+
+from collections import OrderedDict
+import threading
+import time
+
+from telemetry import REGISTRY
+
+WRITE_SECONDS = REGISTRY.histogram('db_write_seconds',
+                                   "Time to write and commit one batch of rows",
+                                   ['mode'])
+ROWS_WRITTEN = REGISTRY.counter('db_rows_written_total', "Rows committed", ['mode'])
+ROWS_DROPPED = REGISTRY.counter('db_rows_dropped_total',
+                                "Rows dropped because the write buffer was full")
+FLUSH_ERRORS = REGISTRY.counter('db_flush_errors_total', "Failed batch writes")
+ROWS_FAILED = REGISTRY.counter('db_rows_failed_total',
+                               "Rows discarded because writing them failed")
+
+
+class WriteBehindQueue:
+    """
+    Bounded buffer of pending INSERTs flushed in batches.
+
+    Durability modes:
+        'sync'     - write and commit on the caller's thread (no buffering)
+        'batched'  - buffer rows; at most flush_interval seconds of data can be
+                     lost on a crash
+    When the buffer is full, callers block (overflow='block') or the row is
+    dropped and counted (overflow='drop').
+    """
+
+    def __init__(self, pool, durability='batched', batch_size=500, flush_interval=1.0,
+                 max_buffer=10000, overflow='block', on_commit=None, max_retries=3):
+        """
+        Initialize WriteBehindQueue.
+
+        Args:
+            pool: ConnectionPool used for writing
+            durability: 'batched' or 'sync'
+            batch_size: Buffered rows that trigger an immediate flush
+            flush_interval: Maximum seconds a row waits before being written
+            max_buffer: Maximum buffered rows
+            overflow: 'block' or 'drop' when the buffer is full
+            on_commit: Optional callback receiving the statements of each
+                committed batch
+            max_retries: Failed attempts at a batch before it is written row
+                by row
+        """
+        if durability not in ('batched', 'sync'):
+            raise ValueError(f"Unknown durability mode: {durability}")
+        if overflow not in ('block', 'drop'):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.pool = pool
+        self.durability = durability
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.overflow = overflow
+        self.on_commit = on_commit
+        self.max_retries = max_retries
+
+        self.rows_enqueued = 0
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.rows_failed = 0
+        self.batches_written = 0
+        self.flush_errors = 0
+        self.last_flush_duration = 0.0
+        self._write_seconds = WRITE_SECONDS.labels(durability)
+        self._rows_written = ROWS_WRITTEN.labels(durability)
+
+        self._buffer = []
+        self._oldest = None
+        self._flushing = 0
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._running or self.durability == 'sync':
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._flush_loop, name="db-write-behind")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=10.0):
+        """Flush everything still buffered and stop the background thread."""
+        self.flush(timeout)
+        with self._lock:
+            self._running = False
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        # Anything left (e.g. never started) is written on this thread
+        self._write_pending()
+
+    def put(self, sql, params):
+        """Queue one row; returns False if it was dropped."""
+        if self.durability == 'sync':
+            self._write([(sql, params)])
+            return True
+
+        self.start()
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                if self.overflow == 'drop':
+                    self.rows_dropped += 1
+                    ROWS_DROPPED.inc()
+                    return False
+                self._changed.wait_for(lambda: len(self._buffer) < self.max_buffer
+                                       or not self._running)
+            if not self._buffer:
+                self._oldest = time.time()
+            self._buffer.append((sql, params))
+            self.rows_enqueued += 1
+            if len(self._buffer) >= self.batch_size or len(self._buffer) == 1:
+                self._changed.notify_all()
+        return True
+
+    def flush(self, timeout=None):
+        """Block until every row queued so far has been committed."""
+        with self._lock:
+            if not self._running:
+                pending = bool(self._buffer)
+            else:
+                self._oldest = 0.0  # make the flush thread write immediately
+                self._changed.notify_all()
+                return self._changed.wait_for(
+                    lambda: not self._buffer and not self._flushing, timeout)
+        if pending:
+            self._write_pending()
+        return True
+
+    def pending(self):
+        with self._lock:
+            return len(self._buffer)
+
+    def get_stats(self):
+        with self._lock:
+            buffered = len(self._buffer)
+        return {
+            'durability': self.durability,
+            'buffered': buffered,
+            'rows_enqueued': self.rows_enqueued,
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'rows_failed': self.rows_failed,
+            'batches_written': self.batches_written,
+            'flush_errors': self.flush_errors,
+            'last_flush_ms': self.last_flush_duration * 1000.0,
+        }
+
+    def _take_batch(self):
+        batch, self._buffer = self._buffer, []
+        self._oldest = None
+        self._flushing += 1
+        self._changed.notify_all()
+        return batch
+
+    def _write_pending(self):
+        with self._lock:
+            if not self._buffer:
+                return
+            batch = self._take_batch()
+        try:
+            self._write(batch)
+        except Exception as e:
+            print(f"Write-behind flush failed, writing rows one by one: {e}")
+            self._write_rows(batch)
+        finally:
+            with self._lock:
+                self._flushing -= 1
+                self._changed.notify_all()
+
+    def _flush_loop(self):
+        failures = 0
+        while True:
+            with self._lock:
+                while self._running:
+                    if self._buffer:
+                        due = self._oldest + self.flush_interval - time.time()
+                        if len(self._buffer) >= self.batch_size or due <= 0:
+                            break
+                        self._changed.wait(due)
+                    else:
+                        self._changed.wait()
+                if not self._running:
+                    return
+                batch = self._take_batch()
+            try:
+                self._write(batch)
+                failures = 0
+            except Exception as e:
+                self.flush_errors += 1
+                FLUSH_ERRORS.inc()
+                failures += 1
+                if failures >= self.max_retries:
+                    print(f"Write-behind flush failed {failures} times, "
+                          f"writing rows one by one: {e}")
+                    self._write_rows(batch)
+                    failures = 0
+                else:
+                    print(f"Write-behind flush failed, retrying: {e}")
+                    self._requeue(batch)
+                    time.sleep(min(self.flush_interval, 1.0))
+            finally:
+                with self._lock:
+                    self._flushing -= 1
+                    self._changed.notify_all()
+
+    def _requeue(self, batch):
+        with self._lock:
+            # Put the rows back in front so ordering is preserved
+            self._buffer = batch + self._buffer
+            overflow = len(self._buffer) - self.max_buffer
+            if overflow > 0:
+                # Rows queued meanwhile may have filled the buffer; the oldest go
+                del self._buffer[:overflow]
+                self.rows_dropped += overflow
+                ROWS_DROPPED.inc(overflow)
+            if self._oldest is None:
+                self._oldest = time.time()
+
+    def _write_rows(self, batch):
+        """Write rows one at a time, discarding the ones that fail."""
+        for row in batch:
+            try:
+                self._write([row])
+            except Exception as e:
+                self.rows_failed += 1
+                ROWS_FAILED.inc()
+                print(f"Discarding row that could not be written: {e}")
+
+    def _write(self, batch):
+        # Group rows by statement, keeping arrival order within each group
+        statements = OrderedDict()
+        for sql, params in batch:
+            statements.setdefault(sql, []).append(params)
+
+        start = time.time()
+        with self.pool.connection() as conn:
+            for sql, rows in statements.items():
+                conn.executemany(sql, rows)
+            conn.commit()
+        self.last_flush_duration = time.time() - start
+        self._write_seconds.observe(self.last_flush_duration)
+        self._rows_written.inc(len(batch))
+        self.rows_written += len(batch)
+        self.batches_written += 1
+        if self.on_commit is not None:
+            # The rows are committed; a failing listener must not trigger a retry
+            try:
+                self.on_commit(list(statements.keys()))
+            except Exception as e:
+                print(f"Write-behind commit listener failed: {e}")
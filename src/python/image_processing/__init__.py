@@ -1,5 +1,6 @@
 """Image processing module for fermentation monitoring."""
 
 from .image_processor import ImageProcessor, ImageData
+from .camera_capture import CameraCapture, CameraManager
 
-__all__ = ['ImageProcessor', 'ImageData']
\ No newline at end of file
+__all__ = ['ImageProcessor', 'ImageData', 'CameraCapture', 'CameraManager']
\ No newline at end of file
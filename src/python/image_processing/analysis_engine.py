@@ -0,0 +1,545 @@
+"""
+Parallel analysis engine for multi-tray fermentation monitoring.
+
+The engine schedules one analysis job per source (camera + optional region of
+interest) at the source's own interval and runs the CPU-bound OpenCV work in a
+process pool. With an AdaptiveScheduler the interval follows the
+fermentation rate instead of staying fixed. Results are tagged with the
+source and session and routed into the Database. Frames reach the pool
+workers through a shared-memory FrameBus rather than being pickled with
+every job.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import heapq
+import os
+import threading
+import time
+import cv2
+
+import telemetry
+from telemetry import REGISTRY
+from . import frame_bus
+from .change_detector import LIGHTING, UNCHANGED, ChangeDetector
+from .fermentation_analyzer import (CHANGE_CHECKS, REFERENCE_RELIGHTS,
+                                    FermentationAnalyzer)
+from .reference_frame import ReferenceFileCache
+from .scheduler import AdaptiveScheduler
+
+
+JOB_SECONDS = REGISTRY.histogram('analysis_job_seconds',
+                                 "Analysis time of one sample", ['source'])
+SAMPLES_SKIPPED = REGISTRY.counter(
+    'analysis_samples_skipped_total',
+    "Samples dropped because the previous job was still running", ['source'])
+JOBS_FAILED = REGISTRY.counter('analysis_jobs_failed_total',
+                               "Samples without a result (no frame or a failed job)",
+                               ['source'])
+JOBS_PENDING = REGISTRY.gauge('analysis_jobs_pending',
+                              "Jobs submitted but not finished")
+FRAMES_DROPPED = REGISTRY.counter(
+    'analysis_frames_dropped_total',
+    "Frames overwritten on the frame bus before a worker finished them",
+    ['source', 'reason'])
+
+# Per-process state of pool workers
+_worker_analyzer = None
+_reference_cache = ReferenceFileCache()
+
+
+def _init_worker(data_dir: str):
+    global _worker_analyzer
+    # One OpenCV thread per process; parallelism comes from the pool itself
+    cv2.setNumThreads(1)
+    # Publishes this worker's metric timings if the monitor set up telemetry
+    telemetry.configure()
+    # Change detection runs in the engine, which sees every frame of a source
+    _worker_analyzer = FermentationAnalyzer(data_dir=data_dir, save_frames=False,
+                                            change_detection=False)
+
+
+class FrameDropped(Exception):
+    """A job's frame was overwritten on the bus before or while it was analyzed."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _run_job(source_id: str, frame, reference_path: str):
+    """Worker entry point: analyze one frame for one source."""
+    if _worker_analyzer is None:
+        _init_worker(str(Path(reference_path).parent))
+    start = time.time()
+    metrics = _worker_analyzer.compute_metrics(
+        frame, _reference_cache.get(reference_path), source_id)
+    return source_id, metrics, time.time() - start
+
+
+def _run_bus_job(source_id: str, bus_name: str, sequence: int, reference_path: str):
+    """Worker entry point: analyze a frame in place on the frame bus."""
+    frame = frame_bus.attach(bus_name).read(sequence)
+    if frame is None:
+        raise FrameDropped('lagged')
+    result = _run_job(source_id, frame.array, reference_path)
+    if not frame.consistent:
+        # Part of what was analyzed belongs to a newer frame
+        raise FrameDropped('torn')
+    return result
+
+
+class AnalysisSource:
+    """A camera (or a region of one) analyzed on its own schedule."""
+
+    def __init__(self, source_id: str, camera, interval: float = 300.0,
+                 roi: Optional[Tuple[int, int, int, int]] = None,
+                 session_id: Optional[int] = None):
+        """
+        Initialize AnalysisSource.
+
+        Args:
+            source_id: Unique name of the tray / source
+            camera: CameraCapture providing frames
+            interval: Seconds between analyses
+            roi: Optional (x, y, width, height) crop within the camera frame
+            session_id: Fermentation session the results belong to
+        """
+        self.source_id = source_id
+        self.camera = camera
+        self.interval = interval
+        self.roi = roi
+        self.session_id = session_id
+
+        self.in_flight = False
+        self.next_due = 0.0
+        self.last_started = 0.0
+        self.completed = 0
+        self.skipped = 0
+        self.failed = 0
+        self.dropped = 0
+        self.reused = 0
+        self.rejected = 0
+        self.last_duration = 0.0
+        self.last_metrics = None
+        # Compares each frame with the last analyzed one; the check of the
+        # frame in flight is accepted once its analysis succeeds
+        self.change_detector = ChangeDetector()
+        self.change_check = None
+        # Pool worker that analyzes every frame of this source
+        self.lane = 0
+        self.job_seconds = JOB_SECONDS.labels(source_id)
+        self.skipped_counter = SAMPLES_SKIPPED.labels(source_id)
+        self.failed_counter = JOBS_FAILED.labels(source_id)
+
+    def crop(self, frame):
+        if self.roi is None:
+            return frame
+        x, y, w, h = self.roi
+        return frame[y:y + h, x:x + w]
+
+    def get_stats(self) -> dict:
+        return {
+            'interval': self.interval,
+            'session_id': self.session_id,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'reused': self.reused,
+            'rejected': self.rejected,
+            'last_duration_s': self.last_duration,
+        }
+
+
+class AnalysisEngine:
+    """
+    Schedules analysis jobs for many sources across a process pool.
+
+    Each source has at most one job in flight; if a source comes due while its
+    previous job is still running the sample is skipped rather than queued.
+    Sources are spread round-robin over single-process pools, so every frame
+    of a tray reaches the worker holding its tracked dough region.
+    The number of jobs waiting in the pool is also bounded, so a slow box
+    delays new captures instead of accumulating stale frames.
+    """
+
+    def __init__(self, database, workers: Optional[int] = None,
+                 data_dir: str = "/opt/fermentation-monitor/data",
+                 max_pending: Optional[int] = None,
+                 on_result: Optional[Callable[[str, dict], None]] = None,
+                 scheduler: Optional[AdaptiveScheduler] = None,
+                 use_frame_bus: bool = True, bus_slots: Optional[int] = None,
+                 frame_timeout: float = 0.5, retry_interval: float = 30.0,
+                 change_detection: bool = True):
+        """
+        Initialize AnalysisEngine.
+
+        Args:
+            database: Database receiving the results
+            workers: Worker processes; defaults to min(CPU count, number of
+                     sources). 0 runs the analysis inline on the scheduler
+                     thread.
+            data_dir: Directory holding per-source reference images
+            max_pending: Maximum jobs submitted but not finished
+                         (default 2 per worker)
+            on_result: Optional callback invoked with (source_id, metrics)
+            scheduler: Optional AdaptiveScheduler adjusting source intervals
+                       after each result
+            use_frame_bus: Hand frames to pool workers through shared memory
+                           instead of pickling
+            bus_slots: Frames the bus holds (default: max_pending plus one
+                       per worker)
+            frame_timeout: Seconds to wait for a camera frame; every source
+                           shares the scheduler thread, so one dead camera
+                           must not hold up the rest
+            retry_interval: Upper bound on the delay before a failed sample is retried
+            change_detection: Reuse the last metrics for unchanged frames and
+                              skip occluded frames and lighting jumps
+        """
+        self.database = database
+        self.workers = workers
+        self.data_dir = Path(data_dir)
+        self.max_pending = max_pending
+        self.on_result = on_result
+        self.scheduler = scheduler
+        self.use_frame_bus = use_frame_bus
+        self.bus_slots = bus_slots
+        self.frame_timeout = frame_timeout
+        self.retry_interval = retry_interval
+        self.change_detection = change_detection
+
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+
+        self._sources: Dict[str, AnalysisSource] = {}
+        self._schedule = []
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._executors: List[ProcessPoolExecutor] = []
+        self._next_lane = 0
+        self._inline_analyzer = None
+        self._bus: Optional[frame_bus.FrameBus] = None
+        self._workers = 0
+        JOBS_PENDING.set_function(lambda: self._pending)
+
+    def add_source(self, source_id: str, camera, interval: float = 300.0,
+                   roi=None, session_id=None) -> AnalysisSource:
+        source = AnalysisSource(source_id, camera, interval, roi, session_id)
+        with self._lock:
+            source.lane = self._next_lane
+            self._next_lane += 1
+            self._sources[source_id] = source
+            self._reschedule(source, time.time())
+        return source
+
+    def remove_source(self, source_id: str):
+        with self._lock:
+            self._sources.pop(source_id, None)
+
+    def set_session(self, source_id: str, session_id: Optional[int]):
+        with self._lock:
+            source = self._sources.get(source_id)
+            if source is not None:
+                source.session_id = session_id
+        if self.scheduler is not None:
+            self.scheduler.reset(source_id)
+
+    def reference_path(self, source_id: str) -> str:
+        return str(self.data_dir / f"reference_{source_id}.jpg")
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        workers = self.workers
+        if workers is None:
+            workers = max(1, min(os.cpu_count() or 1, len(self._sources) or 1))
+        self._workers = workers
+        if workers > 0:
+            if self.use_frame_bus:
+                # Workers must share this process's resource tracker
+                frame_bus.share_with_children()
+            # One process per pool: a source's segmenter lives in one worker
+            self._executors = [
+                ProcessPoolExecutor(max_workers=1, initializer=_init_worker,
+                                    initargs=(str(self.data_dir),))
+                for _ in range(workers)]
+        else:
+            self._inline_analyzer = FermentationAnalyzer(data_dir=str(self.data_dir),
+                                                         save_frames=False,
+                                                         change_detection=False)
+        if self.max_pending is None:
+            self.max_pending = max(1, workers) * 2
+
+        with self._lock:
+            sources = list(self._sources.values())
+        # Cameras warm up in their own threads before the first sample is due
+        for source in sources:
+            source.camera.start()
+
+        self._thread = threading.Thread(target=self._scheduler_loop,
+                                        name="analysis-scheduler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, wait: bool = True):
+        self._running = False
+        with self._lock:
+            self._wakeup.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for executor in self._executors:
+            executor.shutdown(wait=wait)
+        self._executors = []
+        if self._bus is not None:
+            self._bus.close()
+            self._bus.unlink()
+            self._bus = None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = {
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'sources': {source_id: source.get_stats()
+                            for source_id, source in self._sources.items()},
+            }
+        if self.scheduler is not None:
+            stats['schedule'] = self.scheduler.get_stats()
+        if self._bus is not None:
+            stats['frame_bus'] = self._bus.get_stats()
+        return stats
+
+    def _scheduler_loop(self):
+        while self._running:
+            with self._lock:
+                source = self._next_due_source()
+                if source is None:
+                    continue
+                if source.in_flight:
+                    # Previous job still running: drop this sample
+                    source.skipped += 1
+                    source.skipped_counter.inc()
+                    self._reschedule(source, time.time() + source.interval)
+                    continue
+                source.in_flight = True
+                source.last_started = time.time()
+                self._pending += 1
+
+            try:
+                dispatched = self._dispatch(source)
+            except Exception as e:
+                # Must not end the scheduler thread, which every source depends on
+                print(f"Analysis of {source.source_id} failed: {e}")
+                dispatched = False
+            if not dispatched:
+                with self._lock:
+                    source.in_flight = False
+                    source.change_check = None
+                    source.failed += 1
+                    source.failed_counter.inc()
+                    self._pending -= 1
+                    self._wakeup.notify_all()
+                    self._reschedule(source, time.time() + min(source.interval,
+                                                               self.retry_interval))
+                continue
+
+            with self._lock:
+                if source.next_due <= source.last_started:
+                    self._reschedule(source, time.time() + source.interval)
+
+    def _reschedule(self, source: AnalysisSource, due: float):
+        """Set the source's next run (lock held); older heap entries become stale."""
+        source.next_due = due
+        heapq.heappush(self._schedule, (due, source.source_id))
+        self._wakeup.notify_all()
+
+    def _next_due_source(self) -> Optional[AnalysisSource]:
+        """Wait (holding the lock) until a source is due and the pool has room."""
+        while self._running:
+            if not self._schedule:
+                self._wakeup.wait(1.0)
+                continue
+            due, source_id = self._schedule[0]
+            delay = due - time.time()
+            if delay > 0:
+                self._wakeup.wait(delay)
+                continue
+            if self._pending >= self.max_pending:
+                # Back-pressure: wait for a running job to finish
+                self._wakeup.wait(1.0)
+                continue
+            heapq.heappop(self._schedule)
+            source = self._sources.get(source_id)
+            if source is not None and due == source.next_due:
+                return source
+        return None
+
+    def _dispatch(self, source: AnalysisSource) -> bool:
+        camera = source.camera
+        camera.start()
+        reference_path = self.reference_path(source.source_id)
+        needs_reference = not Path(reference_path).exists()
+        if needs_reference:
+            # Metrics computed against a previous reference no longer apply
+            source.last_metrics = None
+        start = time.time()
+        check = None
+        sequence = None
+        with camera.latest_frame(timeout=self.frame_timeout) as frame:
+            if frame is None:
+                print(f"No frame available for source {source.source_id}")
+                return False
+            frame = source.crop(frame)
+            if needs_reference and source.change_detector.is_blank(frame):
+                # Lens covered or lights off: wait for a scene to compare against
+                print("Not using a blank frame as the reference for "
+                      f"{source.source_id}")
+                return False
+            if self.change_detection:
+                check = source.change_detector.check(frame)
+                CHANGE_CHECKS.labels(check.result).inc()
+            if check is not None and (check.rejected or (
+                    check.result == UNCHANGED and source.last_metrics is not None)):
+                # Decided without analysis; nothing leaves the camera slot
+                frame = None
+            elif self._executors and self.use_frame_bus:
+                sequence = self._publish(frame)
+            # Copy the region out of the ring buffer; the slot is released on
+            # exit
+            if frame is not None and (sequence is None or needs_reference):
+                frame = frame.copy()
+        if frame is None:
+            if check.rejected:
+                print(f"Skipping {check.result} frame of {source.source_id} "
+                      f"(brightness change {check.brightness_change:+.0%})")
+                source.rejected += 1
+                self._handle_result(source.source_id, None, time.time() - start)
+            else:
+                # Nothing changed since the last analysis: its metrics still apply
+                source.reused += 1
+                metrics = dict(source.last_metrics, timestamp=int(time.time()))
+                self._handle_result(source.source_id, metrics, time.time() - start)
+            return True
+        source.change_check = check
+        if needs_reference:
+            # Written from the copy so the camera slot is not held during disk
+            # I/O
+            cv2.imwrite(reference_path, frame)
+        elif check is not None and check.confirmed == LIGHTING:
+            self._relight_reference(source.source_id, reference_path, check)
+
+        def on_done(future, source_id=source.source_id):
+            self._on_done(source_id, future)
+
+        if sequence is not None:
+            future = self._executor_for(source).submit(
+                _run_bus_job, source.source_id, self._bus.name, sequence,
+                reference_path)
+            future.add_done_callback(on_done)
+            return True
+
+        if not self._executors:
+            start = time.time()
+            metrics = self._inline_analyzer.compute_metrics(
+                frame, _reference_cache.get(reference_path), source.source_id)
+            self._handle_result(source.source_id, metrics, time.time() - start)
+            return True
+
+        future = self._executor_for(source).submit(_run_job, source.source_id,
+                                                   frame, reference_path)
+        future.add_done_callback(on_done)
+        return True
+
+    def _executor_for(self, source: AnalysisSource) -> ProcessPoolExecutor:
+        return self._executors[source.lane % len(self._executors)]
+
+    def _relight_reference(self, source_id: str, reference_path: str, check):
+        """Rescale a source's reference to a lighting change that persisted."""
+        reference = _reference_cache.get(reference_path)
+        if reference is None:
+            return
+        print(f"Relighting the reference of {source_id} by "
+              f"{check.brightness_change:+.0%}")
+        REFERENCE_RELIGHTS.inc()
+        # Workers reload the file once its modification time changes
+        relit = reference.relit(1.0 + check.brightness_change)
+        cv2.imwrite(reference_path, relit.frame)
+
+    def _publish(self, frame) -> Optional[int]:
+        """Put a frame on the bus, created on first use; None if it does not fit."""
+        if self._bus is None:
+            # Every job in flight keeps its slot until a full lap of newer frames
+            slots = self.bus_slots or self.max_pending + self._workers
+            self._bus = frame_bus.FrameBus(
+                slots, max(frame.nbytes, frame_bus.DEFAULT_SLOT_BYTES))
+        if not self._bus.fits(frame):
+            return None
+        return self._bus.publish(frame)
+
+    def _on_done(self, source_id: str, future):
+        try:
+            _, metrics, duration = future.result()
+        except Exception as e:
+            dropped = isinstance(e, FrameDropped)
+            if dropped:
+                FRAMES_DROPPED.labels(source_id, e.reason).inc()
+            else:
+                print(f"Analysis job for {source_id} failed: {e}")
+            with self._lock:
+                source = self._sources.get(source_id)
+                if source is not None:
+                    source.in_flight = False
+                    source.change_check = None
+                    if dropped:
+                        source.dropped += 1
+                    else:
+                        source.failed += 1
+                        source.failed_counter.inc()
+                self._pending -= 1
+                self._wakeup.notify_all()
+            return
+        self._handle_result(source_id, metrics, duration)
+
+    def _handle_result(self, source_id: str, metrics: Optional[dict], duration: float):
+        with self._lock:
+            source = self._sources.get(source_id)
+            session_id = source.session_id if source is not None else None
+            if source is not None:
+                source.in_flight = False
+                source.completed += 1
+                source.last_duration = duration
+                source.job_seconds.observe(duration)
+                if metrics:
+                    source.last_metrics = dict(metrics)
+                    if source.change_check is not None:
+                        # Later frames are compared with this one
+                        source.change_detector.accept(source.change_check)
+                source.change_check = None
+                if self.scheduler is not None:
+                    source.interval = self.scheduler.update(
+                        source_id, source.last_started, metrics, duration,
+                        source.interval)
+                    self._reschedule(source, source.last_started + source.interval)
+            self._pending -= 1
+            self._wakeup.notify_all()
+
+        if not metrics:
+            return
+        metrics['source_id'] = source_id
+        metrics['session_id'] = session_id
+        try:
+            self.database.store_image_metrics(metrics)
+        except Exception as e:
+            print(f"Failed to store metrics for {source_id}: {e}")
+        if self.on_result is not None:
+            try:
+                self.on_result(source_id, metrics)
+            except Exception as e:
+                print(f"Result callback for {source_id} failed: {e}")
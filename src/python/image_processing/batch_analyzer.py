@@ -0,0 +1,227 @@
+"""
+Batch analysis of archived frame sequences.
+
+BatchAnalyzer recomputes fermentation metrics for a whole sequence of frames
+(a directory of images, a video file or a stacked numpy array). Frames are
+processed in chunks along the time axis with vectorized numpy reductions, and
+the results can be written to the database in a single transaction. Metrics
+are computed over whole frames, like FermentationAnalyzer(segmentation=False);
+the dough is still segmented per frame for the area metrics.
+
+Usage (from src/python):
+    python -m image_processing.batch_analyzer /path/to/frames --db fermentation.db
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+import argparse
+import time
+import cv2
+import numpy as np
+
+from .frame_context import FrameContext
+from .frame_sources import ArraySource, FrameSource, PrefetchingSource, open_source
+from .metrics import METRICS, compute_metrics
+from .reference_frame import ReferenceFrame
+from .segmentation import DoughSegmenter
+
+
+# Metrics computed directly on whole chunks; everything else runs per frame
+VECTORIZED_METRICS = ('volume_change', 'surface_activity', 'texture_variance')
+
+
+def iter_chunks(frames: Iterator[Tuple[float, np.ndarray]],
+                chunk_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Group frames into (timestamps, stack) chunks of at most chunk_size frames."""
+    timestamps: List[float] = []
+    stack = None
+    for timestamp, frame in frames:
+        if stack is not None and (len(timestamps) == chunk_size
+                                  or stack.shape[1:] != frame.shape):
+            yield np.array(timestamps), stack[:len(timestamps)]
+            timestamps = []
+        if not timestamps and (stack is None or stack.shape[1:] != frame.shape):
+            stack = np.empty((chunk_size,) + frame.shape, dtype=frame.dtype)
+        stack[len(timestamps)] = frame
+        timestamps.append(timestamp)
+    if timestamps:
+        yield np.array(timestamps), stack[:len(timestamps)]
+
+
+class BatchAnalyzer:
+    """Vectorized metric computation over stacks of frames."""
+
+    def __init__(self, reference: Optional[np.ndarray] = None,
+                 metric_names: Optional[Sequence[str]] = None,
+                 memory_budget: int = 256 * 1024 * 1024):
+        """
+        Initialize BatchAnalyzer.
+
+        Args:
+            reference: Reference frame; defaults to the first frame of the sequence
+            metric_names: Metrics to compute (all registered metrics by default)
+            memory_budget: Approximate bytes of frame data held per chunk
+        """
+        self.reference = ReferenceFrame(reference) if reference is not None else None
+        self.metric_names = list(metric_names if metric_names is not None else METRICS)
+        self.memory_budget = memory_budget
+        self.segmenter = DoughSegmenter()
+
+    def analyze(self, source: Union[str, np.ndarray, FrameSource],
+                start_time: Optional[float] = None, interval: float = 1.0,
+                prefetch: bool = True) -> Dict[str, np.ndarray]:
+        """
+        Compute metrics for every frame of a sequence.
+
+        Args:
+            source: Directory, video file, (N, H, W, 3) array or FrameSource
+            start_time: Timestamp of the first frame for videos and arrays
+            interval: Seconds between frames of an array
+            prefetch: Decode files on a background thread while analyzing
+
+        Returns:
+            Dictionary of equally long arrays: 'timestamp' plus one per metric
+        """
+        source = open_source(source, start_time, interval)
+        if prefetch and not isinstance(source, ArraySource):
+            source = PrefetchingSource(source)
+        frames = iter(source)
+        first = next(frames, None)
+        if first is None:
+            return {name: np.empty(0) for name in ['timestamp'] + self.metric_names}
+        if self.reference is None:
+            self.reference = ReferenceFrame(first[1])
+
+        chunk_size = max(1, self.memory_budget // first[1].nbytes)
+        results = {name: [] for name in ['timestamp'] + self.metric_names}
+
+        def all_frames():
+            yield first
+            yield from frames
+
+        for timestamps, stack in iter_chunks(all_frames(), chunk_size):
+            results['timestamp'].append(timestamps)
+            for name, values in self.analyze_stack(stack).items():
+                results[name].append(values)
+
+        return {name: np.concatenate(chunks) for name, chunks in results.items()}
+
+    def analyze_stack(self, stack: np.ndarray) -> Dict[str, np.ndarray]:
+        """Compute metrics for a (N, H, W, 3) stack of frames."""
+        count, height, width = stack.shape[:3]
+        pixels = height * width
+        reference = self.reference
+        if reference.shape != stack.shape[1:]:
+            raise ValueError(f"Frame shape {stack.shape[1:]} does not match "
+                             f"reference {reference.shape}")
+
+        # A single cvtColor call converts the whole chunk
+        gray = cv2.cvtColor(stack.reshape(count * height, width, 3),
+                            cv2.COLOR_BGR2GRAY).reshape(count, pixels)
+        results = {}
+
+        # Differences are taken frame by frame in uint8 into one reused buffer;
+        # widening the whole chunk would need several chunk-sized temporaries
+        if 'volume_change' in self.metric_names:
+            results['volume_change'] = self._mean_abs_diff(
+                gray, reference.gray.reshape(-1))
+
+        if 'surface_activity' in self.metric_names:
+            results['surface_activity'] = self._mean_abs_diff(
+                stack.reshape(count, -1), reference.frame.reshape(-1))
+
+        if 'texture_variance' in self.metric_names:
+            # var = E[x^2] - E[x]^2 from integer sums, without a float copy of the chunk
+            sums = gray.sum(axis=1, dtype=np.int64)
+            squares = np.einsum('ij,ij->i', gray, gray, dtype=np.int64)
+            mean = sums / pixels
+            results['texture_variance'] = squares / pixels - mean * mean
+
+        per_frame = [name for name in self.metric_names
+                     if name not in VECTORIZED_METRICS]
+        if per_frame:
+            values = {name: np.empty(count) for name in per_frame}
+            region_names = [name for name in per_frame if METRICS[name].requires_region]
+            # Frame metrics ignore the region, like the live analyzer without
+            # segmentation
+            frame_names = [name for name in per_frame if name not in region_names]
+            for index in range(count):
+                frame_gray = gray[index].reshape(height, width)
+                contexts = []
+                if frame_names:
+                    contexts.append((FrameContext(stack[index], reference),
+                                     frame_names))
+                if region_names:
+                    region = self.segmenter.segment(stack[index])
+                    context = FrameContext(stack[index], reference, region=region,
+                                           reference_region=reference.region)
+                    contexts.append((context, region_names))
+                for context, names in contexts:
+                    # Reuse the grayscale already computed for the chunk
+                    context.__dict__['gray'] = frame_gray
+                    for name, value in compute_metrics(context, names).items():
+                        values[name][index] = np.nan if value is None else value
+            results.update(values)
+
+        return results
+
+    @staticmethod
+    def _mean_abs_diff(frames: np.ndarray, reference: np.ndarray) -> np.ndarray:
+        """Mean absolute difference of every row of frames from reference.
+
+        Both are uint8; rows are differenced one at a time into one buffer.
+        """
+        diff = np.empty_like(reference)
+        means = np.empty(frames.shape[0])
+        for index in range(frames.shape[0]):
+            cv2.absdiff(frames[index], reference, dst=diff)
+            means[index] = diff.sum(dtype=np.int64) / diff.size
+        return means
+
+    @staticmethod
+    def to_rows(results: Dict[str, np.ndarray], source_id: Optional[str] = None,
+                session_id: Optional[int] = None) -> List[dict]:
+        """Convert column arrays into metric dictionaries for the database."""
+        names = list(results.keys())
+        columns = [results[name].tolist() for name in names]
+        rows = []
+        for values in zip(*columns):
+            row = dict(zip(names, values))
+            row['source_id'] = source_id
+            row['session_id'] = session_id
+            rows.append(row)
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Back-fill fermentation metrics from archived frames")
+    parser.add_argument('source', help="Directory of images or video file")
+    parser.add_argument('--db',
+                        default="/opt/fermentation-monitor/data/fermentation.db")
+    parser.add_argument('--reference',
+                        help="Reference image (defaults to the first frame)")
+    parser.add_argument('--source-id', help="Source/tray the frames belong to")
+    parser.add_argument('--session-id', type=int,
+                        help="Fermentation session to tag rows with")
+    parser.add_argument('--start-time', type=float,
+                        help="Timestamp of the first video frame")
+    args = parser.parse_args()
+
+    from data_storage.database import Database
+
+    reference = cv2.imread(args.reference) if args.reference else None
+    analyzer = BatchAnalyzer(reference)
+
+    start = time.time()
+    results = analyzer.analyze(args.source, args.start_time)
+    elapsed = time.time() - start
+    frame_count = len(results['timestamp'])
+
+    Database(args.db).store_image_metrics_batch(
+        BatchAnalyzer.to_rows(results, args.source_id, args.session_id))
+    print(f"Analyzed {frame_count} frames in {elapsed:.1f}s "
+          f"({frame_count / max(elapsed, 1e-9):.1f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
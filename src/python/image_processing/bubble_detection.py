@@ -0,0 +1,204 @@
+"""
+Multi-scale bubble detection.
+
+Bubbles are small dark blobs on the lighter dough surface. Instead of
+thresholding the whole frame once and measuring every contour in Python,
+BubbleDetector works on an image pyramid: each size band is searched on the
+coarsest level where its smallest bubbles are still a few pixels across, so
+large bubbles cost a fraction of the pixels. A black-hat filter sized to the
+band picks out blobs darker than their surroundings regardless of the
+lighting gradient, and connectedComponentsWithStats measures all of them in
+one call.
+
+Sizes are equivalent diameters relative to a reference length (the dough's
+equivalent diameter, or the frame's short side), so the same bands apply to
+any camera resolution or working size.
+"""
+
+from typing import Dict, List, Optional, Sequence
+import cv2
+import numpy as np
+
+# Band edges as equivalent diameters relative to the reference length
+DEFAULT_EDGES = (0.005, 0.01, 0.02, 0.04, 0.08)
+
+# Sizes measured on neighbouring pyramid levels differ slightly, so each level
+# also accepts bubbles this much beyond its bands; duplicates are removed
+LEVEL_OVERLAP = 1.25
+
+
+class BubbleDistribution:
+    """Bubbles found in one frame and their size distribution."""
+
+    def __init__(self, diameters: np.ndarray, areas: np.ndarray, edges: Sequence[float],
+                 reference_length: float, analyzed_area: float):
+        """
+        Initialize BubbleDistribution.
+
+        Args:
+            diameters: Equivalent diameter of every bubble, relative to reference_length
+            areas: Area of every bubble in pixels of the analyzed image
+            edges: Size band edges the bubbles were detected in
+            reference_length: Length in pixels that diameters are relative to
+            analyzed_area: Pixels the bubbles were searched in
+        """
+        self.diameters = diameters
+        self.areas = areas
+        self.edges = tuple(edges)
+        self.reference_length = reference_length
+        self.analyzed_area = analyzed_area
+
+    @property
+    def count(self) -> int:
+        return int(self.diameters.size)
+
+    @property
+    def histogram(self) -> np.ndarray:
+        """Number of bubbles per size band."""
+        counts, _ = np.histogram(self.diameters, bins=self.edges)
+        return counts
+
+    @property
+    def median_diameter(self) -> Optional[float]:
+        """Median equivalent diameter relative to the reference length.
+
+        None when no bubbles were found.
+        """
+        if self.diameters.size == 0:
+            return None
+        return float(np.median(self.diameters))
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of the analyzed area covered by bubbles."""
+        if self.analyzed_area <= 0:
+            return 0.0
+        return min(1.0, float(self.areas.sum()) / self.analyzed_area)
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'edges': list(self.edges),
+            'histogram': self.histogram.tolist(),
+            'median_diameter': self.median_diameter,
+            'coverage': self.coverage,
+        }
+
+
+class BubbleDetector:
+    """Finds dark blobs in size bands on an image pyramid."""
+
+    def __init__(self, edges: Sequence[float] = DEFAULT_EDGES, min_pixels: float = 2.5,
+                 min_contrast: int = 20, max_level: int = 4):
+        """
+        Initialize BubbleDetector.
+
+        Args:
+            edges: Increasing band edges, as equivalent diameters relative to the
+                   reference length
+            min_pixels: Smallest diameter, in pyramid-level pixels, a band is
+                        searched at
+            min_contrast: Gray levels a bubble must be darker than its surroundings
+            max_level: Coarsest pyramid level used
+        """
+        if len(edges) < 2 or any(b <= a for a, b in zip(edges, edges[1:])):
+            raise ValueError("edges must be at least two increasing values")
+        self.edges = tuple(float(edge) for edge in edges)
+        self.min_pixels = min_pixels
+        self.min_contrast = min_contrast
+        self.max_level = max_level
+
+    def levels(self, reference_length: float) -> Dict[int, List[int]]:
+        """Pyramid level -> indices of the bands searched on it."""
+        levels = {}
+        for band, low in enumerate(self.edges[:-1]):
+            diameter = low * reference_length
+            level = 0
+            while (level < self.max_level
+                   and diameter / 2 ** (level + 1) >= self.min_pixels):
+                level += 1
+            levels.setdefault(level, []).append(band)
+        return levels
+
+    def detect(self, gray: np.ndarray, reference_length: Optional[float] = None,
+               analyzed_area: Optional[float] = None) -> BubbleDistribution:
+        """
+        Detect bubbles in a grayscale image.
+
+        Args:
+            gray: Grayscale image (uint8)
+            reference_length: Length in pixels of gray that sizes are relative to;
+                              the image's short side by default
+            analyzed_area: Area in pixels of gray the coverage is relative to;
+                           the whole image by default
+
+        Returns:
+            The detected bubbles
+        """
+        if reference_length is None:
+            reference_length = float(min(gray.shape[:2]))
+        if analyzed_area is None:
+            analyzed_area = float(gray.shape[0] * gray.shape[1])
+
+        diameters, areas = [], []
+        # Bubbles already counted on finer levels, at the last level's resolution
+        claimed = None
+        pyramid = [gray]
+        levels = sorted(self.levels(reference_length).items())
+        for index, (level, bands) in enumerate(levels):
+            while len(pyramid) <= level:
+                pyramid.append(cv2.pyrDown(pyramid[-1]))
+            image = pyramid[level]
+            if min(image.shape[:2]) < 2:
+                break
+
+            # Pixels of this level relative to the reference length
+            level_length = reference_length / 2 ** level
+            low = self.edges[bands[0]] * level_length
+            high = self.edges[bands[-1] + 1] * level_length
+            if bands[0] > 0:
+                low /= LEVEL_OVERLAP
+            if bands[-1] + 1 < len(self.edges) - 1:
+                high *= LEVEL_OVERLAP
+            # The black-hat responds to dark features narrower than the kernel
+            size = int(np.ceil(high * LEVEL_OVERLAP)) | 1
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (size, size))
+            # A light blur keeps pixel noise from passing as the smallest bubbles
+            smoothed = cv2.GaussianBlur(image, (3, 3), 0)
+            response = cv2.morphologyEx(smoothed, cv2.MORPH_BLACKHAT, kernel)
+            _, binary = cv2.threshold(response, self.min_contrast, 255,
+                                      cv2.THRESH_BINARY)
+
+            count, labels, stats, centroids = cv2.connectedComponentsWithStats(
+                binary, connectivity=8)
+            level_areas = stats[1:, cv2.CC_STAT_AREA].astype(np.float64)
+            level_diameters = 2.0 * np.sqrt(level_areas / np.pi)
+            keep = (level_diameters >= low) & (level_diameters < high)
+            if claimed is not None:
+                # Drop bubbles whose center lies inside one already counted
+                claimed = cv2.resize(claimed, (image.shape[1], image.shape[0]),
+                                     interpolation=cv2.INTER_AREA)
+                x = np.clip(np.rint(centroids[1:, 0]).astype(int), 0,
+                            image.shape[1] - 1)
+                y = np.clip(np.rint(centroids[1:, 1]).astype(int), 0,
+                            image.shape[0] - 1)
+                keep &= claimed[y, x] == 0
+            diameters.append(level_diameters[keep] / level_length)
+            areas.append(level_areas[keep] * 4.0 ** level)
+
+            if index + 1 < len(levels):
+                lookup = np.zeros(count, dtype=np.uint8)
+                lookup[1:][keep] = 255
+                counted = lookup[labels]
+                claimed = counted if claimed is None else np.maximum(claimed, counted)
+
+        return BubbleDistribution(
+            np.concatenate(diameters) if diameters else np.empty(0),
+            np.concatenate(areas) if areas else np.empty(0),
+            self.edges, reference_length, analyzed_area)
+
+
+def detect_bubbles(gray: np.ndarray,
+                   reference_length: Optional[float] = None) -> BubbleDistribution:
+    """Detect bubbles with the default bands."""
+    return BubbleDetector().detect(gray, reference_length)
@@ -0,0 +1,344 @@
+"""
+Persistent camera capture for fermentation monitoring.
+
+A CameraCapture owns a video device for the lifetime of the monitor, reads
+frames continuously on a background thread into a preallocated ring buffer
+and hands consumers the most recent frame without copying it.
+"""
+
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+import threading
+import time
+import cv2
+import numpy as np
+
+from telemetry import REGISTRY
+
+READ_SECONDS = REGISTRY.histogram('camera_read_seconds',
+                                  "Time to read one frame from the camera", ['camera'])
+FRAMES_CAPTURED = REGISTRY.counter('camera_frames_captured_total',
+                                   "Frames stored in the ring buffer", ['camera'])
+FRAMES_DROPPED = REGISTRY.counter(
+    'camera_frames_dropped_total',
+    "Frames lost to read failures or a fully pinned buffer", ['camera'])
+READ_FAILURES = REGISTRY.counter('camera_read_failures_total', "Failed frame reads",
+                                 ['camera'])
+RECONNECTS = REGISTRY.counter('camera_reconnects_total', "Camera device reopens",
+                              ['camera'])
+
+
+class CaptureStats:
+    """Counters describing the health of a capture thread."""
+
+    def __init__(self):
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+        self.reconnects = 0
+        self.last_latency = 0.0
+        self.avg_latency = 0.0
+        self.max_latency = 0.0
+        self.last_frame_time = 0.0
+
+    def record_latency(self, latency: float):
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        # Exponential moving average keeps this O(1) per frame
+        if self.avg_latency == 0.0:
+            self.avg_latency = latency
+        else:
+            self.avg_latency = 0.9 * self.avg_latency + 0.1 * latency
+
+    def to_dict(self) -> dict:
+        return {
+            'frames_captured': self.frames_captured,
+            'frames_dropped': self.frames_dropped,
+            'read_failures': self.read_failures,
+            'reconnects': self.reconnects,
+            'last_latency_ms': self.last_latency * 1000.0,
+            'avg_latency_ms': self.avg_latency * 1000.0,
+            'max_latency_ms': self.max_latency * 1000.0,
+            'last_frame_age_s': (time.time() - self.last_frame_time
+                                 if self.last_frame_time else None),
+        }
+
+
+class CameraCapture:
+    """
+    Long-lived capture loop for a single camera.
+
+    Frames are decoded straight into slots of a preallocated ring buffer.
+    Consumers borrow the newest slot through latest_frame(); a borrowed slot
+    is pinned and will not be overwritten until it is released, so the frame
+    can be analyzed in place without a copy.
+    """
+
+    def __init__(self, camera_index: int = 0, buffer_size: int = 4,
+                 width: Optional[int] = None, height: Optional[int] = None,
+                 warmup_frames: int = 5, max_failures: int = 5,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        """
+        Initialize CameraCapture.
+
+        Args:
+            camera_index: OpenCV device index
+            buffer_size: Number of ring buffer slots (at least 2)
+            width: Optional requested frame width
+            height: Optional requested frame height
+            warmup_frames: Frames discarded after opening so auto-exposure can settle
+            max_failures: Consecutive read failures before the device is reopened
+            reconnect_delay: Initial delay before reopening the device in seconds
+            max_reconnect_delay: Upper bound for the reconnect backoff in seconds
+        """
+        self.camera_index = camera_index
+        self.buffer_size = max(2, buffer_size)
+        self.width = width
+        self.height = height
+        self.warmup_frames = warmup_frames
+        self.max_failures = max_failures
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.stats = CaptureStats()
+        camera = str(camera_index)
+        self._read_seconds = READ_SECONDS.labels(camera)
+        self._frames_captured = FRAMES_CAPTURED.labels(camera)
+        self._frames_dropped = FRAMES_DROPPED.labels(camera)
+        self._read_failures = READ_FAILURES.labels(camera)
+        self._reconnects = RECONNECTS.labels(camera)
+
+        self._buffer: Optional[np.ndarray] = None
+        self._timestamps = np.zeros(self.buffer_size, dtype=np.float64)
+        self._sequence = np.zeros(self.buffer_size, dtype=np.int64)
+        self._pins = [0] * self.buffer_size
+        self._latest_slot = -1
+        self._next_sequence = 1
+
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Condition(self._lock)
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+        self._capture = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._running
+
+    def start(self):
+        """Start the background capture thread (no-op if already running)."""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop,
+                                        name=f"camera-{self.camera_index}")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Stop the capture thread and release the device."""
+        self._running = False
+        with self._lock:
+            self._frame_ready.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    @contextmanager
+    def latest_frame(self, timeout: float = 5.0,
+                     newer_than: int = 0) -> Iterator[Optional[np.ndarray]]:
+        """
+        Borrow the most recent frame without copying it.
+
+        The yielded array is a read-only view into the ring buffer and is only
+        valid inside the with-block. Yields None if no frame arrives in time.
+
+        Args:
+            timeout: Seconds to wait for a frame
+            newer_than: Only accept frames with a sequence number above this
+        """
+        slot = self._acquire_latest(timeout, newer_than)
+        if slot < 0:
+            yield None
+            return
+        try:
+            frame = self._buffer[slot]
+            view = frame.view()
+            view.flags.writeable = False
+            yield view
+        finally:
+            with self._lock:
+                self._pins[slot] -= 1
+
+    def latest_sequence(self) -> int:
+        """Sequence number of the newest frame, 0 if none captured yet."""
+        with self._lock:
+            if self._latest_slot < 0:
+                return 0
+            return int(self._sequence[self._latest_slot])
+
+    def get_stats(self) -> dict:
+        stats = self.stats.to_dict()
+        stats['camera_index'] = self.camera_index
+        stats['running'] = self._running
+        stats['connected'] = self._capture is not None
+        return stats
+
+    def _acquire_latest(self, timeout: float, newer_than: int) -> int:
+        deadline = time.time() + timeout
+        with self._lock:
+            while self._running or self._latest_slot >= 0:
+                slot = self._latest_slot
+                if slot >= 0 and self._sequence[slot] > newer_than:
+                    self._pins[slot] += 1
+                    return slot
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self._running:
+                    break
+                self._frame_ready.wait(remaining)
+        return -1
+
+    def _open(self) -> bool:
+        capture = cv2.VideoCapture(self.camera_index)
+        if not capture.isOpened():
+            capture.release()
+            return False
+        if self.width:
+            capture.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        if self.height:
+            capture.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        # Keep the driver queue short so reads return fresh frames
+        capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        for _ in range(self.warmup_frames):
+            capture.grab()
+        self._capture = capture
+        return True
+
+    def _close(self):
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+    def _free_slot(self) -> int:
+        """Pick the oldest slot that is neither pinned nor the latest frame."""
+        candidates = [i for i in range(self.buffer_size)
+                      if self._pins[i] == 0 and i != self._latest_slot]
+        if not candidates:
+            return -1
+        return min(candidates, key=lambda i: self._sequence[i])
+
+    def _ensure_buffer(self, frame: np.ndarray):
+        if self._buffer is None or self._buffer.shape[1:] != frame.shape:
+            with self._lock:
+                if any(self._pins):
+                    return False
+                self._buffer = np.empty((self.buffer_size,) + frame.shape,
+                                        dtype=frame.dtype)
+                self._latest_slot = -1
+        return True
+
+    def _capture_loop(self):
+        delay = self.reconnect_delay
+        failures = 0
+        scratch = None
+
+        while self._running:
+            if self._capture is None:
+                if not self._open():
+                    print(f"Failed to open camera {self.camera_index}, "
+                          f"retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    delay = min(delay * 2, self.max_reconnect_delay)
+                    continue
+                delay = self.reconnect_delay
+                failures = 0
+
+            with self._lock:
+                slot = self._free_slot() if self._buffer is not None else -1
+            target = self._buffer[slot] if slot >= 0 else scratch
+
+            start = time.time()
+            if target is not None:
+                ret, frame = self._capture.read(target)
+            else:
+                ret, frame = self._capture.read()
+            latency = time.time() - start
+            self._read_seconds.observe(latency)
+
+            if not ret or frame is None:
+                failures += 1
+                self.stats.read_failures += 1
+                self.stats.frames_dropped += 1
+                self._read_failures.inc()
+                self._frames_dropped.inc()
+                if failures >= self.max_failures:
+                    print(f"Camera {self.camera_index} stopped delivering frames, "
+                          "reconnecting")
+                    self._close()
+                    self.stats.reconnects += 1
+                    self._reconnects.inc()
+                    time.sleep(delay)
+                continue
+
+            failures = 0
+            self.stats.record_latency(latency)
+
+            if slot < 0 or not np.shares_memory(frame, self._buffer[slot]):
+                # First frame, a resolution change or every slot is pinned
+                if not self._ensure_buffer(frame):
+                    scratch = frame
+                    self.stats.frames_dropped += 1
+                    self._frames_dropped.inc()
+                    continue
+                with self._lock:
+                    slot = self._free_slot()
+                if slot < 0:
+                    scratch = frame
+                    self.stats.frames_dropped += 1
+                    self._frames_dropped.inc()
+                    continue
+                self._buffer[slot][...] = frame
+
+            now = time.time()
+            with self._lock:
+                self._timestamps[slot] = now
+                self._sequence[slot] = self._next_sequence
+                self._next_sequence += 1
+                self._latest_slot = slot
+                self._frame_ready.notify_all()
+            self.stats.frames_captured += 1
+            self.stats.last_frame_time = now
+            self._frames_captured.inc()
+
+        self._close()
+
+
+class CameraManager:
+    """Registry of capture loops, one per camera / proofing tray."""
+
+    def __init__(self):
+        self._cameras: Dict[str, CameraCapture] = {}
+
+    def add_camera(self, camera_id: str, camera_index: int = 0,
+                   **kwargs) -> CameraCapture:
+        camera = CameraCapture(camera_index, **kwargs)
+        self._cameras[camera_id] = camera
+        return camera
+
+    def get(self, camera_id: str) -> Optional[CameraCapture]:
+        return self._cameras.get(camera_id)
+
+    def camera_ids(self):
+        return list(self._cameras.keys())
+
+    def start_all(self):
+        for camera in self._cameras.values():
+            camera.start()
+
+    def stop_all(self):
+        for camera in self._cameras.values():
+            camera.stop()
+
+    def get_stats(self) -> Dict[str, dict]:
+        return {camera_id: camera.get_stats()
+                for camera_id, camera in self._cameras.items()}
@@ -0,0 +1,187 @@
+"""
+Cheap first-pass change detection between analyzed frames.
+
+During the lag and plateau phases the dough barely changes from one sample
+to the next, yet every metric would be recomputed from scratch. A
+ChangeDetector reduces each frame to a small grayscale thumbnail and
+compares it with the thumbnail of the last frame that was fully analyzed:
+
+- unchanged: too few thumbnail cells changed; the last metrics still apply
+- changed: the frame needs a full analysis
+- occluded: a large part of the scene changed abruptly (a hand, a lid, the
+  lens covered) or the frame went blank
+- lighting: the overall brightness jumped, e.g. a room light switched
+
+Comparing against the last analyzed frame rather than the previous one lets
+slow changes accumulate until they cross the threshold. Occlusion and
+lighting jumps are rejected so they do not produce meaningless metrics; if
+the same jump persists for several checks it is accepted as the new scene
+and the check records what was confirmed, so a lighting change can be
+carried over to the reference. A blank frame is never accepted.
+"""
+
+from typing import Optional
+import cv2
+import numpy as np
+
+UNCHANGED = 'unchanged'
+CHANGED = 'changed'
+OCCLUDED = 'occluded'
+LIGHTING = 'lighting'
+
+
+class ChangeCheck:
+    """Outcome of comparing one frame with the last analyzed one."""
+
+    __slots__ = ('result', 'thumbnail', 'changed_fraction', 'brightness_change',
+                 'confirmed')
+
+    def __init__(self, result: str, thumbnail: np.ndarray,
+                 changed_fraction: float = 1.0, brightness_change: float = 0.0,
+                 confirmed: Optional[str] = None):
+        self.result = result
+        self.thumbnail = thumbnail
+        self.changed_fraction = changed_fraction
+        self.brightness_change = brightness_change
+        # Occlusion or lighting jump that persisted long enough to be accepted
+        self.confirmed = confirmed
+
+    @property
+    def rejected(self) -> bool:
+        return self.result in (OCCLUDED, LIGHTING)
+
+
+class ChangeDetector:
+    """Classifies frames against the thumbnail of the last analyzed frame."""
+
+    def __init__(self, thumbnail_width: int = 32, pixel_threshold: float = 6.0,
+                 change_fraction: float = 0.005, occlusion_threshold: float = 40.0,
+                 occlusion_fraction: float = 0.25, lighting_change: float = 0.15,
+                 blank_std: float = 3.0, confirm_after: int = 3, max_reuse: int = 12):
+        """
+        Initialize ChangeDetector.
+
+        Args:
+            thumbnail_width: Width of the comparison thumbnail; the height follows
+                the aspect ratio
+            pixel_threshold: Gray levels a thumbnail cell must change by to count
+                as changed
+            change_fraction: Largest fraction of changed cells for a frame to be
+                unchanged
+            occlusion_threshold: Gray levels, after brightness compensation, of an
+                occluded cell
+            occlusion_fraction: Fraction of occluded cells that marks the frame
+                occluded
+            lighting_change: Relative change of the scene's brightness that marks a
+                lighting jump
+            blank_std: Thumbnails with a lower standard deviation are blank (lens
+                covered, lights off)
+            confirm_after: Consecutive occluded or lighting checks after which the
+                scene is accepted
+            max_reuse: Consecutive unchanged checks after which a full analysis is
+                forced anyway
+        """
+        self.thumbnail_width = thumbnail_width
+        self.pixel_threshold = pixel_threshold
+        self.change_fraction = change_fraction
+        self.occlusion_threshold = occlusion_threshold
+        self.occlusion_fraction = occlusion_fraction
+        self.lighting_change = lighting_change
+        self.blank_std = blank_std
+        self.confirm_after = confirm_after
+        self.max_reuse = max_reuse
+
+        self._baseline = None
+        self._reused = 0
+        self._rejected_result = None
+        self._rejected = 0
+
+    def thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        """Small float32 grayscale version of a frame."""
+        height, width = frame.shape[:2]
+        size = (self.thumbnail_width,
+                max(1, round(self.thumbnail_width * height / width)))
+        # Every cell still averages at least 8x8 samples after skipping pixels
+        step = max(1, min(width // (size[0] * 8), height // (size[1] * 8)))
+        small = cv2.resize(frame[::step, ::step], size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            # BGR luma weights; on a few hundred cells this beats another
+            # cvtColor call
+            weights = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+            return small.astype(np.float32) @ weights
+        return small.astype(np.float32)
+
+    def is_blank(self, frame: np.ndarray) -> bool:
+        """Whether a frame shows no scene at all (lens covered, lights off)."""
+        return self._blank(self.thumbnail(frame))
+
+    def _blank(self, thumbnail: np.ndarray) -> bool:
+        return bool(thumbnail.std() < self.blank_std)
+
+    def check(self, frame: np.ndarray) -> ChangeCheck:
+        """Compare a frame with the last accepted one.
+
+        Call accept() with the result once the frame was fully analyzed.
+        """
+        thumbnail = self.thumbnail(frame)
+        if self._blank(thumbnail):
+            # Never analyzed nor accepted as a scene, however long it lasts
+            return ChangeCheck(OCCLUDED, thumbnail)
+        baseline = self._baseline
+        if baseline is None or baseline.shape != thumbnail.shape:
+            return ChangeCheck(CHANGED, thumbnail)
+
+        # Median over cells: a lighting change brightens most of the scene, the
+        # growing dough only the part it spreads into
+        gain = float(np.median((thumbnail + 1.0) / (baseline + 1.0)))
+        brightness_change = gain - 1.0
+        changed_fraction = float(
+            np.mean(np.abs(thumbnail - baseline) > self.pixel_threshold))
+
+        if (changed_fraction <= self.change_fraction
+                and self._reused < self.max_reuse):
+            self._reused += 1
+            self._rejected = 0
+            return ChangeCheck(UNCHANGED, thumbnail, changed_fraction,
+                               brightness_change)
+
+        # Scaled to the baseline's brightness so a lighting change alone is not
+        # an occlusion
+        compensated = (thumbnail + 1.0) / gain - 1.0
+        occluded_fraction = float(
+            np.mean(np.abs(compensated - baseline) > self.occlusion_threshold))
+        if occluded_fraction > self.occlusion_fraction:
+            result = OCCLUDED
+        elif abs(brightness_change) > self.lighting_change:
+            result = LIGHTING
+        else:
+            return ChangeCheck(CHANGED, thumbnail, changed_fraction,
+                               brightness_change)
+
+        if result == self._rejected_result:
+            self._rejected += 1
+        else:
+            self._rejected_result = result
+            self._rejected = 1
+        if self._rejected >= self.confirm_after:
+            # The jump persisted; treat it as the new scene
+            return ChangeCheck(CHANGED, thumbnail, changed_fraction,
+                               brightness_change, confirmed=result)
+        return ChangeCheck(result, thumbnail, changed_fraction,
+                           brightness_change)
+
+    def accept(self, check: ChangeCheck):
+        """Make a checked frame the baseline after it was fully analyzed."""
+        if check.rejected:
+            raise ValueError(f"An {check.result} frame cannot become the baseline")
+        self._baseline = check.thumbnail
+        self._reused = 0
+        self._rejected_result = None
+        self._rejected = 0
+
+    def reset(self):
+        """Forget the baseline so the next frame is analyzed."""
+        self._baseline = None
+        self._reused = 0
+        self._rejected_result = None
+        self._rejected = 0
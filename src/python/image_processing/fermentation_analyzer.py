@@ -1,123 +1,259 @@
 import cv2
-import numpy as np
 import time
 import subprocess
 import json
 from pathlib import Path
 
+from collections import OrderedDict
+
+from telemetry import REGISTRY, timed
+from .camera_capture import CameraCapture
+from .change_detector import LIGHTING, UNCHANGED, ChangeDetector
+from .frame_writer import FrameWriter
+from .frame_context import FrameContext
+from .metrics import compute_metrics
+from .reference_frame import ReferenceFrame
+from .segmentation import DoughSegmenter, expand_bbox, union_bbox
+
+FRAME_SECONDS = REGISTRY.histogram('analysis_frame_seconds',
+                                   "Time to compute all metrics for a frame")
+SEGMENTATION_SECONDS = REGISTRY.histogram('analysis_segmentation_seconds',
+                                          "Time to locate the dough in a frame")
+ANALYSIS_ERRORS = REGISTRY.counter('analysis_errors_total',
+                                   "Frames whose analysis failed")
+CHANGE_CHECKS = REGISTRY.counter(
+    'analysis_change_checks_total',
+    "Frames classified by the change detector before analysis", ['result'])
+REFERENCE_RELIGHTS = REGISTRY.counter(
+    'analysis_reference_relights_total',
+    "References rescaled to a lighting change that persisted")
+
 class FermentationAnalyzer:
-    def __init__(self, cpp_executable_path="/opt/fermentation-monitor/bin/fermentation_monitor"):
+    def __init__(
+            self,
+            cpp_executable_path="/opt/fermentation-monitor/bin/fermentation_monitor",
+            camera=None, capture_timeout=5.0, data_dir="/opt/fermentation-monitor/data",
+            frame_writer=None, save_frames=True, metric_names=None,
+            segmentation=True, work_size=480, change_detection=True):
         self.cpp_executable = cpp_executable_path
-        self.reference_image_path = "/opt/fermentation-monitor/data/reference.jpg"
-        self.current_image_path = "/opt/fermentation-monitor/data/current.jpg"
+        # Long-lived capture loop; the device stays open between samples
+        self._camera = camera
+        self.capture_timeout = capture_timeout
+        # Registered metrics to compute; None means all of them
+        self.metric_names = metric_names
+        # Metrics run on a crop around the tracked dough, at most work_size
+        # pixels across
+        self.segmentation = segmentation
+        self.work_size = work_size
+        self._segmenters = {}
+        # Frames that barely changed since the last analysis reuse its metrics;
+        # occluded frames and lighting jumps are not analyzed at all
+        self.change_detection = change_detection
+        self._change_detectors = {}
+        self._last_results = {}
+        self._reference_crops = OrderedDict()
+        self.reference_image_path = str(Path(data_dir) / "reference.jpg")
+        self.current_image_path = str(Path(data_dir) / "current.jpg")
+        
+        # Frames are persisted off the hot path; None disables persistence
+        if frame_writer is None and save_frames:
+            frame_writer = FrameWriter()
+        self.frame_writer = frame_writer
+
+        # Reference is kept decoded in memory and replaced only by set_reference()
+        self._reference = None
+        self._reference_loaded = False
         
         # Create data directory if it doesn't exist
-        Path("/opt/fermentation-monitor/data").mkdir(parents=True, exist_ok=True)
+        Path(data_dir).mkdir(parents=True, exist_ok=True)
+
+    @property
+    def camera(self):
+        # Opened on first use so analysis-only instances never touch a device
+        if self._camera is None:
+            self._camera = CameraCapture(0)
+        return self._camera
+        
+    def get_reference(self):
+        """Return the in-memory reference, loading the saved one on first use"""
+        if self._reference is None and not self._reference_loaded:
+            self._reference = ReferenceFrame.load(self.reference_image_path)
+            self._reference_loaded = True
+        return self._reference
+
+    def set_reference(self, frame):
+        """Replace the reference frame and persist it in the background"""
+        self._reference = ReferenceFrame(frame)
+        self._reference_loaded = True
+        if self.frame_writer is not None:
+            self.frame_writer.submit(self.reference_image_path, self._reference.frame)
+        return self._reference
         
     def capture_reference_image(self):
         """Capture and save reference image for comparison"""
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            print("Failed to open camera")
-            return False
-            
-        ret, frame = cap.read()
-        if ret:
-            cv2.imwrite(self.reference_image_path, frame)
-            cap.release()
+        self.camera.start()
+        with self.camera.latest_frame(self.capture_timeout) as frame:
+            if frame is None:
+                print("Failed to capture reference frame")
+                return False
+            self.set_reference(frame)
             return True
         
-        cap.release()
-        return False
-        
     def analyze(self):
         """Analyze current fermentation state"""
         try:
-            # Capture current image
-            cap = cv2.VideoCapture(0)
-            if not cap.isOpened():
-                print("Failed to open camera for analysis")
-                return None
-                
-            ret, frame = cap.read()
-            cap.release()
-            
-            if not ret:
-                print("Failed to capture frame")
-                return None
-                
-            # Save current frame
-            cv2.imwrite(self.current_image_path, frame)
-            
-            # If no reference image exists, use current as reference
-            if not Path(self.reference_image_path).exists():
-                cv2.imwrite(self.reference_image_path, frame)
-                
-            # Use Python OpenCV for analysis (fallback if C++ not available)
-            return self._analyze_with_python(frame)
+            self.camera.start()
+            with self.camera.latest_frame(self.capture_timeout) as frame:
+                if frame is None:
+                    print("Failed to capture frame")
+                    return None
+                return self.analyze_frame(frame)
             
         except Exception as e:
             print(f"Error in fermentation analysis: {e}")
             return None
             
+    def analyze_frame(self, frame):
+        """Analyze an already captured frame"""
+        # Save current frame
+        if self.frame_writer is not None:
+            self.frame_writer.submit(self.current_image_path, frame)
+
+        # If no reference image exists, use current as reference
+        if self.get_reference() is None:
+            if self.change_detection and self._change_detector(None).is_blank(frame):
+                print("Not using a blank frame as the reference")
+                return None
+            self.set_reference(frame)
+
+        # Use Python OpenCV for analysis (fallback if C++ not available)
+        return self._analyze_with_python(frame)
+
+    def analyze_stream(self, source):
+        """
+        Analyze every frame of a FrameSource, yielding one metrics dict per frame.
+
+        Metrics are timestamped with the source's frame time, so recorded
+        sequences can be replayed as fast as the analysis allows.
+        """
+        for timestamp, frame in source:
+            metrics = self.analyze_frame(frame)
+            if metrics is not None:
+                metrics['timestamp'] = timestamp
+                yield metrics
+
+    def close(self):
+        """Release the camera and finish pending frame writes"""
+        if self._camera is not None:
+            self._camera.stop()
+        if self.frame_writer is not None:
+            self.frame_writer.stop()
+
     def _analyze_with_python(self, current_frame):
         """Python-based image analysis"""
         try:
-            reference = cv2.imread(self.reference_image_path)
-            if reference is None:
-                return {
-                    'volume_change': 0.0,
-                    'surface_activity': 0.0,
-                    'bubble_count': 0,
-                    'texture_variance': self._calculate_texture_variance(current_frame),
-                    'timestamp': int(time.time())
-                }
-                
-            # Calculate metrics
-            volume_change = self._calculate_volume_change(current_frame, reference)
-            bubble_count = self._detect_bubbles(current_frame)
-            texture_variance = self._calculate_texture_variance(current_frame)
-            surface_activity = self._calculate_surface_activity(current_frame, reference)
-            
-            return {
-                'volume_change': volume_change,
-                'surface_activity': surface_activity,
-                'bubble_count': bubble_count,
-                'texture_variance': texture_variance,
-                'timestamp': int(time.time())
-            }
+            return self.compute_metrics(current_frame, self.get_reference())
             
         except Exception as e:
+            ANALYSIS_ERRORS.inc()
             print(f"Error in Python image analysis: {e}")
             return None
             
-    def _calculate_volume_change(self, current, reference):
-        gray_current = cv2.cvtColor(current, cv2.COLOR_BGR2GRAY)
-        gray_reference = cv2.cvtColor(reference, cv2.COLOR_BGR2GRAY)
-        
-        diff = cv2.absdiff(gray_current, gray_reference)
-        return np.sum(diff) / (current.shape[0] * current.shape[1])
+    def compute_metrics(self, current_frame, reference, source_id=None):
+        """Compute all metrics for a frame against an optional ReferenceFrame"""
+        if reference is not None and not isinstance(reference, ReferenceFrame):
+            reference = ReferenceFrame(reference)
+            
+        check = None
+        if self.change_detection:
+            detector = self._change_detector(source_id)
+            check = detector.check(current_frame)
+            CHANGE_CHECKS.labels(check.result).inc()
+            if check.rejected:
+                print(f"Skipping {check.result} frame "
+                      f"(brightness change {check.brightness_change:+.0%})")
+                return None
+            if (check.confirmed == LIGHTING and reference is not None
+                    and reference is self._reference):
+                # Compare against the reference as it looks under the new light
+                print(f"Relighting the reference by "
+                      f"{check.brightness_change:+.0%}")
+                REFERENCE_RELIGHTS.inc()
+                reference = self.set_reference(
+                    reference.relit(1.0 + check.brightness_change).frame)
+            last = self._last_results.get(source_id)
+            # Metrics relative to a replaced reference have to be recomputed
+            if check.result == UNCHANGED and last is not None and last[0] is reference:
+                metrics = dict(last[1])
+                metrics['timestamp'] = int(time.time())
+                return metrics
+
+        with timed(FRAME_SECONDS):
+            # One shared preprocessing context per frame for every metric
+            if self.segmentation:
+                context = self._dough_context(current_frame, reference, source_id)
+            else:
+                context = FrameContext(current_frame, reference)
+            metrics = compute_metrics(context, self.metric_names)
+        metrics['timestamp'] = int(time.time())
+        if check is not None:
+            detector.accept(check)
+            self._last_results[source_id] = (reference, dict(metrics))
+        return metrics
         
-    def _detect_bubbles(self, image):
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (9, 9), 2)
-        _, thresh = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    def _change_detector(self, source_id):
+        detector = self._change_detectors.get(source_id)
+        if detector is None:
+            detector = self._change_detectors[source_id] = ChangeDetector()
+        return detector
         
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    def _dough_context(self, frame, reference, source_id):
+        """Context restricted to the tracked dough at reduced resolution"""
+        # Each source is tracked separately; the dough moves independently per tray
+        segmenter = self._segmenters.get(source_id)
+        if segmenter is None:
+            segmenter = self._segmenters[source_id] = DoughSegmenter()
+        with timed(SEGMENTATION_SECONDS):
+            region = segmenter.segment(frame)
+        if region is None:
+            return FrameContext(frame, reference)
+
+        reference_region = reference.region if reference is not None else None
+        bbox = region.bbox
+        if reference_region is not None and reference.shape == frame.shape:
+            # Cover both the current and the original extent of the dough
+            bbox = union_bbox(bbox, reference_region.bbox)
+        # Snapped to a grid so the reference crop can be reused while the dough
+        # barely moves
+        x, y, w, h = expand_bbox(bbox, 0.05, frame.shape, align=16)
+        # Integer factors with an exactly divisible crop keep INTER_AREA on its
+        # fast path
+        scale = max(1, -(-max(w, h) // self.work_size))
+        bbox = (x, y, w - w % scale, h - h % scale)
         
-        bubble_count = 0
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            if 10 < area < 1000:
-                bubble_count += 1
-                
-        return bubble_count
+        cropped_reference = None
+        if reference is not None and reference.shape == frame.shape:
+            cropped_reference = self._reference_crop(reference, bbox, scale)
+        return FrameContext(self._crop(frame, bbox, scale), cropped_reference,
+                            region=region, reference_region=reference_region,
+                            scale=scale)
         
-    def _calculate_texture_variance(self, image):
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        return np.var(gray)
+    def _reference_crop(self, reference, bbox, scale):
+        key = (id(reference), bbox)
+        cached = self._reference_crops.get(key)
+        if cached is not None and cached[0] is reference:
+            self._reference_crops.move_to_end(key)
+            return cached[1]
+        cropped = ReferenceFrame(self._crop(reference.frame, bbox, scale))
+        self._reference_crops[key] = (reference, cropped)
+        while len(self._reference_crops) > 8:
+            self._reference_crops.popitem(last=False)
+        return cropped
         
-    def _calculate_surface_activity(self, current, reference):
-        diff = cv2.absdiff(current, reference)
-        mean_diff = np.mean(diff)
-        return float(mean_diff)
\ No newline at end of file
+    @staticmethod
+    def _crop(frame, bbox, scale):
+        x, y, w, h = bbox
+        crop = frame[y:y + h, x:x + w]
+        if scale == 1:
+            return crop
+        return cv2.resize(crop, (w // scale, h // scale), interpolation=cv2.INTER_AREA)
\ No newline at end of file
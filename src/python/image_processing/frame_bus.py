@@ -0,0 +1,301 @@
+"""
+Shared-memory frame bus between processes.
+
+Sending frames to analysis processes through a multiprocessing queue pickles
+and copies every frame twice. A FrameBus instead keeps a ring of frame slots
+in one multiprocessing.shared_memory segment: the capture side copies each
+frame into the next slot once, and readers in other processes attach by name
+and get numpy views of the slots without any copy.
+
+Slots are reused in order, so a slow reader can find its frame already
+overwritten. Every slot carries a version number that the writer makes odd
+while it writes and even when it is done (a seqlock); readers check it before
+and after using a frame, so reader lag and frames torn mid-read are detected
+and counted instead of silently analyzed. There is exactly one writer.
+"""
+
+from typing import Optional
+from multiprocessing import resource_tracker, shared_memory
+import time
+import numpy as np
+
+# Header fields (int64)
+_SLOTS, _SLOT_BYTES, _HEAD, _HEADER_FIELDS = 0, 1, 2, 4
+# Per-slot metadata fields (int64)
+_VERSION, _SEQUENCE, _HEIGHT, _WIDTH, _CHANNELS, _META_FIELDS = 0, 1, 2, 3, 4, 5
+
+# Slot size used when none is given: one 1080p BGR frame
+DEFAULT_SLOT_BYTES = 1920 * 1080 * 3
+
+
+def share_with_children():
+    """
+    Start the resource tracker before worker processes are created.
+
+    Processes started afterwards share it, so a segment attached by a worker
+    is not unlinked when that worker exits.
+    """
+    resource_tracker.ensure_running()
+
+
+class BusFrame:
+    """A frame borrowed from a bus slot; array is a view into shared memory."""
+
+    __slots__ = ('sequence', 'timestamp', 'array', '_meta', '_slot', '_version')
+
+    def __init__(self, sequence: int, timestamp: float, array: np.ndarray,
+                 meta: np.ndarray, slot: int, version: int):
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.array = array
+        self._meta = meta
+        self._slot = slot
+        self._version = version
+
+    @property
+    def consistent(self) -> bool:
+        """Whether the slot still holds this frame.
+
+        True means nothing read from array was overwritten.
+        """
+        return int(self._meta[self._slot, _VERSION]) == self._version
+
+
+class FrameBus:
+    """Ring of frame slots in shared memory.
+
+    There is one writer and any number of readers.
+    """
+
+    def __init__(self, slots: int = 8, slot_bytes: int = DEFAULT_SLOT_BYTES,
+                 name: Optional[str] = None):
+        """
+        Initialize FrameBus, creating a new shared memory segment.
+
+        Args:
+            slots: Frames kept before the oldest slot is reused
+            slot_bytes: Largest frame, in bytes, a slot can hold
+            name: Segment name (generated if None); readers attach with it
+        """
+        if slots < 1 or slot_bytes < 1:
+            raise ValueError("slots and slot_bytes must be positive")
+        size = self._data_offset(slots) + slots * slot_bytes
+        self._memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self._owner = True
+        self._map(slots, slot_bytes)
+        self._header[:] = 0
+        self._header[_SLOTS] = slots
+        self._header[_SLOT_BYTES] = slot_bytes
+        self._meta[:] = 0
+        self.published = 0
+
+    @classmethod
+    def attach(cls, name: str) -> 'FrameBus':
+        """Open an existing bus, typically in another process."""
+        bus = cls.__new__(cls)
+        try:
+            memory = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 attaching always registers with the resource
+            # tracker; share_with_children() keeps that from unlinking it
+            memory = shared_memory.SharedMemory(name=name)
+        bus._memory = memory
+        bus._owner = False
+        header = np.ndarray((_HEADER_FIELDS,), np.int64, buffer=memory.buf)
+        slots, slot_bytes = int(header[_SLOTS]), int(header[_SLOT_BYTES])
+        del header
+        bus._map(slots, slot_bytes)
+        bus.published = 0
+        return bus
+
+    @staticmethod
+    def _data_offset(slots: int) -> int:
+        metadata = 8 * (_HEADER_FIELDS + slots * (_META_FIELDS + 1))
+        # Slots start on a cache line
+        return -(-metadata // 64) * 64
+
+    def _map(self, slots: int, slot_bytes: int):
+        buffer = self._memory.buf
+        self._header = np.ndarray((_HEADER_FIELDS,), np.int64, buffer=buffer)
+        offset = 8 * _HEADER_FIELDS
+        self._meta = np.ndarray((slots, _META_FIELDS), np.int64, buffer=buffer,
+                                offset=offset)
+        offset += 8 * slots * _META_FIELDS
+        self._times = np.ndarray((slots,), np.float64, buffer=buffer, offset=offset)
+        self._data = np.ndarray((slots * slot_bytes,), np.uint8, buffer=buffer,
+                                offset=self._data_offset(slots))
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    @property
+    def slots(self) -> int:
+        return int(self._header[_SLOTS])
+
+    @property
+    def slot_bytes(self) -> int:
+        return int(self._header[_SLOT_BYTES])
+
+    @property
+    def head(self) -> int:
+        """Sequence number of the newest frame (0 before the first)."""
+        return int(self._header[_HEAD])
+
+    def fits(self, frame: np.ndarray) -> bool:
+        return (frame.dtype == np.uint8 and frame.ndim in (2, 3)
+                and frame.nbytes <= self.slot_bytes)
+
+    def publish(self, frame: np.ndarray, timestamp: Optional[float] = None) -> int:
+        """
+        Copy a uint8 frame into the next slot.
+
+        Returns:
+            The frame's sequence number (1, 2, ...)
+        """
+        if not self.fits(frame):
+            raise ValueError(f"Frame {frame.shape} {frame.dtype} does not fit a "
+                             f"{self.slot_bytes} byte slot")
+        sequence = self.head + 1
+        slot = (sequence - 1) % self.slots
+        meta = self._meta[slot]
+        # Odd version: readers of this slot see it is being rewritten
+        meta[_VERSION] += 1
+        start = slot * self.slot_bytes
+        np.copyto(self._data[start:start + frame.nbytes].reshape(frame.shape), frame)
+        meta[_SEQUENCE] = sequence
+        meta[_HEIGHT], meta[_WIDTH] = frame.shape[:2]
+        meta[_CHANNELS] = frame.shape[2] if frame.ndim == 3 else 0
+        self._times[slot] = time.time() if timestamp is None else timestamp
+        meta[_VERSION] += 1
+        self._header[_HEAD] = sequence
+        self.published += 1
+        return sequence
+
+    def read(self, sequence: int) -> Optional[BusFrame]:
+        """
+        Borrow the frame with a sequence number without copying it.
+
+        Returns None if the frame was already overwritten (or is being
+        overwritten). Check BusFrame.consistent after using the frame.
+        """
+        if sequence < 1:
+            return None
+        slot = (sequence - 1) % self.slots
+        meta = self._meta[slot]
+        version = int(meta[_VERSION])
+        if version % 2:
+            return None
+        height, width = int(meta[_HEIGHT]), int(meta[_WIDTH])
+        channels = int(meta[_CHANNELS])
+        timestamp = float(self._times[slot])
+        if int(meta[_SEQUENCE]) != sequence or int(meta[_VERSION]) != version:
+            return None
+        shape = (height, width, channels) if channels else (height, width)
+        start = slot * self.slot_bytes
+        array = self._data[start:start + int(np.prod(shape))].reshape(shape)
+        return BusFrame(sequence, timestamp, array, self._meta, slot, version)
+
+    def latest(self) -> Optional[BusFrame]:
+        return self.read(self.head)
+
+    def get_stats(self) -> dict:
+        return {
+            'name': self.name,
+            'slots': self.slots,
+            'slot_bytes': self.slot_bytes,
+            'head': self.head,
+            'published': self.published,
+        }
+
+    def close(self):
+        """Detach from the segment; frames still borrowed keep it mapped."""
+        self._header = self._meta = self._times = self._data = None
+        try:
+            self._memory.close()
+        except BufferError:
+            pass
+
+    def unlink(self):
+        """Remove the segment (creator only) once every process is done with it."""
+        if self._owner:
+            self._memory.unlink()
+
+
+class FrameReader:
+    """
+    Sequential consumer of a bus that accounts for frames it never saw.
+
+    lagged counts frames overwritten before the reader got to them; torn
+    counts frames overwritten while the reader was still using them.
+    """
+
+    def __init__(self, bus: FrameBus, poll_interval: float = 0.001):
+        """
+        Initialize FrameReader.
+
+        Args:
+            bus: Bus to read from
+            poll_interval: Seconds between checks for a new frame
+        """
+        self.bus = bus
+        self.poll_interval = poll_interval
+        self.last_sequence = bus.head
+        self.read = 0
+        self.lagged = 0
+        self.torn = 0
+
+    @property
+    def lag(self) -> int:
+        """Frames published but not yet read."""
+        return self.bus.head - self.last_sequence
+
+    def next(self, timeout: Optional[float] = None) -> Optional[BusFrame]:
+        """Wait for the next frame.
+
+        If the reader fell behind, it skips to the oldest frame left.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            head = self.bus.head
+            if head > self.last_sequence:
+                oldest = max(self.last_sequence + 1, head - self.bus.slots + 1)
+                frame = self.bus.read(oldest)
+                if frame is None:
+                    # Overwritten between reading head and the slot; try the newer ones
+                    self.lagged += oldest - self.last_sequence
+                    self.last_sequence = oldest
+                    continue
+                self.lagged += oldest - self.last_sequence - 1
+                self.last_sequence = oldest
+                self.read += 1
+                return frame
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_interval)
+
+    def done(self, frame: BusFrame) -> bool:
+        """Finish using a frame.
+
+        Returns False, and counts the frame as torn, if it was overwritten
+        meanwhile.
+        """
+        if frame.consistent:
+            return True
+        self.torn += 1
+        return False
+
+    def get_stats(self) -> dict:
+        return {'read': self.read, 'lagged': self.lagged, 'torn': self.torn,
+                'lag': self.lag}
+
+
+_attached = {}
+
+
+def attach(name: str) -> FrameBus:
+    """Bus attached once per process and then reused."""
+    bus = _attached.get(name)
+    if bus is None:
+        bus = _attached[name] = FrameBus.attach(name)
+    return bus
@@ -0,0 +1,92 @@
+"""
+Per-frame preprocessing shared by all fermentation metrics.
+
+A FrameContext computes each intermediate (grayscale, diff against the
+reference, detected bubbles) at most once, on first access, so metrics that
+need the same intermediate reuse it instead of recomputing.
+"""
+
+from functools import cached_property
+from typing import Optional
+import cv2
+import numpy as np
+
+from .bubble_detection import BubbleDetector, BubbleDistribution
+from .reference_frame import ReferenceFrame
+from .segmentation import DoughRegion
+
+DEFAULT_BUBBLE_DETECTOR = BubbleDetector()
+
+
+class FrameContext:
+    """Lazily computed intermediates for one frame."""
+
+    def __init__(self, frame: np.ndarray, reference: Optional[ReferenceFrame] = None,
+                 region: Optional[DoughRegion] = None,
+                 reference_region: Optional[DoughRegion] = None, scale: float = 1.0,
+                 bubble_detector: Optional[BubbleDetector] = None):
+        """
+        Initialize FrameContext.
+
+        Args:
+            frame: BGR frame being analyzed (possibly a downscaled dough crop)
+            reference: Optional reference the frame is compared against, cropped
+                       and scaled like frame
+            region: Segmented dough in the full-resolution frame
+            reference_region: Segmented dough in the full-resolution reference
+            scale: Full-resolution pixels per pixel of frame (linear)
+            bubble_detector: Detector for the bubble metrics (default size
+                             bands if None)
+        """
+        self.frame = frame
+        self.reference = reference
+        self.region = region
+        self.reference_region = reference_region
+        self.scale = scale
+        self.bubble_detector = bubble_detector or DEFAULT_BUBBLE_DETECTOR
+
+    @property
+    def has_reference(self) -> bool:
+        return self.reference is not None
+
+    @property
+    def has_region(self) -> bool:
+        return self.region is not None
+
+    @property
+    def pixel_count(self) -> int:
+        return self.frame.shape[0] * self.frame.shape[1]
+
+    @property
+    def dough_pixels(self) -> float:
+        """Dough area in pixels of frame, or the whole frame without a region."""
+        if self.region is None:
+            return float(self.pixel_count)
+        return min(float(self.pixel_count),
+                   self.region.area / (self.scale * self.scale))
+
+    @cached_property
+    def gray(self) -> np.ndarray:
+        return cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+
+    @cached_property
+    def gray_diff(self) -> np.ndarray:
+        """Absolute grayscale difference against the reference."""
+        return cv2.absdiff(self.gray, self.reference.gray)
+
+    @cached_property
+    def color_diff(self) -> np.ndarray:
+        """Absolute per-channel difference against the reference."""
+        return cv2.absdiff(self.frame, self.reference.frame)
+
+    @cached_property
+    def bubbles(self) -> BubbleDistribution:
+        """Bubbles in the frame, sized relative to the dough.
+
+        Without a region they are sized relative to the frame's short side.
+        """
+        if self.region is None:
+            return self.bubble_detector.detect(self.gray)
+        # Equivalent diameter of the dough, in pixels of frame
+        length = 2.0 * np.sqrt(self.dough_pixels / np.pi)
+        return self.bubble_detector.detect(self.gray, length, self.dough_pixels)
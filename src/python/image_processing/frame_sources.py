@@ -0,0 +1,309 @@
+"""
+Pluggable frame sources for fermentation analysis.
+
+Every source is an iterable of (timestamp, frame) pairs, so live cameras,
+recorded videos, directories of JPEGs and synthetic sequences can all feed
+FermentationAnalyzer.analyze_stream() and BatchAnalyzer the same way.
+PrefetchingSource wraps any source and decodes ahead on a background thread.
+
+Replay benchmark (from src/python):
+    python -m image_processing.frame_sources /path/to/proof.mp4
+"""
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterator, Optional, Tuple, Union
+import argparse
+import os
+import queue
+import tempfile
+import threading
+import time
+import cv2
+import numpy as np
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+TimedFrame = Tuple[float, np.ndarray]
+
+
+class FrameSource(ABC):
+    """Base class for iterables of (timestamp, frame) pairs."""
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[TimedFrame]:
+        """Yield (timestamp, frame) pairs in order."""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class CameraSource(FrameSource):
+    """
+    Frames from a running CameraCapture.
+
+    Each yielded frame is a zero-copy view that stays valid until the next
+    frame is requested.
+    """
+
+    def __init__(self, camera, max_frames: Optional[int] = None, timeout: float = 5.0):
+        self.camera = camera
+        self.max_frames = max_frames
+        self.timeout = timeout
+
+    def __iter__(self) -> Iterator[TimedFrame]:
+        self.camera.start()
+        sequence = 0
+        count = 0
+        while self.max_frames is None or count < self.max_frames:
+            with self.camera.latest_frame(self.timeout, newer_than=sequence) as frame:
+                if frame is None:
+                    return
+                sequence = self.camera.latest_sequence()
+                yield time.time(), frame
+            count += 1
+
+
+class VideoFileSource(FrameSource):
+    """Frames decoded from a video file, timestamped by stream position."""
+
+    def __init__(self, file_path: str, start_time: Optional[float] = None):
+        self.file_path = str(file_path)
+        self.start_time = start_time
+
+    def __iter__(self) -> Iterator[TimedFrame]:
+        capture = cv2.VideoCapture(self.file_path)
+        if not capture.isOpened():
+            raise IOError(f"Could not open video {self.file_path}")
+        base = self.start_time
+        if base is None:
+            base = os.stat(self.file_path).st_mtime
+        try:
+            while True:
+                ret, frame = capture.read()
+                if not ret:
+                    break
+                yield base + capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0, frame
+        finally:
+            capture.release()
+
+
+class DirectorySource(FrameSource):
+    """Images in a directory in file name order, timestamped by mtime."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def __iter__(self) -> Iterator[TimedFrame]:
+        files = sorted(p for p in self.directory.iterdir()
+                       if p.suffix.lower() in IMAGE_EXTENSIONS)
+        for file_path in files:
+            frame = cv2.imread(str(file_path))
+            if frame is None:
+                print(f"Could not load image from {file_path}")
+                continue
+            yield os.stat(file_path).st_mtime, frame
+
+
+class ArraySource(FrameSource):
+    """Frames of a stacked (N, H, W, 3) array at a fixed interval."""
+
+    def __init__(self, frames: np.ndarray, start_time: Optional[float] = None,
+                 interval: float = 1.0):
+        self.frames = frames
+        self.start_time = start_time
+        self.interval = interval
+
+    def __iter__(self) -> Iterator[TimedFrame]:
+        base = time.time() if self.start_time is None else self.start_time
+        for index in range(self.frames.shape[0]):
+            yield base + index * self.interval, self.frames[index]
+
+
+class SyntheticSource(FrameSource):
+    """
+    Generated images of a rising dough ball.
+
+    The dough follows a logistic growth curve and gains bubbles as it rises,
+    which is enough to exercise every metric without a camera.
+    """
+
+    def __init__(self, frame_count: int = 100, width: int = 640, height: int = 480,
+                 interval: float = 60.0, start_time: float = 0.0, growth: float = 1.0,
+                 seed: int = 0):
+        """
+        Initialize SyntheticSource.
+
+        Args:
+            frame_count: Number of frames to generate
+            width: Frame width in pixels
+            height: Frame height in pixels
+            interval: Simulated seconds between frames
+            start_time: Timestamp of the first frame
+            growth: Relative size increase at the end of the proof (1.0 doubles
+                    the area)
+            seed: Random seed for texture and bubble placement
+        """
+        self.frame_count = frame_count
+        self.width = width
+        self.height = height
+        self.interval = interval
+        self.start_time = start_time
+        self.growth = growth
+        self.seed = seed
+
+    def __iter__(self) -> Iterator[TimedFrame]:
+        rng = np.random.default_rng(self.seed)
+        background = np.full((self.height, self.width, 3), (60, 60, 70), dtype=np.uint8)
+        texture = rng.integers(-12, 12, (self.height, self.width, 1), dtype=np.int16)
+        center = (self.width // 2, self.height // 2)
+        base_radius = min(self.width, self.height) * 0.25
+        bubbles = rng.random((200, 3))
+
+        for index in range(self.frame_count):
+            progress = index / max(1, self.frame_count - 1)
+            # Logistic rise centered on the middle of the proof
+            scale = 1.0 + self.growth / (1.0 + np.exp(-10.0 * (progress - 0.5)))
+            radius = int(base_radius * np.sqrt(scale))
+
+            frame = background.copy()
+            cv2.circle(frame, center, radius, (170, 215, 235), -1)
+            visible = int(len(bubbles) * progress)
+            for bx, by, bs in bubbles[:visible]:
+                angle = bx * 2 * np.pi
+                distance = by * radius * 0.9
+                position = (int(center[0] + distance * np.cos(angle)),
+                            int(center[1] + distance * np.sin(angle)))
+                cv2.circle(frame, position, max(1, int(2 + bs * radius * 0.04)),
+                           (120, 160, 180), -1)
+            frame = np.clip(frame.astype(np.int16) + texture, 0, 255).astype(np.uint8)
+            yield self.start_time + index * self.interval, frame
+
+
+class PrefetchingSource(FrameSource):
+    """Decode frames of another source ahead of time on a background thread."""
+
+    _END = object()
+
+    def __init__(self, source: FrameSource, depth: int = 8):
+        """
+        Initialize PrefetchingSource.
+
+        Args:
+            source: Source to read from
+            depth: Maximum number of decoded frames buffered ahead of the consumer
+        """
+        self.source = source
+        self.depth = depth
+        self._stop = threading.Event()
+
+    def __iter__(self) -> Iterator[TimedFrame]:
+        frames = queue.Queue(maxsize=self.depth)
+        self._stop.clear()
+
+        def put(item) -> bool:
+            while not self._stop.is_set():
+                try:
+                    frames.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def producer():
+            try:
+                # Camera frames are views into the ring buffer and must be copied
+                copy_frames = isinstance(self.source, CameraSource)
+                for item in self.source:
+                    if copy_frames:
+                        item = (item[0], item[1].copy())
+                    if not put(item):
+                        return
+                put(self._END)
+            except Exception as e:
+                put(e)
+
+        thread = threading.Thread(target=producer, name="frame-prefetch")
+        thread.daemon = True
+        thread.start()
+        try:
+            while True:
+                item = frames.get()
+                if item is self._END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self._stop.set()
+            thread.join(1.0)
+
+    def close(self):
+        self._stop.set()
+        self.source.close()
+
+
+def open_source(source: Union[str, int, np.ndarray, FrameSource],
+                start_time: Optional[float] = None,
+                interval: float = 1.0) -> FrameSource:
+    """
+    Build a FrameSource from a path, camera index or frame array.
+
+    Args:
+        source: Directory, video file, camera index, (N, H, W, 3) array or a
+                FrameSource
+        start_time: Timestamp of the first frame for videos and arrays
+        interval: Seconds between frames of an array
+    """
+    if isinstance(source, FrameSource):
+        return source
+    if isinstance(source, np.ndarray):
+        return ArraySource(source, start_time, interval)
+    if isinstance(source, int):
+        from .camera_capture import CameraCapture
+        return CameraSource(CameraCapture(source))
+    if Path(source).is_dir():
+        return DirectorySource(source)
+    return VideoFileSource(source, start_time)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay a frame sequence through the analyzer at full speed")
+    parser.add_argument('source', nargs='?',
+                        help="Directory of images or video file (default: synthetic)")
+    parser.add_argument('--frames', type=int, default=720, help="Synthetic frame count")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--no-prefetch', action='store_true',
+                        help="Decode on the analysis thread")
+    args = parser.parse_args()
+
+    from .fermentation_analyzer import FermentationAnalyzer
+
+    if args.source:
+        source = open_source(args.source)
+    else:
+        source = SyntheticSource(args.frames, args.width, args.height)
+    if not args.no_prefetch:
+        source = PrefetchingSource(source)
+
+    analyzer = FermentationAnalyzer(data_dir=tempfile.mkdtemp(), save_frames=False)
+    count = 0
+    start = time.time()
+    for _ in analyzer.analyze_stream(source):
+        count += 1
+    elapsed = time.time() - start
+    rate = count / max(elapsed, 1e-9)
+    print(f"Analyzed {count} frames in {elapsed:.2f}s ({rate:.1f} frames/s)")
+
+
+if __name__ == "__main__":
+    main()
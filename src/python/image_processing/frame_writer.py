@@ -0,0 +1,126 @@
+"""
+Asynchronous frame persistence.
+
+FrameWriter moves JPEG encoding and SD-card I/O off the analysis hot path.
+Frames are handed to a background thread; if several frames are queued for
+the same path only the newest one is written.
+"""
+
+from typing import Dict, Optional
+import os
+import threading
+import cv2
+import numpy as np
+
+
+class FrameWriter:
+    """Background thread writing frames to disk."""
+
+    def __init__(self, max_pending: int = 8, jpeg_quality: int = 90):
+        """
+        Initialize FrameWriter.
+
+        Args:
+            max_pending: Maximum number of distinct paths waiting to be written
+            jpeg_quality: JPEG quality used for .jpg/.jpeg paths
+        """
+        self.max_pending = max_pending
+        self.jpeg_quality = jpeg_quality
+
+        self.frames_written = 0
+        self.frames_coalesced = 0
+        self.frames_dropped = 0
+        self.write_errors = 0
+
+        self._pending: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._writing = False
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._write_loop, name="frame-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Write everything still pending, then stop the thread."""
+        self.flush(timeout)
+        self._running = False
+        with self._lock:
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, file_path: str, frame: np.ndarray) -> bool:
+        """
+        Queue a frame for writing.
+
+        The frame is copied, so the caller may keep using its buffer.
+
+        Returns:
+            False if the frame was dropped because the queue is full
+        """
+        self.start()
+        with self._lock:
+            if file_path in self._pending:
+                self.frames_coalesced += 1
+            elif len(self._pending) >= self.max_pending:
+                self.frames_dropped += 1
+                return False
+            self._pending[file_path] = np.array(frame, copy=True)
+            self._changed.notify_all()
+        return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until all queued frames are on disk."""
+        with self._lock:
+            return self._changed.wait_for(
+                lambda: not self._pending and not self._writing, timeout)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'frames_written': self.frames_written,
+            'frames_coalesced': self.frames_coalesced,
+            'frames_dropped': self.frames_dropped,
+            'write_errors': self.write_errors,
+        }
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                while self._running and not self._pending:
+                    self._changed.wait()
+                if not self._pending:
+                    return
+                file_path, frame = self._pending.popitem()
+                self._writing = True
+            try:
+                self._write(file_path, frame)
+                self.frames_written += 1
+            except Exception as e:
+                self.write_errors += 1
+                print(f"Error writing frame to {file_path}: {e}")
+            finally:
+                with self._lock:
+                    self._writing = False
+                    self._changed.notify_all()
+
+    def _write(self, file_path: str, frame: np.ndarray):
+        params = []
+        extension = os.path.splitext(file_path)[1].lower()
+        if extension in ('.jpg', '.jpeg'):
+            params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        # Write to a temporary file first so readers never see a partial image
+        temp_path = f"{file_path}.tmp{extension}"
+        if not cv2.imwrite(temp_path, frame, params):
+            raise IOError("imwrite failed")
+        os.replace(temp_path, file_path)
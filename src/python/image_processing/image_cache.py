@@ -0,0 +1,130 @@
+"""
+Decoded image cache for repeatedly loaded files.
+
+Offline tools and tests load the same reference and sample images over and
+over. ImageCache keeps decoded images in memory up to a byte budget and
+evicts the least recently used ones. An entry is only reused while the
+file's modification time and size are unchanged, so edited files are
+decoded again. Cached arrays are shared between callers and therefore
+read-only; callers that need to modify an image copy it first.
+
+Previews can ask for a reduced decode (1/2, 1/4 or 1/8 of the size), which
+for JPEG skips most of the decoding work instead of resizing afterwards.
+"""
+
+from collections import OrderedDict
+from typing import Optional
+import os
+import threading
+import cv2
+import numpy as np
+
+# Linear reduction factor -> imread flag
+REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ImageCache:
+    """LRU cache of decoded images with a memory budget in bytes."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize ImageCache.
+
+        Args:
+            max_bytes: Total size of cached pixel data; 0 disables caching
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # (path, reduction) -> (mtime_ns, size, image), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, file_path: str, reduction: int = 1) -> Optional[np.ndarray]:
+        """
+        Decoded BGR image of a file, from the cache when the file is unchanged.
+
+        Args:
+            file_path: Image file to load
+            reduction: Decode at 1/reduction of the size (1, 2, 4 or 8)
+
+        Returns:
+            Read-only image, or None if the file is missing or cannot be decoded
+        """
+        flag = REDUCED_FLAGS.get(reduction)
+        if flag is None:
+            raise ValueError(f"reduction must be one of {sorted(REDUCED_FLAGS)}")
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+
+        key = (os.path.abspath(file_path), reduction)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+
+        # Decoded outside the lock so other files can be served meanwhile
+        image = cv2.imread(file_path, flag)
+        if image is None:
+            return None
+        image.flags.writeable = False
+        self._store(key, stat, image)
+        return image
+
+    def _store(self, key, stat, image: np.ndarray):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[2].nbytes
+            if image.nbytes > self.max_bytes:
+                return
+            self._entries[key] = (stat.st_mtime_ns, stat.st_size, image)
+            self.current_bytes += image.nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def invalidate(self, file_path: str):
+        """Drop every cached decode of a file."""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == path]:
+                self.current_bytes -= self._entries.pop(key)[2].nbytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Shared by every ImageProcessor that is not given its own cache
+default_cache = ImageCache()
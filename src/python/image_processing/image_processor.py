@@ -5,9 +5,10 @@ Handles image loading and processing.
 
 from typing import Optional, Tuple
 import os
-import cv2
 import numpy as np
 
+from .image_cache import ImageCache, default_cache
+
 
 class ImageData:
     """Structure to hold image data and metadata."""
@@ -24,9 +25,11 @@ class ImageProcessor:
     Image processor for fermentation monitoring.
     
     Handles loading images from files and basic image processing operations.
+    Loaded images come from an ImageCache and are read-only.
     """
     
-    def __init__(self, image_data: Optional[np.ndarray] = None, width: int = 0, height: int = 0):
+    def __init__(self, image_data: Optional[np.ndarray] = None, width: int = 0,
+                 height: int = 0, cache: Optional[ImageCache] = None):
         """
         Initialize ImageProcessor.
         
@@ -34,31 +37,32 @@ class ImageProcessor:
             image_data: Optional numpy array containing image data
             width: Image width in pixels
             height: Image height in pixels
+            cache: Cache of decoded files (the shared default cache if None)
         """
         self._image_data = image_data
         self._width = width
         self._height = height
+        self.cache = cache if cache is not None else default_cache
     
-    def load_from_file(self, file_path: str) -> ImageData:
+    def load_from_file(self, file_path: str, reduction: int = 1) -> ImageData:
         """
         Load image from file using OpenCV.
         
         Args:
             file_path: Path to the image file
+            reduction: Decode at 1/reduction of the size (1, 2, 4 or 8), e.g.
+                for previews
             
         Returns:
             ImageData object containing image data and metadata
         """
         try:
-            # Check if file exists
-            if not os.path.exists(file_path):
-                return ImageData()  # Return invalid ImageData
-            
-            # Load image using OpenCV
-            image_data = cv2.imread(file_path)
+            # Decoded once per file version; missing files give None
+            image_data = self.cache.load(file_path, reduction)
             
             if image_data is None:
-                print(f"Could not load image from {file_path}")
+                if os.path.exists(file_path):
+                    print(f"Could not load image from {file_path}")
                 return ImageData()  # Return invalid ImageData
             
             # Get image dimensions
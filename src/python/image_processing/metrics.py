@@ -0,0 +1,120 @@
+"""
+Registry of fermentation metrics.
+
+Each metric is a function taking a FrameContext and returning a number.
+Metrics are registered by name with register_metric(); the analyzer runs
+every registered metric against one shared context per frame, so new
+metrics get the cached intermediates for free.
+"""
+
+from typing import Callable, Dict, Iterable, Optional
+import numpy as np
+
+from telemetry import REGISTRY, timed
+from .frame_context import FrameContext
+
+# Shared intermediates are charged to the first metric that needs them
+METRIC_SECONDS = REGISTRY.histogram('analysis_metric_seconds',
+                                    "Time to compute one metric for a frame",
+                                    ['metric'])
+METRIC_ERRORS = REGISTRY.counter('analysis_metric_errors_total',
+                                 "Metric computations that raised", ['metric'])
+
+
+class MetricSpec:
+    """A registered metric and how to handle frames without a reference."""
+
+    def __init__(self, name: str, func: Callable[[FrameContext], float],
+                 requires_reference: bool = False, default=0.0,
+                 requires_region: bool = False):
+        self.name = name
+        self.func = func
+        self.requires_reference = requires_reference
+        self.requires_region = requires_region
+        self.default = default
+        self.seconds = METRIC_SECONDS.labels(name)
+        self.errors = METRIC_ERRORS.labels(name)
+
+
+METRICS: Dict[str, MetricSpec] = {}
+
+
+def register_metric(name: str, requires_reference: bool = False, default=0.0,
+                    requires_region: bool = False):
+    """
+    Decorator registering a metric function under a name.
+
+    Args:
+        name: Key of the metric in the result dictionary
+        requires_reference: Whether the metric compares against the reference
+        default: Value reported when a required reference or region is missing
+        requires_region: Whether the metric needs the segmented dough region
+    """
+    def decorator(func):
+        METRICS[name] = MetricSpec(name, func, requires_reference, default,
+                                   requires_region)
+        return func
+    return decorator
+
+
+def compute_metrics(context: FrameContext,
+                    names: Optional[Iterable[str]] = None) -> dict:
+    """Run the named metrics (all registered ones by default) on a context."""
+    results = {}
+    for name in (names if names is not None else list(METRICS)):
+        spec = METRICS[name]
+        if ((spec.requires_reference and not context.has_reference) or
+                (spec.requires_region and not context.has_region)):
+            results[name] = spec.default
+        else:
+            with timed(spec.seconds, spec.errors):
+                results[name] = spec.func(context)
+    return results
+
+
+@register_metric('volume_change', requires_reference=True)
+def volume_change(context: FrameContext) -> float:
+    return float(np.sum(context.gray_diff) / context.pixel_count)
+
+
+@register_metric('surface_activity', requires_reference=True)
+def surface_activity(context: FrameContext) -> float:
+    return float(np.mean(context.color_diff))
+
+
+@register_metric('bubble_count', default=0)
+def bubble_count(context: FrameContext) -> int:
+    return context.bubbles.count
+
+
+@register_metric('bubble_size', default=None)
+def bubble_size(context: FrameContext) -> Optional[float]:
+    """Median bubble diameter as a percentage of the dough's diameter."""
+    median = context.bubbles.median_diameter
+    return None if median is None else 100.0 * median
+
+
+@register_metric('bubble_coverage')
+def bubble_coverage(context: FrameContext) -> float:
+    """Percentage of the dough surface covered by bubbles."""
+    return 100.0 * context.bubbles.coverage
+
+
+@register_metric('texture_variance')
+def texture_variance(context: FrameContext) -> float:
+    return float(np.var(context.gray))
+
+
+@register_metric('dough_area', requires_region=True, default=None)
+def dough_area(context: FrameContext) -> float:
+    """Segmented dough area in full-resolution pixels."""
+    return float(context.region.area)
+
+
+@register_metric('area_change', requires_region=True, default=None)
+def area_change(context: FrameContext) -> Optional[float]:
+    """Dough area change relative to the reference, in percent."""
+    if context.reference_region is None or context.reference_region.area <= 0:
+        return None
+    return float(100.0 * (context.region.area - context.reference_region.area) /
+                 context.reference_region.area)
@@ -0,0 +1,71 @@
+"""
+In-memory reference frame for fermentation analysis.
+
+The reference is decoded and preprocessed once when it is set, so every
+sample can be compared against it without touching the disk.
+"""
+
+from functools import cached_property
+from typing import Optional
+import os
+import cv2
+import numpy as np
+
+from .segmentation import DoughRegion, detect_dough
+
+
+class ReferenceFrame:
+    """Reference image together with its precomputed derived forms."""
+
+    def __init__(self, frame: np.ndarray):
+        """
+        Initialize ReferenceFrame.
+
+        Args:
+            frame: BGR reference image; it is copied so callers may reuse their buffer
+        """
+        self.frame = np.array(frame, copy=True)
+        self.frame.flags.writeable = False
+        self.gray = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+        self.blurred = cv2.GaussianBlur(self.gray, (9, 9), 2)
+        histogram = cv2.calcHist([self.gray], [0], None, [256], [0, 256])
+        self.histogram = cv2.normalize(histogram, histogram).flatten()
+        self.shape = self.frame.shape
+
+    @cached_property
+    def region(self) -> Optional[DoughRegion]:
+        """Segmented dough in the reference, detected on first use."""
+        return detect_dough(self.frame)
+
+    def relit(self, gain: float) -> 'ReferenceFrame':
+        """Copy of the reference with its brightness scaled by gain."""
+        return ReferenceFrame(cv2.convertScaleAbs(self.frame, alpha=gain))
+
+    @classmethod
+    def load(cls, file_path: str) -> Optional['ReferenceFrame']:
+        """Load a reference image from disk, returning None if it is missing."""
+        if not os.path.exists(file_path):
+            return None
+        frame = cv2.imread(file_path)
+        if frame is None:
+            return None
+        return cls(frame)
+
+
+class ReferenceFileCache:
+    """Reference frames loaded from disk, reloaded only when the file changes."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, file_path: str) -> Optional[ReferenceFrame]:
+        try:
+            mtime = os.stat(file_path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self._entries.get(file_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        reference = ReferenceFrame.load(file_path)
+        self._entries[file_path] = (mtime, reference)
+        return reference
@@ -0,0 +1,138 @@
+"""
+Adaptive sampling intervals driven by the fermentation rate.
+
+A fixed interval wastes work during the lag phase, when the dough barely
+moves, and is too coarse during the rise and around the peak, which are the
+parts worth resolving. AdaptiveScheduler picks each source's next interval so
+that the tracked metric (by default area_change, the dough's area growth in
+percent) moves by about target_change between samples,
+samples densely while the rise decelerates towards the peak, and never lets
+a source use more than its CPU budget.
+"""
+
+from typing import Dict, Optional
+import math
+
+
+class SourceRate:
+    """Smoothed rate of change of one source's metric."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.last_time: Optional[float] = None
+        self.last_value: Optional[float] = None
+        self.rate = 0.0
+        self.max_rate = 0.0
+        self.peak_value = -math.inf
+        self.duration = 0.0
+        self.phase = 'lag'
+
+
+class AdaptiveScheduler:
+    """Chooses per-source sampling intervals from the recent rate of change."""
+
+    def __init__(self, min_interval: float = 30.0, max_interval: float = 900.0,
+                 cpu_budget: float = 0.05, metric: str = 'area_change',
+                 target_change: float = 1.0, smoothing: float = 0.5,
+                 peak_fraction: float = 0.5):
+        """
+        Initialize AdaptiveScheduler.
+
+        Args:
+            min_interval: Shortest interval in seconds
+            max_interval: Longest interval in seconds
+            cpu_budget: Fraction of one CPU core a source may spend on analysis;
+                        takes precedence over max_interval when a frame is slow
+            metric: Metric whose rate drives the schedule
+            target_change: Change of the metric wanted between samples, in the
+                           metric's units (percentage points for area_change)
+            smoothing: Weight of the newest rate in the moving average (0-1]
+            peak_fraction: The peak is considered near once the rate has fallen
+                           below this fraction of the fastest rise seen
+        """
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("Need 0 < min_interval <= max_interval")
+        if not 0 < cpu_budget <= 1:
+            raise ValueError("cpu_budget must be in (0, 1]")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.cpu_budget = cpu_budget
+        self.metric = metric
+        self.target_change = target_change
+        self.smoothing = smoothing
+        self.peak_fraction = peak_fraction
+
+        self._sources: Dict[str, SourceRate] = {}
+
+    def reset(self, source_id: str):
+        """Forget a source's history, e.g. when a new session starts."""
+        self._sources.pop(source_id, None)
+
+    def update(self, source_id: str, timestamp: float, metrics: Optional[dict],
+               duration: float, interval: float) -> float:
+        """
+        Record a sample and return the interval until the next one.
+
+        Args:
+            source_id: Source the sample belongs to
+            timestamp: Capture time of the sample
+            metrics: Metrics computed for it (None if the analysis produced nothing)
+            duration: Seconds the analysis took
+            interval: The source's current interval, used until a rate is known
+        """
+        state = self._sources.get(source_id)
+        if state is None:
+            state = self._sources[source_id] = SourceRate(interval)
+        if state.duration == 0.0:
+            state.duration = duration
+        else:
+            state.duration = 0.5 * (state.duration + duration)
+
+        value = (metrics or {}).get(self.metric)
+        if value is not None and not math.isnan(value):
+            if state.last_time is not None and timestamp > state.last_time:
+                rate = (value - state.last_value) / (timestamp - state.last_time)
+                state.rate += self.smoothing * (rate - state.rate)
+                state.max_rate = max(state.max_rate, state.rate)
+                state.interval = self._interval_for(state, value)
+            state.last_time, state.last_value = timestamp, value
+            state.peak_value = max(state.peak_value, value)
+
+        state.interval = self._clamp(state.interval, state.duration)
+        return state.interval
+
+    def _interval_for(self, state: SourceRate, value: float) -> float:
+        # Rates are in metric units per second; below this the dough counts as idle
+        idle_rate = self.target_change / self.max_interval
+        speed = abs(state.rate)
+        interval = self.target_change / speed if speed > 0 else self.max_interval
+
+        past_peak = value < state.peak_value - 2 * self.target_change
+        if state.max_rate <= idle_rate:
+            state.phase = 'lag'
+        elif past_peak:
+            state.phase = 'falling'
+        elif state.rate < self.peak_fraction * state.max_rate:
+            # Rise is slowing down: keep the resolution of the fast phase until
+            # the peak is passed
+            state.phase = 'peak'
+            interval = min(interval, self.target_change
+                           / (self.peak_fraction * state.max_rate))
+        else:
+            state.phase = 'rising'
+        return interval
+
+    def _clamp(self, interval: float, duration: float) -> float:
+        interval = min(self.max_interval, max(self.min_interval, interval))
+        return max(interval, duration / self.cpu_budget)
+
+    def get_stats(self) -> dict:
+        return {
+            source_id: {
+                'interval': state.interval,
+                'phase': state.phase,
+                'rate_per_hour': state.rate * 3600,
+                'cpu_share': state.duration / state.interval if state.interval else 0.0,
+            }
+            for source_id, state in self._sources.items()
+        }
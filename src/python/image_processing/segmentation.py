@@ -0,0 +1,171 @@
+"""
+Dough segmentation and region-of-interest tracking.
+
+DoughSegmenter finds the dough as the largest Otsu-thresholded blob in a
+subsampled copy of the frame. After the first detection it only searches a
+window around the previous bounding box, so following a slowly rising dough
+costs a small crop per frame instead of a full-frame pass. The resulting
+DoughRegion gives the metrics a crop to work on and a real area measurement.
+"""
+
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+
+
+BBox = Tuple[int, int, int, int]
+
+
+class DoughRegion:
+    """Segmented dough in full-resolution frame coordinates."""
+
+    def __init__(self, bbox: BBox, area: float, mask: np.ndarray, scale: int):
+        """
+        Initialize DoughRegion.
+
+        Args:
+            bbox: (x, y, width, height) of the dough in the frame
+            area: Dough area in full-resolution pixels
+            mask: Dough mask covering bbox at working resolution
+            scale: Full-resolution pixels per working-resolution pixel (linear)
+        """
+        self.bbox = bbox
+        self.area = area
+        self.mask = mask
+        self.scale = scale
+
+
+def union_bbox(first: BBox, second: BBox) -> BBox:
+    x0 = min(first[0], second[0])
+    y0 = min(first[1], second[1])
+    x1 = max(first[0] + first[2], second[0] + second[2])
+    y1 = max(first[1] + first[3], second[1] + second[3])
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def expand_bbox(bbox: BBox, margin: float, shape, align: int = 1) -> BBox:
+    """Grow bbox by a fraction of its size on every side, clipped to the frame."""
+    x, y, w, h = bbox
+    dx, dy = int(w * margin), int(h * margin)
+    x0, y0 = max(0, x - dx), max(0, y - dy)
+    x1, y1 = min(shape[1], x + w + dx), min(shape[0], y + h + dy)
+    if align > 1:
+        # Snap outwards to a grid so small jitter keeps the same crop
+        x0, y0 = x0 // align * align, y0 // align * align
+        x1 = min(shape[1], -(-x1 // align) * align)
+        y1 = min(shape[0], -(-y1 // align) * align)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+class DoughSegmenter:
+    """Detects the dough once, then tracks it incrementally between frames."""
+
+    def __init__(self, work_width: int = 320, search_margin: float = 0.2,
+                 redetect_every: int = 50, min_area_fraction: float = 0.005):
+        """
+        Initialize DoughSegmenter.
+
+        Args:
+            work_width: Approximate width frames are subsampled to for segmentation
+            search_margin: Tracking window size around the last box, as a fraction of it
+            redetect_every: Frames between full-frame detections (0 disables)
+            min_area_fraction: Smallest blob, relative to the frame, accepted as dough
+        """
+        self.work_width = work_width
+        self.search_margin = search_margin
+        self.redetect_every = redetect_every
+        self.min_area_fraction = min_area_fraction
+
+        self.detections = 0
+        self.tracked = 0
+
+        self._region: Optional[DoughRegion] = None
+        self._invert = False
+        self._since_detection = 0
+
+    def reset(self):
+        self._region = None
+
+    def segment(self, frame: np.ndarray) -> Optional[DoughRegion]:
+        """Return the dough region in this frame, or None if none was found."""
+        region = None
+        due = self.redetect_every and self._since_detection >= self.redetect_every
+        if self._region is not None and not due:
+            region = self._track(frame)
+        if region is None:
+            region = self.detect(frame)
+        self._region = region
+        return region
+
+    def detect(self, frame: np.ndarray) -> Optional[DoughRegion]:
+        """Full-frame detection.
+
+        Also decides whether the dough is the bright or the dark side.
+        """
+        self.detections += 1
+        self._since_detection = 0
+        scale = max(1, -(-frame.shape[1] // self.work_width))
+        small = self._downscale(frame, scale)
+        _, mask = cv2.threshold(cv2.GaussianBlur(small, (5, 5), 0), 0, 255,
+                                cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        # The dough is the side of the threshold that touches the frame border least
+        border = np.concatenate((mask[0], mask[-1], mask[:, 0], mask[:, -1]))
+        self._invert = np.count_nonzero(border) > border.size // 2
+        if self._invert:
+            mask = cv2.bitwise_not(mask)
+        return self._largest_blob(mask, (0, 0), scale, small.shape[0] * small.shape[1])
+
+    def _track(self, frame: np.ndarray) -> Optional[DoughRegion]:
+        previous = self._region
+        window = expand_bbox(previous.bbox, self.search_margin, frame.shape)
+        x, y, w, h = window
+        scale = previous.scale
+        small = self._downscale(frame[y:y + h, x:x + w], scale)
+        _, mask = cv2.threshold(cv2.GaussianBlur(small, (5, 5), 0), 0, 255,
+                                cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        if self._invert:
+            mask = cv2.bitwise_not(mask)
+        frame_pixels = (frame.shape[0] / scale) * (frame.shape[1] / scale)
+        region = self._largest_blob(mask, (x, y), scale, frame_pixels)
+        if region is None:
+            return None
+
+        # Lost or outgrew the window: fall back to a full detection
+        rx, ry, rw, rh = region.bbox
+        touches_edge = ((rx <= x and x > 0) or (ry <= y and y > 0) or
+                        (rx + rw >= x + w and x + w < frame.shape[1]) or
+                        (ry + rh >= y + h and y + h < frame.shape[0]))
+        if touches_edge or not 0.5 < region.area / max(previous.area, 1.0) < 2.0:
+            return None
+        self.tracked += 1
+        self._since_detection += 1
+        return region
+
+    def _downscale(self, frame: np.ndarray, scale: int) -> np.ndarray:
+        # Plain subsampling is enough here: the result is blurred before thresholding
+        small = np.ascontiguousarray(frame[::scale, ::scale])
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+
+    def _largest_blob(self, mask: np.ndarray, offset, scale: int,
+                      frame_pixels: float) -> Optional[DoughRegion]:
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3, 3), np.uint8))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        if not contours:
+            return None
+        contour = max(contours, key=cv2.contourArea)
+        area = cv2.contourArea(contour)
+        if area < self.min_area_fraction * frame_pixels:
+            return None
+
+        bx, by, bw, bh = cv2.boundingRect(contour)
+        blob = np.zeros((bh, bw), dtype=np.uint8)
+        cv2.drawContours(blob, [contour], -1, 255, -1, offset=(-bx, -by))
+        bbox = (offset[0] + bx * scale, offset[1] + by * scale, bw * scale, bh * scale)
+        # Holes (bubbles) count towards the dough area
+        area = float(np.count_nonzero(blob)) * scale * scale
+        return DoughRegion(bbox, area, blob, scale)
+
+
+def detect_dough(frame: np.ndarray, work_width: int = 320) -> Optional[DoughRegion]:
+    """One-off detection, e.g. for a reference frame."""
+    return DoughSegmenter(work_width).detect(frame)
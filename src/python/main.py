@@ -1,55 +1,225 @@
 #!/usr/bin/env python3
 
+import argparse
+import multiprocessing
+import os
+import signal
 import sys
-import time
 import threading
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent))
 
+import telemetry
+from telemetry import exporter, profiler
 from web_api.app import create_app
-from image_processing.fermentation_analyzer import FermentationAnalyzer
+from web_api.event_hub import EventHub, MetricsPublisher
+from web_api.server import serve
+from web_api.sse_server import SSEServer
+from image_processing.analysis_engine import AnalysisEngine
+from image_processing.scheduler import AdaptiveScheduler
+from image_processing.camera_capture import CameraManager
 from data_storage.database import Database
+from data_storage.retention import RetentionManager
+
+DEFAULT_DB_PATH = "/opt/fermentation-monitor/data/fermentation.db"
 
 class FermentationMonitor:
-    def __init__(self):
-        self.db = Database()
-        self.image_analyzer = FermentationAnalyzer()
+    def __init__(self, camera_indices=(0,), interval=300, workers=None,
+                 events_port=5001, db_path=DEFAULT_DB_PATH, scheduler=None):
+        self.db = Database(db_path, write_behind=True)
+        # New measurements are pushed to dashboards as they are produced
+        self.events = EventHub()
+        self.publisher = MetricsPublisher(self.db, self.events)
+        self.sse_server = SSEServer(self.events, port=events_port)
+        self.retention = RetentionManager(self.db)
+        self.cameras = CameraManager()
+        # A single tray is cheap enough to analyze inline without a process pool
+        if workers is None and len(camera_indices) == 1:
+            workers = 0
+        self.engine = AnalysisEngine(self.db, workers=workers,
+                                     on_result=self._on_dough_metrics,
+                                     scheduler=scheduler)
+        for tray, camera_index in enumerate(camera_indices):
+            source_id = f"tray-{tray}"
+            camera = self.cameras.add_camera(source_id, camera_index)
+            self.engine.add_source(source_id, camera, interval=interval)
         self.running = False
         
-    def start_monitoring(self):
+    def start_analysis(self):
+        """Start capture, analysis, retention and the live update push channel"""
         self.running = True
+        self.cameras.start_all()
         
-        # Start image analysis thread for dough size monitoring
-        image_thread = threading.Thread(target=self._monitor_dough_size)
-        image_thread.daemon = True
-        image_thread.start()
+        # Start analysis engine for dough size monitoring on every tray
+        self.engine.start()
         
-        # Start web server
-        app = create_app(self.db)
+        # Trim, archive and compact old data in the background
+        self.retention.start()
+
+        # Push channel for live updates
+        self.sse_server.start()
+
+    def start_monitoring(self):
+        """Run everything in this process with the Flask development server"""
+        self.start_analysis()
+        app = create_app(self.db, events_port=self.sse_server.port)
         app.run(host='0.0.0.0', port=5000, debug=False)
         
     def stop_monitoring(self):
         self.running = False
+        self.engine.stop()
+        self.cameras.stop_all()
+        self.retention.stop()
+        self.sse_server.stop()
+        self.db.close()
         
-    def _monitor_dough_size(self):
-        while self.running:
-            try:
-                # Capture and analyze dough size from webcam
-                metrics = self.image_analyzer.analyze()
-                if metrics:
-                    self.db.store_image_metrics(metrics)
-                    print(f"Dough size: {metrics.get('size', 'N/A')}")
-                    
-            except Exception as e:
-                print(f"Dough monitoring error: {e}")
-                
-            time.sleep(300)  # Analyze dough size every 5 minutes
+    def _on_dough_metrics(self, source_id, metrics):
+        # Dashboards get the row from MetricsPublisher once it is committed
+        print(f"Dough size [{source_id}]: {metrics.get('dough_area', 'N/A')}")
 
-if __name__ == "__main__":
-    monitor = FermentationMonitor()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fermentation monitor")
+    parser.add_argument('--mode', choices=['wsgi', 'dev'], default='wsgi',
+                        help="wsgi: web workers in separate processes; "
+                             "dev: Flask development server")
+    parser.add_argument('--role', choices=['all', 'analysis', 'web'], default='all',
+                        help="Run the analysis loop, the web server or both "
+                             "(wsgi mode)")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="SQLite database path")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--web-workers', type=int, default=2,
+                        help="Web worker processes")
+    parser.add_argument('--threads', type=int, default=4,
+                        help="Request threads per web worker")
+    parser.add_argument('--graceful-timeout', type=float, default=30.0,
+                        help="Seconds in-flight requests get to finish on shutdown")
+    parser.add_argument('--cameras', type=int, nargs='+', default=[0],
+                        help="Camera indices, one per tray")
+    parser.add_argument('--interval', type=float, default=300,
+                        help="Seconds between analyses "
+                             "(initial interval with --adaptive)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="Adapt the interval to the fermentation rate")
+    parser.add_argument('--min-interval', type=float, default=30,
+                        help="Shortest adaptive interval")
+    parser.add_argument('--max-interval', type=float, default=900,
+                        help="Longest adaptive interval")
+    parser.add_argument('--cpu-budget', type=float, default=0.05,
+                        help="Fraction of a CPU core each tray may use for analysis")
+    parser.add_argument('--analysis-workers', type=int,
+                        help="Analysis process pool size")
+    parser.add_argument('--events-port', type=int, default=5001,
+                        help="Server-Sent Events port")
+    parser.add_argument('--telemetry-dir',
+                        help="Directory where processes share metrics "
+                             "(default: telemetry/ next to the database)")
+    parser.add_argument('--profile', type=float, metavar='MS',
+                        help="Run the sampling profiler with this interval, "
+                             "served at /debug/profile")
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help="Convert an old database so retention can shrink it, "
+                             "then exit; blocks writers, run it with the monitor "
+                             "stopped")
+    return parser.parse_args(argv)
+
+
+def wait_for_shutdown(web_process=None):
+    """Block until SIGTERM/SIGINT, or until the web server process exits"""
+    stop = threading.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda signum, frame: stop.set())
+    while not stop.wait(1.0):
+        if web_process is not None and not web_process.is_alive():
+            print("Web server exited")
+            break
+
+
+def make_scheduler(args):
+    """Adaptive scheduler for the monitor, or None for fixed intervals"""
+    if not args.adaptive:
+        return None
+    return AdaptiveScheduler(args.min_interval, args.max_interval, args.cpu_budget)
+
+
+def share_telemetry(args):
+    """Point this process and the processes it starts at the telemetry directory"""
+    directory = args.telemetry_dir or os.path.join(
+        os.path.dirname(os.path.abspath(args.db)), 'telemetry')
+    os.environ[exporter.ENVIRONMENT_VARIABLE] = directory
+    if args.profile:
+        os.environ[profiler.ENVIRONMENT_VARIABLE] = str(args.profile)
+
+
+def enable_incremental_vacuum(db_path):
+    """One-off maintenance: convert a database created without auto_vacuum"""
+    db = Database(db_path)
+    try:
+        if RetentionManager(db).enable_incremental_vacuum():
+            print(f"Incremental vacuum enabled on {db_path}")
+        else:
+            print(f"Incremental vacuum was already enabled on {db_path}")
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+        return
+    share_telemetry(args)
+
+    if args.mode == 'dev':
+        monitor = FermentationMonitor(args.cameras, args.interval,
+                                      args.analysis_workers, args.events_port,
+                                      args.db, make_scheduler(args))
+        telemetry.configure(clean=True)
+        try:
+            monitor.start_monitoring()
+        except KeyboardInterrupt:
+            monitor.stop_monitoring()
+            telemetry.shutdown()
+            print("Fermentation monitor stopped")
+        return
+
+    # Create or migrate the schema once, before any other process opens the file
+    Database(args.db).close()
+    web_options = dict(db_path=args.db, host=args.host, port=args.port,
+                       workers=args.web_workers, threads=args.threads,
+                       graceful_timeout=args.graceful_timeout,
+                       events_port=args.events_port)
+
+    if args.role == 'web':
+        serve(**web_options)
+        return
+
+    web_process = None
+    if args.role == 'all':
+        # Forked before any analysis threads or connections exist in this process
+        web_process = multiprocessing.Process(target=serve, kwargs=web_options,
+                                              name="fermentation-web")
+        web_process.start()
+
+    # Started after the fork; the web workers start their own snapshot writers
+    telemetry.configure(clean=args.role == 'all')
+    monitor = FermentationMonitor(args.cameras, args.interval, args.analysis_workers,
+                                  args.events_port, args.db, make_scheduler(args))
+    monitor.start_analysis()
     try:
-        monitor.start_monitoring()
-    except KeyboardInterrupt:
+        wait_for_shutdown(web_process)
+    finally:
+        if web_process is not None and web_process.is_alive():
+            # SIGTERM lets the web server drain in-flight requests
+            web_process.terminate()
+        # Stops capture and analysis, then flushes buffered writes
         monitor.stop_monitoring()
-        print("Fermentation monitor stopped")
\ No newline at end of file
+        telemetry.shutdown()
+        if web_process is not None:
+            web_process.join(args.graceful_timeout + 5)
+        print("Fermentation monitor stopped")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,9 @@
+"""Low-overhead in-process instrumentation with Prometheus text export."""
+
+from .exporter import configure, load_profiles, render_prometheus, shutdown
+from .profiler import SamplingProfiler, get_profiler
+from .registry import REGISTRY, Counter, Gauge, Histogram, Registry, timed
+
+__all__ = ['REGISTRY', 'Counter', 'Gauge', 'Histogram', 'Registry', 'SamplingProfiler',
+           'configure', 'get_profiler', 'load_profiles', 'render_prometheus',
+           'shutdown', 'timed']
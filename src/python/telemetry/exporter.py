@@ -0,0 +1,248 @@
+"""
+Prometheus text exposition, across processes.
+
+The monitor runs analysis, analysis pool workers and web workers as separate
+processes, and a scrape reaches only one of them. Every process configured
+with a telemetry directory therefore writes a snapshot of its registry
+there every few seconds, and render_prometheus() adds up the snapshots of
+all processes: counters and histograms are summed, gauges are reported per
+live process with a pid label.
+"""
+
+from typing import Dict, List, Optional
+import glob
+import json
+import math
+import os
+import threading
+
+from .profiler import get_profiler
+from .registry import REGISTRY, Registry
+
+ENVIRONMENT_VARIABLE = 'FERMENTATION_TELEMETRY_DIR'
+
+_writer: Optional['SnapshotWriter'] = None
+
+
+class SnapshotWriter:
+    """Background thread writing this process's registry snapshot to a directory."""
+
+    def __init__(self, directory: str, registry: Registry = REGISTRY,
+                 interval: float = 5.0, extra: Optional[Dict[str, object]] = None):
+        """
+        Initialize SnapshotWriter.
+
+        Args:
+            directory: Directory shared by all processes of the monitor
+            registry: Registry to snapshot
+            interval: Seconds between snapshots
+            extra: Optional objects with a folded() method (profilers) written alongside
+        """
+        self.directory = directory
+        self.registry = registry
+        self.interval = interval
+        self.extra = extra or {}
+        self.pid = os.getpid()
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"metrics-{self.pid}.json")
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+    def write(self):
+        """Write the snapshot atomically, so readers never see a partial file."""
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as out:
+            json.dump({'pid': self.pid, 'metrics': self.registry.snapshot()}, out)
+        os.replace(temporary, self.path)
+        for name, source in self.extra.items():
+            text = source.folded()
+            if text:
+                with open(f"{temporary}.{name}", 'w') as out:
+                    out.write(text)
+                os.replace(f"{temporary}.{name}",
+                           os.path.join(self.directory, f"{name}-{self.pid}.folded"))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.write()
+            except OSError as e:
+                print(f"Telemetry snapshot failed: {e}")
+
+
+def configure(directory: Optional[str] = None, clean: bool = False,
+              **kwargs) -> Optional[SnapshotWriter]:
+    """
+    Start publishing this process's metrics to the shared directory.
+
+    Processes started later (pool workers, web workers) inherit the directory
+    through the environment and only need configure() without arguments.
+    Values inherited from a forked parent are reset first so nothing is
+    counted twice. clean removes snapshots left by an earlier run. With
+    FERMENTATION_PROFILE set, the process's folded profile is written too.
+    """
+    global _writer
+    directory = directory or os.environ.get(ENVIRONMENT_VARIABLE)
+    if not directory:
+        return None
+    if _writer is not None and _writer.pid == os.getpid():
+        return _writer
+    if REGISTRY.pid != os.getpid():
+        REGISTRY.reset()
+    if clean:
+        for pattern in ('metrics-*.json', 'profile-*.folded'):
+            for path in glob.glob(os.path.join(directory, pattern)):
+                os.remove(path)
+    os.environ[ENVIRONMENT_VARIABLE] = directory
+    profiler = get_profiler()
+    if profiler is not None:
+        kwargs.setdefault('extra', {'profile': profiler})
+    _writer = SnapshotWriter(directory, **kwargs)
+    _writer.start()
+    return _writer
+
+
+def shutdown():
+    """Write a final snapshot and stop the writer of this process."""
+    global _writer
+    if _writer is not None and _writer.pid == os.getpid():
+        _writer.stop()
+    _writer = None
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def load_snapshots(directory: Optional[str],
+                   exclude_pid: Optional[int] = None) -> List[dict]:
+    """Snapshots written by the monitor's processes (other than exclude_pid)."""
+    if not directory or not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, 'metrics-*.json')):
+        try:
+            with open(path) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue
+        if snapshot.get('pid') != exclude_pid:
+            snapshots.append(snapshot)
+    return snapshots
+
+
+def load_profiles(directory: Optional[str], exclude_pid: Optional[int] = None) -> str:
+    """Folded stacks written by profiling processes, concatenated."""
+    if not directory or not os.path.isdir(directory):
+        return ''
+    parts = []
+    for path in sorted(glob.glob(os.path.join(directory, 'profile-*.folded'))):
+        if path.endswith(f"-{exclude_pid}.folded"):
+            continue
+        try:
+            with open(path) as profile_file:
+                parts.append(profile_file.read())
+        except OSError:
+            continue
+    return ''.join(parts)
+
+
+def merge_snapshots(snapshots: List[dict]) -> Dict[str, dict]:
+    """Add up the metrics of several processes into one snapshot."""
+    merged = {}
+    for snapshot in snapshots:
+        pid = snapshot.get('pid')
+        alive = pid == os.getpid() or (pid is not None and _process_alive(pid))
+        for name, metric in snapshot['metrics'].items():
+            target = merged.setdefault(name, dict(metric, samples={}))
+            if metric['type'] == 'gauge':
+                if not alive:
+                    continue
+                target['labelnames'] = list(metric['labelnames']) + ['pid']
+                for labels, value in metric['samples']:
+                    target['samples'][tuple(labels) + (str(pid),)] = value
+                continue
+            for labels, value in metric['samples']:
+                key = tuple(labels)
+                current = target['samples'].get(key)
+                if metric['type'] == 'histogram':
+                    if current is None:
+                        current = target['samples'][key] = {
+                            'counts': [0] * len(value['counts']), 'sum': 0.0}
+                    current['counts'] = [a + b for a, b in
+                                         zip(current['counts'], value['counts'])]
+                    current['sum'] += value['sum']
+                else:
+                    target['samples'][key] = (current or 0.0) + value
+    return merged
+
+
+def _format_value(value: float) -> str:
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _label_text(names, values, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def render_prometheus(registry: Registry = REGISTRY,
+                      directory: Optional[str] = None) -> str:
+    """Prometheus text format (0.0.4) of this process and the snapshots in directory."""
+    directory = directory or os.environ.get(ENVIRONMENT_VARIABLE)
+    snapshots = [{'pid': os.getpid(), 'metrics': registry.snapshot()}]
+    snapshots += load_snapshots(directory, exclude_pid=os.getpid())
+    merged = merge_snapshots(snapshots)
+
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        labelnames = metric['labelnames']
+        for labels, value in sorted(metric['samples'].items()):
+            label_text = _label_text(labelnames, labels)
+            if metric['type'] != 'histogram':
+                lines.append(f"{name}{label_text} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric['buckets'] + [math.inf], value['counts']):
+                cumulative += count
+                le = 'le="+Inf"' if math.isinf(bound) else f'le="{bound}"'
+                lines.append(
+                    f"{name}_bucket{_label_text(labelnames, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{label_text} {_format_value(value['sum'])}")
+            lines.append(f"{name}_count{label_text} {cumulative}")
+    return '\n'.join(lines) + '\n'
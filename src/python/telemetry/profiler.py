@@ -0,0 +1,122 @@
+"""
+Opt-in statistical profiler.
+
+A background thread looks at the stacks of all other threads every few
+milliseconds and counts them in folded form ("module:function;..." per
+line with a count), which flamegraph.pl and speedscope read directly.
+Nothing is hooked into the profiled code, so the cost is one stack walk per
+thread per sample, and none at all unless the profiler is started.
+"""
+
+from collections import Counter
+from typing import Optional
+import os
+import sys
+import threading
+import time
+
+ENVIRONMENT_VARIABLE = 'FERMENTATION_PROFILE'
+
+
+class SamplingProfiler:
+    """Samples every thread's stack at a fixed interval."""
+
+    def __init__(self, interval: float = 0.01, max_depth: int = 64):
+        """
+        Initialize SamplingProfiler.
+
+        Args:
+            interval: Seconds between samples
+            max_depth: Innermost frames kept per stack
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self.pid = os.getpid()
+
+        self._stacks = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def reset(self):
+        with self._lock:
+            self._stacks.clear()
+            self.samples = 0
+
+    def folded(self) -> str:
+        """Collected stacks, one "frame;frame;... count" line each, hottest first."""
+        with self._lock:
+            stacks = self._stacks.most_common()
+        return ''.join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            sampled = []
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, 'thread'))
+                sampled.append(';'.join(reversed(stack)))
+            with self._lock:
+                self._stacks.update(sampled)
+                self.samples += 1
+
+
+_profiler: Optional[SamplingProfiler] = None
+
+
+def get_profiler() -> Optional[SamplingProfiler]:
+    """
+    This process's profiler if FERMENTATION_PROFILE is set, started on first use.
+
+    The variable's value is the sampling interval in milliseconds.
+    """
+    global _profiler
+    value = os.environ.get(ENVIRONMENT_VARIABLE)
+    if not value:
+        return None
+    if _profiler is None or _profiler.pid != os.getpid():
+        try:
+            interval = float(value) / 1000.0
+        except ValueError:
+            interval = 0.0
+        _profiler = SamplingProfiler(interval=interval if interval > 0 else 0.01)
+        _profiler.start()
+    return _profiler
+
+
+def profile(seconds: float, interval: float = 0.005) -> str:
+    """Profile the whole process for some seconds and return the folded stacks."""
+    profiler = SamplingProfiler(interval)
+    profiler.start()
+    time.sleep(seconds)
+    profiler.stop()
+    return profiler.folded()
@@ -0,0 +1,272 @@
+"""
+In-process counters, gauges and latency histograms.
+
+Metrics are created once at import time and updated from hot paths, so an
+update is kept to a dict lookup, a lock and an addition. Labelled metrics
+hand out a child per label combination; callers on hot paths keep the child
+instead of looking it up for every observation.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, Optional, Sequence, Tuple
+import os
+import threading
+import time
+
+# Seconds; covers a sub-millisecond metric up to a slow camera reconnect
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+    def reset(self):
+        self.value = 0.0
+
+
+class _GaugeChild:
+    __slots__ = ('value', 'function', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self.value = value
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]):
+        """Report function() at collection time instead of a stored value."""
+        self.function = function
+
+    def snapshot(self):
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return float('nan')
+        return self.value
+
+    def reset(self):
+        self.value = 0.0
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One count per bucket plus +Inf; made cumulative only when collected
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> 'Timer':
+        return Timer(self)
+
+    def snapshot(self):
+        with self._lock:
+            return {'counts': list(self.counts), 'sum': self.sum}
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.sum = 0.0
+
+
+class Metric:
+    """A named metric with optional labels.
+
+    Unlabelled metrics act as their own child.
+    """
+
+    kind = ''
+    _child_class = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._default = None if self.labelnames else self.labels()
+
+    def _new_child(self):
+        return self._child_class()
+
+    def labels(self, *values):
+        """Child for the given label values (in labelnames order)."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def __getattr__(self, attribute):
+        # inc(), observe(), set() ... on an unlabelled metric go to its only child
+        default = self.__dict__.get('_default')
+        if default is None:
+            raise AttributeError(attribute)
+        return getattr(default, attribute)
+
+    def reset(self):
+        # Zeroed in place: hot paths keep references to their children
+        with self._lock:
+            children = list(self._children.values())
+        for child in children:
+            child.reset()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            children = list(self._children.items())
+        return {
+            'type': self.kind,
+            'help': self.documentation,
+            'labelnames': list(self.labelnames),
+            'samples': [[list(key), child.snapshot()] for key, child in children],
+        }
+
+
+class Counter(Metric):
+    kind = 'counter'
+    _child_class = _CounterChild
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+    _child_class = _GaugeChild
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        return data
+
+
+class Timer:
+    """
+    Context manager and decorator recording elapsed seconds in a histogram.
+
+    If errors is given it is incremented when the timed block raises; the
+    duration is recorded either way.
+    """
+
+    __slots__ = ('histogram', 'errors', '_start')
+
+    def __init__(self, histogram, errors=None):
+        self.histogram = histogram
+        self.errors = errors
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.histogram.observe(time.perf_counter() - self._start)
+        if exc_type is not None and self.errors is not None:
+            self.errors.inc()
+        return False
+
+    def __call__(self, func):
+        histogram, errors = self.histogram, self.errors
+
+        def wrapper(*args, **kwargs):
+            with Timer(histogram, errors):
+                return func(*args, **kwargs)
+        wrapper.__name__ = func.__name__
+        wrapper.__doc__ = func.__doc__
+        wrapper.__wrapped__ = func
+        return wrapper
+
+
+def timed(histogram, errors=None) -> Timer:
+    """Time a block or function into histogram (a Histogram or one of its children)."""
+    return Timer(histogram, errors)
+
+
+class Registry:
+    """Named metrics of one process."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self.pid = os.getpid()
+
+    def _get_or_create(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames,
+                                                   **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered differently")
+            return metric
+
+    def counter(self, name: str, documentation: str,
+                labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str,
+              labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames,
+                                   buckets=buckets)
+
+    def reset(self):
+        """Zero every metric, e.g. in a child process that inherited parent values."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+        self.pid = os.getpid()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+REGISTRY = Registry()
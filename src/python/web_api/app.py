@@ -1,39 +1,239 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request, send_file
 import json
+import os
+import tempfile
 import time
 from pathlib import Path
+import numpy as np
 
-def create_app(database):
+import telemetry
+from telemetry import REGISTRY
+
+from analytics.decimation import METHODS, decimate
+from analytics.growth import MODELS, GrowthTracker
+from data_storage import export
+from data_storage.rollups import ROLLUP_COLUMNS
+from .cache import ResponseCache
+
+# Metric name -> table it is stored in
+METRIC_TABLES = {column: table for table, columns in ROLLUP_COLUMNS.items()
+                 for column in columns}
+
+# Rows read from the database per requested chart point before decimation
+CHART_OVERSAMPLE = 8
+
+REQUEST_SECONDS = REGISTRY.histogram('http_request_seconds',
+                                     "Time to build an HTTP response",
+                                     ['endpoint', 'method'])
+REQUESTS = REGISTRY.counter('http_requests_total', "HTTP requests by response status",
+                            ['endpoint', 'method', 'status'])
+
+def create_app(database, events_port=None):
     app = Flask(__name__, 
                 template_folder='../../web/templates',
                 static_folder='../../web/static')
     
     app.config['SECRET_KEY'] = 'fermentation-monitor-secret-key'
+    # Port of the SSEServer pushing live updates; None leaves the dashboard polling
+    app.config['EVENTS_PORT'] = events_port
     
+    # Poll results are reused until one of their tables is written to
+    cache = ResponseCache(database)
+    app.extensions['response_cache'] = cache
+
+    def cached_json(tables, compute):
+        """JSON response served from the cache with ETag/Last-Modified validation"""
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        versions = cache.versions(tables)
+        entry = cache.lookup(key, versions)
+        if entry is None:
+            cache.misses += 1
+            entry = cache.store(key, tables, versions, jsonify(compute()).get_data())
+        else:
+            cache.hits += 1
+
+        response = app.response_class(entry.body, mimetype='application/json')
+        response.set_etag(entry.etag)
+        response.last_modified = entry.last_modified
+        response.cache_control.no_cache = True
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            cache.not_modified += 1
+        return response
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        # Route patterns rather than paths keep the label set small
+        rule = request.url_rule
+        endpoint = rule.rule if rule is not None else 'unmatched'
+        start = g.get('request_start')
+        if start is not None:
+            REQUEST_SECONDS.labels(endpoint, request.method).observe(
+                time.perf_counter() - start)
+        REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+        return response
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Counters and latency histograms of every monitor process"""
+        return Response(telemetry.render_prometheus(),
+                        mimetype='text/plain; version=0.0.4')
+
+    @app.route('/debug/profile')
+    def debug_profile():
+        """Folded stacks from the sampling profiler (monitor started with --profile)"""
+        profiler = telemetry.get_profiler()
+        if profiler is None:
+            return jsonify({'error': {
+                'code': 'RESOURCE_NOT_FOUND',
+                'message': 'Profiling is disabled; start the monitor with --profile'
+            }}), 404
+        stacks = profiler.folded() + telemetry.load_profiles(
+            os.environ.get(telemetry.exporter.ENVIRONMENT_VARIABLE),
+            exclude_pid=os.getpid())
+        return Response(stacks, mimetype='text/plain')
+
     @app.route('/')
     def index():
         return render_template('index.html')
         
     @app.route('/dashboard')
     def dashboard():
-        return render_template('dashboard.html')
+        return render_template('dashboard.html', events_port=app.config['EVENTS_PORT'])
+        
+    def delta_payload(table, fetch, limit):
+        """Rows newer than the client's cursor plus the cursor to send next time"""
+        last_id = request.args.get('after_id', type=int)
+        if last_id is None:
+            # Read before the rows: a row committed in between is fetched
+            # again, not skipped
+            last_id = database.get_last_id(table)
+        rows = fetch()
+        return {
+            'rows': rows,
+            'last_id': rows[-1]['id'] if rows else last_id,
+            'has_more': len(rows) == limit
+        }
+
+    def is_delta_request():
+        return 'since' in request.args or 'after_id' in request.args
         
     @app.route('/api/sensor-data')
     def get_sensor_data():
+        if is_delta_request():
+            limit = min(request.args.get('limit', 1000, type=int), 10000)
+            return cached_json(['sensor_data'], lambda: delta_payload(
+                'sensor_data', lambda: database.get_sensor_data_since(
+                    request.args.get('since', type=float),
+                    request.args.get('after_id', type=int),
+                    limit
+                ), limit))
         hours = request.args.get('hours', 24, type=int)
-        data = database.get_recent_sensor_data(hours)
-        return jsonify(data)
+        return cached_json(['sensor_data'],
+                           lambda: database.get_recent_sensor_data(hours))
         
     @app.route('/api/image-metrics')
     def get_image_metrics():
+        if is_delta_request():
+            limit = min(request.args.get('limit', 1000, type=int), 10000)
+            return cached_json(['image_metrics'], lambda: delta_payload(
+                'image_metrics', lambda: database.get_image_metrics_since(
+                    request.args.get('since', type=float),
+                    request.args.get('after_id', type=int),
+                    limit,
+                    request.args.get('source_id')
+                ), limit))
         hours = request.args.get('hours', 24, type=int)
-        data = database.get_recent_image_metrics(hours)
-        return jsonify(data)
+        return cached_json(['image_metrics'],
+                           lambda: database.get_recent_image_metrics(hours))
+
+    def invalid_request(field, reason):
+        return jsonify({'error': {
+            'code': 'INVALID_REQUEST',
+            'message': 'Invalid request parameters',
+            'details': {'field': field, 'reason': reason}
+        }}), 400
+
+    @app.route('/api/chart-data')
+    def get_chart_data():
+        metric = request.args.get('metric', 'volume_change')
+        method = request.args.get('method', 'lttb')
+        if metric not in METRIC_TABLES:
+            return invalid_request(
+                'metric', f"Must be one of {', '.join(sorted(METRIC_TABLES))}")
+        if method not in METHODS:
+            return invalid_request('method', f"Must be one of {', '.join(METHODS)}")
+        hours = request.args.get('hours', 24, type=float)
+        points = max(10, min(request.args.get('points', 500, type=int), 5000))
+        source_id = request.args.get('source_id')
+        return cached_json([METRIC_TABLES[metric]], lambda: _chart_data(
+            metric, hours, points, method, source_id))
+
+    def _chart_data(metric, hours, points, method, source_id):
+        # The series query already switches to rollups for long ranges, so at
+        # most points * CHART_OVERSAMPLE rows are read whatever the range
+        start = time.time() - hours * 3600
+        max_points = points * CHART_OVERSAMPLE
+        if METRIC_TABLES[metric] == 'sensor_data':
+            series = database.get_sensor_data_series(start, max_points=max_points)
+        else:
+            series = database.get_image_metrics_series(start, max_points=max_points,
+                                                       source_id=source_id)
+
+        rows = [row for row in series['points'] if row[metric] is not None]
+        timestamps = np.array([row['timestamp'] for row in rows], dtype=np.float64)
+        values = np.array([row[metric] for row in rows], dtype=np.float64)
+        keep = decimate(timestamps, values, points, method)
+
+        return {
+            'metric': metric,
+            'method': method,
+            'resolution': series['resolution'],
+            'source_points': len(rows),
+            'points': np.column_stack((timestamps[keep], values[keep])).tolist()
+        }
+
+    @app.route('/api/export/<name>')
+    def export_data(name):
+        table = name.replace('-', '_')
+        fmt = request.args.get('format', 'csv')
+        if table not in export.EXPORT_COLUMNS:
+            return invalid_request(
+                'table', f"Must be one of {', '.join(export.EXPORT_COLUMNS)}")
+        if fmt not in export.available_formats():
+            return invalid_request(
+                'format', f"Must be one of {', '.join(export.available_formats())}")
+        start = request.args.get('start', type=float)
+        end = request.args.get('end', time.time(), type=float)
+        session_id = request.args.get('session_id', type=int)
+        if session_id is not None and not export.supports_session_filter(table):
+            return invalid_request('session_id',
+                                   f"{name} cannot be filtered by session")
+        mimetype, suffix = export.FORMATS[fmt]
+        filename = f"{table}_{int(start or 0)}_{int(end)}.{suffix}"
+
+        if fmt == 'csv':
+            # Compressed chunks are sent as the cursor advances
+            batches = export.iter_batches(database, table, start, end, session_id)
+            disposition = f'attachment; filename="{filename}"'
+            return Response(export.iter_csv_gz(batches, export.EXPORT_COLUMNS[table]),
+                            mimetype=mimetype,
+                            headers={'Content-Disposition': disposition})
+
+        # Columnar formats are assembled in a temporary file, then streamed from it
+        out = tempfile.TemporaryFile()
+        export.export(database, table, fmt, out, start, end, session_id)
+        out.seek(0)
+        return send_file(out, mimetype=mimetype, as_attachment=True,
+                         download_name=filename)
         
     @app.route('/api/sessions')
     def get_sessions():
-        sessions = database.get_active_sessions()
-        return jsonify(sessions)
+        return cached_json(['fermentation_sessions'], database.get_active_sessions)
         
     @app.route('/api/sessions', methods=['POST'])
     def create_session():
@@ -44,21 +244,48 @@ def create_app(database):
         )
         return jsonify({'id': session_id, 'status': 'created'})
         
+    # Growth fits are kept up to date incrementally, one tracker per model
+    growth_trackers = {name: GrowthTracker(database, name) for name in MODELS}
+
+    @app.route('/api/sessions/<int:session_id>/prediction')
+    def get_session_prediction(session_id):
+        model = request.args.get('model', 'logistic')
+        if model not in MODELS:
+            return invalid_request('model', f"Must be one of {', '.join(MODELS)}")
+        target = request.args.get('target', type=float)
+        if database.get_session(session_id) is None:
+            return jsonify({'error': {
+                'code': 'RESOURCE_NOT_FOUND',
+                'message': f"Session {session_id} not found"
+            }}), 404
+        return cached_json(['image_metrics'],
+                           lambda: _session_prediction(session_id, model, target))
+
+    def _session_prediction(session_id, model, target):
+        prediction = growth_trackers[model].predict(session_id, target)
+        if prediction is None:
+            return {'session_id': session_id, 'model': model,
+                    'status': 'insufficient_data'}
+        return prediction
+
     @app.route('/api/current-status')
     def current_status():
-        # Get latest readings
-        sensor_data = database.get_recent_sensor_data(1)  # Last hour
-        image_data = database.get_recent_image_metrics(1)  # Last hour
+        return cached_json(['sensor_data', 'image_metrics'], _current_status)
         
-        latest_sensor = sensor_data[0] if sensor_data else None
-        latest_image = image_data[0] if image_data else None
+    def _current_status():
+        # Get latest readings from the last hour
+        latest_sensor = database.get_latest_sensor_data(max_age=3600)
+        latest_image = database.get_latest_image_metrics(max_age=3600)
         
-        return jsonify({
+        return {
             'temperature': latest_sensor['temperature'] if latest_sensor else None,
             'humidity': latest_sensor['humidity'] if latest_sensor else None,
             'fermentation_activity': latest_image['surface_activity'] if latest_image else 0,
             'bubble_count': latest_image['bubble_count'] if latest_image else 0,
+            'dough_size': latest_image['dough_area'] if latest_image else None,
+            'size_change_percent': (latest_image['area_change']
+                                    if latest_image else None),
             'last_update': latest_sensor['timestamp'] if latest_sensor else time.time()
-        })
+        }
         
     return app
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+Server-side response cache for the dashboard API.
+
+Entries are keyed by endpoint and query parameters and remember the data
+version of every table they were computed from. A write to one of those
+tables makes the entry stale; until then repeated polls are answered from
+memory, and clients holding the current ETag get a 304 without any database
+access.
+"""
+
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+
+
+class CacheEntry:
+    def __init__(self, versions, body, etag, last_modified, created):
+        self.versions = versions
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.created = created
+
+
+class ResponseCache:
+    """LRU cache of serialized JSON responses invalidated by database writes."""
+
+    def __init__(self, database, max_entries=256, max_age=30.0):
+        """
+        Initialize ResponseCache.
+
+        Args:
+            database: Database providing get_data_version() and write notifications
+            max_entries: Maximum number of cached responses
+            max_age: Seconds after which an entry is recomputed even without
+                     writes, so sliding "last N hours" windows move forward
+        """
+        self.database = database
+        self.max_entries = max_entries
+        self.max_age = max_age
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+        self._entries = OrderedDict()
+        self._tables = {}
+        self._lock = threading.Lock()
+        database.add_write_listener(self.invalidate_table)
+
+    def versions(self, tables):
+        """Current data versions of the given tables."""
+        return tuple(self.database.get_data_version(table)[0] for table in tables)
+
+    def lookup(self, key, versions):
+        """Return the entry for key if it matches versions and is fresh, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.versions != versions or time.time() - entry.created > self.max_age:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def store(self, key, tables, versions, body):
+        """
+        Cache a freshly computed body and return its entry.
+
+        versions must be read before the body was computed, so a write that
+        races with the computation leaves the entry stale rather than wrong.
+        """
+        modified = [self.database.get_data_version(table)[1] for table in tables]
+        modified = [value for value in modified if value is not None]
+        entry = CacheEntry(
+            versions,
+            body,
+            hashlib.sha1(body).hexdigest(),
+            max(modified) if modified else time.time(),
+            time.time()
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            for table in tables:
+                self._tables.setdefault(table, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate_table(self, table):
+        """Drop every entry computed from a table."""
+        with self._lock:
+            for key in self._tables.pop(table, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tables.clear()
+
+    def get_stats(self):
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            'entries': entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+        }
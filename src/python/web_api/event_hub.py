@@ -0,0 +1,135 @@
+"""
+In-process publish/subscribe hub for live dashboard updates.
+
+Producers such as the analysis engine call publish() once per event. The
+event is serialized to a Server-Sent Events frame a single time and handed
+to every subscriber callback; a short history is kept so reconnecting
+clients can catch up from their Last-Event-ID. MetricsPublisher turns
+committed image metrics rows into events.
+"""
+
+from collections import deque
+import json
+import threading
+
+
+def _json_default(value):
+    # numpy scalars from the metric computations
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+class Event:
+    def __init__(self, event_id, name, data, frame):
+        self.id = event_id
+        self.name = name
+        self.data = data
+        self.frame = frame
+
+
+class EventHub:
+    """Fans published events out to all subscribers."""
+
+    def __init__(self, history=256):
+        """
+        Initialize EventHub.
+
+        Args:
+            history: Number of recent events kept for replay after a reconnect
+        """
+        self.published = 0
+        self.subscriber_errors = 0
+
+        self._history = deque(maxlen=history)
+        self._subscribers = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """Call callback(event) for every event published from now on."""
+        with self._lock:
+            self._subscribers = self._subscribers + [callback]
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers = [cb for cb in self._subscribers if cb is not callback]
+
+    def publish(self, name, data):
+        """Serialize an event once and deliver it to every subscriber."""
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            payload = json.dumps(data, default=_json_default)
+            frame = f"id: {event_id}\nevent: {name}\ndata: {payload}\n\n".encode()
+            event = Event(event_id, name, data, frame)
+            self._history.append(event)
+            self.published += 1
+            # Subscribers are replaced rather than mutated, so this snapshot is safe
+            subscribers = self._subscribers
+
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                self.subscriber_errors += 1
+                print(f"Event subscriber failed: {e}")
+        return event
+
+    def replay(self, last_event_id):
+        """Events newer than last_event_id that are still in the history."""
+        with self._lock:
+            return [event for event in self._history if event.id > last_event_id]
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'subscriber_errors': self.subscriber_errors,
+                'last_event_id': self._next_id - 1,
+            }
+
+
+class MetricsPublisher:
+    """
+    Publishes image metrics rows as 'metrics' events once they are committed.
+
+    With write-behind storage a row only gets its id when its batch commits,
+    so events are sent from the database's write listener rather than when a
+    measurement is produced. Every event then carries the row id (and source)
+    that dashboards use to merge pushed rows with polled ones.
+    """
+
+    def __init__(self, database, hub, batch_size=1000):
+        """
+        Initialize MetricsPublisher.
+
+        Args:
+            database: Database whose committed image metrics are published
+            hub: EventHub receiving the events
+            batch_size: Rows read per query when catching up
+        """
+        self.database = database
+        self.hub = hub
+        self.batch_size = batch_size
+        # Only rows committed from now on are pushed
+        self.last_id = database.get_last_id('image_metrics')
+        self._lock = threading.Lock()
+        database.add_write_listener(self._on_write)
+
+    def _on_write(self, table):
+        if table != 'image_metrics':
+            return
+        try:
+            with self._lock:
+                while True:
+                    rows = self.database.get_image_metrics_since(after_id=self.last_id,
+                                                                 limit=self.batch_size)
+                    for row in rows:
+                        self.hub.publish('metrics', row)
+                        self.last_id = row['id']
+                    if len(rows) < self.batch_size:
+                        break
+        except Exception as e:
+            print(f"Publishing new metrics failed: {e}")
@@ -0,0 +1,125 @@
+"""
+Production serving for the dashboard and REST API.
+
+serve() runs the Flask app under gunicorn with several worker processes when
+gunicorn is installed, and otherwise under a threaded werkzeug server. Each
+worker opens its own Database on the shared SQLite file and runs a
+ChangeTailer, so cached responses follow writes made by the separate
+analysis process. SIGTERM stops accepting connections, lets in-flight
+requests finish and closes the database. Workers publish their metrics to
+the telemetry directory inherited from the monitor, so /metrics on any
+worker reports all of them.
+"""
+
+from typing import Callable, Optional
+import signal
+import threading
+
+import telemetry
+from data_storage.change_tailer import ChangeTailer
+from data_storage.database import Database
+from .app import create_app
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:
+    BaseApplication = None
+
+
+def create_web_app(db_path: str, events_port: Optional[int] = None,
+                   tail_interval: float = 1.0):
+    """Build the Flask app for a web worker that does not run the analysis loop."""
+    telemetry.configure()
+    database = Database(db_path)
+    tailer = ChangeTailer(database, interval=tail_interval)
+    tailer.start()
+    app = create_app(database, events_port=events_port)
+    app.extensions['database'] = database
+    app.extensions['change_tailer'] = tailer
+    return app
+
+
+def shutdown_web_app(app):
+    """Stop the tailer and close the worker's database connections."""
+    tailer = app.extensions.get('change_tailer')
+    if tailer is not None:
+        tailer.stop()
+    database = app.extensions.get('database')
+    if database is not None:
+        database.close()
+    telemetry.shutdown()
+
+
+if BaseApplication is not None:
+    class GunicornServer(BaseApplication):
+        """gunicorn application loading a fresh app in every worker process."""
+
+        def __init__(self, app_factory: Callable, options: dict):
+            self.app_factory = app_factory
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.app_factory()
+
+
+def serve(db_path: str, host: str = '0.0.0.0', port: int = 5000, workers: int = 2,
+          threads: int = 4, graceful_timeout: float = 30.0,
+          events_port: Optional[int] = None):
+    """
+    Serve the web app until SIGTERM or SIGINT.
+
+    Args:
+        db_path: SQLite database shared with the analysis process
+        host: Interface to bind
+        port: HTTP port
+        workers: Worker processes (gunicorn only)
+        threads: Request threads per worker
+        graceful_timeout: Seconds in-flight requests get to finish on shutdown
+        events_port: Port of the SSE server, passed to the dashboard
+    """
+    def app_factory():
+        return create_web_app(db_path, events_port)
+
+    if BaseApplication is not None:
+        GunicornServer(app_factory, {
+            'bind': f"{host}:{port}",
+            'workers': workers,
+            'worker_class': 'gthread',
+            'threads': threads,
+            'graceful_timeout': graceful_timeout,
+            # Every worker needs its own SQLite connections, so nothing is preloaded
+            'preload_app': False,
+            'worker_exit': lambda server, worker: shutdown_web_app(worker.wsgi),
+        }).run()
+        return
+
+    print("gunicorn is not installed; serving with a single threaded werkzeug process")
+    _serve_werkzeug(app_factory(), host, port)
+
+
+def _serve_werkzeug(app, host: str, port: int):
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app, threaded=True)
+    # Non-daemon request threads are joined by server_close(), draining
+    # in-flight requests
+    server.daemon_threads = False
+
+    def request_shutdown(signum, frame):
+        # shutdown() blocks until serve_forever() returns, so call it off this thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    previous = {sig: signal.signal(sig, request_shutdown)
+                for sig in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        shutdown_web_app(app)
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
@@ -0,0 +1,192 @@
+"""
+Server-Sent Events endpoint for live dashboard updates.
+
+All clients are served by coroutines on a single asyncio event loop running
+in one background thread, so hundreds of idle connections cost a socket and
+a small buffer each rather than a thread. The server subscribes to an
+EventHub once; each published event crosses into the loop with a single
+call_soon_threadsafe() and is then written to every client's transport.
+"""
+
+from typing import Optional
+import asyncio
+import threading
+
+
+EVENTS_PATH = '/api/events'
+
+RESPONSE_HEADERS = (
+    b"HTTP/1.1 200 OK\r\n"
+    b"Content-Type: text/event-stream\r\n"
+    b"Cache-Control: no-cache\r\n"
+    b"Connection: keep-alive\r\n"
+    b"Access-Control-Allow-Origin: *\r\n"
+    b"X-Accel-Buffering: no\r\n"
+    b"\r\n"
+)
+
+
+class SSEServer:
+    """Streams EventHub events to browsers as text/event-stream."""
+
+    def __init__(self, hub, host: str = '0.0.0.0', port: int = 5001,
+                 max_clients: int = 1000, max_buffer: int = 256 * 1024,
+                 keepalive: float = 15.0):
+        """
+        Initialize SSEServer.
+
+        Args:
+            hub: EventHub providing the events
+            host: Interface to listen on
+            port: TCP port (0 picks a free port, see .port after start())
+            max_clients: Connections beyond this are refused with 503
+            max_buffer: Bytes of unsent data after which a slow client is dropped
+            keepalive: Seconds between comment lines that keep proxies from
+                       closing idle connections and detect dead clients
+        """
+        self.hub = hub
+        self.host = host
+        self.port = port
+        self.max_clients = max_clients
+        self.max_buffer = max_buffer
+        self.keepalive = keepalive
+
+        self.connections = 0
+        self.rejected = 0
+        self.slow_clients_dropped = 0
+
+        self._clients = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    def start(self, timeout: float = 5.0):
+        if self._thread is not None:
+            return
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="sse-server")
+        self._thread.daemon = True
+        self._thread.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("SSE server did not start")
+        self.hub.subscribe(self._on_event)
+
+    def stop(self, timeout: float = 5.0):
+        if self._thread is None:
+            return
+        self.hub.unsubscribe(self._on_event)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def get_stats(self) -> dict:
+        return {
+            'clients': len(self._clients),
+            'connections': self.connections,
+            'rejected': self.rejected,
+            'slow_clients_dropped': self.slow_clients_dropped,
+        }
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        asyncio.set_event_loop(loop)
+        try:
+            self._server = loop.run_until_complete(
+                asyncio.start_server(self._handle_client, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+            keepalive = loop.create_task(self._keepalive_loop())
+            self._ready.set()
+            loop.run_forever()
+
+            keepalive.cancel()
+            self._server.close()
+            for writer in list(self._clients):
+                writer.close()
+            loop.run_until_complete(self._server.wait_closed())
+            # Let client handlers observe the closed connections and exit
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        except Exception as e:
+            print(f"SSE server failed: {e}")
+        finally:
+            self._clients.clear()
+            loop.close()
+
+    def _on_event(self, event):
+        # Called on the publisher's thread; one hop into the loop per event
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._broadcast, event.frame)
+
+    def _broadcast(self, frame: bytes):
+        for writer in list(self._clients):
+            self._send(writer, frame)
+
+    def _send(self, writer, frame: bytes):
+        if writer.transport.get_write_buffer_size() > self.max_buffer:
+            # The client is not reading; drop it rather than buffer without bound
+            self.slow_clients_dropped += 1
+            self._clients.discard(writer)
+            writer.close()
+            return
+        writer.write(frame)
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(self.keepalive)
+            self._broadcast(b": keepalive\n\n")
+
+    async def _handle_client(self, reader, writer):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), 10.0)
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), 10.0)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+        except (asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+
+        parts = request_line.decode('latin-1').split()
+        path = parts[1].split('?')[0] if len(parts) >= 2 else ''
+        if len(parts) < 2 or parts[0] != 'GET' or path != EVENTS_PATH:
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\n"
+                         b"Connection: close\r\n\r\n")
+            writer.close()
+            return
+        if len(self._clients) >= self.max_clients:
+            self.rejected += 1
+            writer.write(b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 10\r\n"
+                         b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+            writer.close()
+            return
+
+        try:
+            last_event_id = int(headers.get('last-event-id', '0'))
+        except ValueError:
+            last_event_id = 0
+
+        writer.write(RESPONSE_HEADERS)
+        writer.write(b"retry: 3000\n\n")
+        if last_event_id:
+            for event in self.hub.replay(last_event_id):
+                writer.write(event.frame)
+        self.connections += 1
+        self._clients.add(writer)
+
+        try:
+            # The client never sends anything else; EOF means it went away
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._clients.discard(writer)
+            writer.close()
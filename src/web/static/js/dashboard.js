@@ -2,14 +2,49 @@
 
 let sizeChart;
 
+// True while the server push channel is connected
+let liveUpdates = false;
+
 document.addEventListener('DOMContentLoaded', function() {
     initializeCharts();
     updateDashboard();
+    connectLiveUpdates();
     
-    // Update dashboard every 30 seconds
-    setInterval(updateDashboard, 30000);
+    // Poll every 30 seconds; new measurements arrive by push while connected
+    setInterval(function() {
+        if (liveUpdates) {
+            updateSessionsList();
+        } else {
+            updateDashboard();
+        }
+    }, 30000);
 });
 
+function connectLiveUpdates() {
+    if (typeof EVENTS_PORT === 'undefined' || EVENTS_PORT === null || !window.EventSource) {
+        return;
+    }
+    const source = new EventSource(
+        `${window.location.protocol}//${window.location.hostname}:${EVENTS_PORT}/api/events`);
+    
+    source.onopen = function() {
+        // Catch up on anything written while disconnected
+        if (!liveUpdates) {
+            updateCurrentStatus();
+            updateSizeChart();
+        }
+        liveUpdates = true;
+    };
+    source.onerror = function() {
+        // EventSource reconnects by itself; poll until it does
+        liveUpdates = false;
+    };
+    source.addEventListener('metrics', function(event) {
+        appendSizeChart([JSON.parse(event.data)]);
+        updateCurrentStatus();
+    });
+}
+
 function initializeCharts() {
     // Dough size chart
     const sizeCtx = document.getElementById('sizeChart').getContext('2d');
@@ -88,30 +123,117 @@ function updateCurrentStatus() {
         });
 }
 
+const CHART_WINDOW_SECONDS = 24 * 3600;
+
+// Id of the newest image metrics row fetched or pushed, for any tray
+let lastMetricId = null;
+// The chart shows one tray; rows of the others only add them to the selector
+let chartSourceId = null;
+const knownSources = new Set();
+let chartTimestamps = [];
+let chartIds = [];
+
 function updateSizeChart() {
-    fetch('/api/image-metrics?hours=24')
+    // First load fetches the whole window; later polls only ask for new rows
+    const url = lastMetricId === null
+        ? `/api/image-metrics?since=${Date.now() / 1000 - CHART_WINDOW_SECONDS}`
+        : `/api/image-metrics?after_id=${lastMetricId}`;
+    
+    fetch(url)
         .then(response => response.json())
         .then(data => {
-            const labels = data.map(item => 
-                new Date(item.timestamp * 1000).toLocaleTimeString('en-US', {
-                    hour: '2-digit',
-                    minute: '2-digit'
-                })
-            ).reverse();
-            
-            const doughSizes = data.map(item => item.dough_size || 0).reverse();
-            const sizeChanges = data.map(item => item.size_change || 0).reverse();
-            
-            sizeChart.data.labels = labels;
-            sizeChart.data.datasets[0].data = doughSizes;
-            sizeChart.data.datasets[1].data = sizeChanges;
-            sizeChart.update();
+            if (lastMetricId === null) {
+                resetSizeChart();
+            }
+            appendSizeChart(data.rows);
+            // The server's cursor is the newest id even when the window is empty,
+            // so the next poll never pages through the whole history
+            lastMetricId = Math.max(lastMetricId || 0, data.last_id || 0);
+            if (data.has_more) {
+                updateSizeChart();
+            }
         })
         .catch(error => {
             console.error('Error updating size chart:', error);
         });
 }
 
+function formatChartTime(timestamp) {
+    return new Date(timestamp * 1000).toLocaleTimeString('en-US', {
+        hour: '2-digit',
+        minute: '2-digit'
+    });
+}
+
+function resetSizeChart() {
+    sizeChart.data.labels = [];
+    sizeChart.data.datasets[0].data = [];
+    sizeChart.data.datasets[1].data = [];
+    chartTimestamps = [];
+    chartIds = [];
+}
+
+function selectChartSource(sourceId) {
+    chartSourceId = sourceId;
+    // Reload the window for the newly selected tray
+    lastMetricId = null;
+    updateSizeChart();
+}
+
+function addChartSource(sourceId) {
+    if (knownSources.has(sourceId)) {
+        return;
+    }
+    knownSources.add(sourceId);
+    const option = document.createElement('option');
+    option.value = sourceId;
+    option.textContent = sourceId || 'Default';
+    const select = document.getElementById('chart-source');
+    select.appendChild(option);
+    select.value = chartSourceId;
+}
+
+function appendSizeChart(rows) {
+    let added = 0;
+    rows.forEach(item => {
+        if (item.id !== undefined) {
+            lastMetricId = Math.max(lastMetricId || 0, item.id);
+        }
+        const sourceId = item.source_id || '';
+        if (chartSourceId === null) {
+            chartSourceId = sourceId;
+        }
+        addChartSource(sourceId);
+        // Pushed measurements may already have been fetched by a poll, or vice versa
+        if (sourceId !== chartSourceId || chartIds.includes(item.id)) {
+            return;
+        }
+        added++;
+        chartIds.push(item.id);
+        chartTimestamps.push(item.timestamp);
+        sizeChart.data.labels.push(formatChartTime(item.timestamp));
+        sizeChart.data.datasets[0].data.push(item.dough_area || 0);
+        sizeChart.data.datasets[1].data.push(item.area_change || 0);
+    });
+    
+    // Drop points that have slid out of the 24 hour window
+    const cutoff = Date.now() / 1000 - CHART_WINDOW_SECONDS;
+    let expired = 0;
+    while (expired < chartTimestamps.length && chartTimestamps[expired] < cutoff) {
+        expired++;
+    }
+    if (expired > 0) {
+        chartTimestamps.splice(0, expired);
+        chartIds.splice(0, expired);
+        sizeChart.data.labels.splice(0, expired);
+        sizeChart.data.datasets.forEach(dataset => dataset.data.splice(0, expired));
+    }
+    
+    if (added > 0 || expired > 0) {
+        sizeChart.update();
+    }
+}
+
 function updateSessionsList() {
     fetch('/api/sessions')
         .then(response => response.json())
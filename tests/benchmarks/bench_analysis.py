@@ -0,0 +1,68 @@
+"""
+Per-frame latency of the image analysis.
+
+Synthetic rising-dough frames at several resolutions are analyzed metric by
+metric on the full frame (each with a fresh FrameContext, so a metric pays
+for the intermediates it needs), then end to end through
+FermentationAnalyzer with and without dough segmentation. The end-to-end runs
+disable change detection so every frame is analyzed; its own cost, and that
+of a sample that reuses the last metrics, are measured separately.
+"""
+
+import itertools
+
+from common import measure
+
+from image_processing.change_detector import ChangeDetector
+from image_processing.fermentation_analyzer import FermentationAnalyzer
+from image_processing.frame_context import FrameContext
+from image_processing.frame_sources import SyntheticSource
+from image_processing.metrics import METRICS, compute_metrics
+from image_processing.reference_frame import ReferenceFrame
+from image_processing.segmentation import DoughSegmenter, detect_dough
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+
+
+def run(results, quick=False):
+    resolutions = RESOLUTIONS[:2] if quick else RESOLUTIONS
+    repeat = 5 if quick else 20
+    for width, height in resolutions:
+        size = f"{width}x{height}"
+        frames = [frame for _, frame in SyntheticSource(12, width, height, growth=1.0)]
+        reference = ReferenceFrame(frames[0])
+        current = frames[-1]
+        region = detect_dough(current)
+
+        for name in METRICS:
+            results.add(f"analysis/metric/{name}/{size}", measure(
+                lambda name=name: compute_metrics(
+                    FrameContext(current, reference, region, reference.region), [name]),
+                repeat=repeat), width=width, height=height)
+
+        results.add(f"analysis/segmentation/detect/{size}",
+                    measure(lambda: DoughSegmenter().detect(current), repeat=repeat))
+        segmenter = DoughSegmenter()
+        cycle = itertools.cycle(frames)
+        results.add(f"analysis/segmentation/track/{size}",
+                    measure(lambda: segmenter.segment(next(cycle)), repeat=repeat))
+
+        for segmentation in (True, False):
+            analyzer = FermentationAnalyzer(save_frames=False, segmentation=segmentation,
+                                            change_detection=False)
+            cycle = itertools.cycle(frames)
+            label = 'segmented' if segmentation else 'full_frame'
+            results.add(f"analysis/frame/{label}/{size}", measure(
+                lambda: analyzer.compute_metrics(next(cycle), reference, 'bench'), repeat=repeat),
+                width=width, height=height)
+
+        detector = ChangeDetector()
+        detector.accept(detector.check(current))
+        results.add(f"analysis/change/check/{size}",
+                    measure(lambda: detector.check(current), repeat=repeat))
+        # Every max_reuse-th sample is analyzed anyway; the median is the pure reuse path
+        analyzer = FermentationAnalyzer(save_frames=False)
+        analyzer.compute_metrics(current, reference, 'bench')
+        results.add(f"analysis/frame/unchanged/{size}", measure(
+            lambda: analyzer.compute_metrics(current, reference, 'bench'), repeat=repeat),
+            width=width, height=height)
@@ -0,0 +1,53 @@
+"""
+REST API response times through the Flask test client.
+
+Each endpoint is timed uncached (a throwaway query parameter gives every
+request its own cache key) and cached (the same request repeated).
+"""
+
+import os
+import tempfile
+import time
+import numpy as np
+
+from common import measure
+
+from bench_database import make_rows
+from data_storage.database import Database
+from web_api.app import create_app
+
+ENDPOINTS = {
+    'current_status': '/api/current-status',
+    'image_metrics_1h': '/api/image-metrics?hours=1',
+    'image_metrics_delta': '/api/image-metrics?after_id={last_id}&limit=500',
+    'chart_24h': '/api/chart-data?hours=24&points=500',
+    'chart_7d_minmax': '/api/chart-data?hours=168&points=500&method=minmax',
+    'prediction': '/api/sessions/1/prediction',
+    'sessions': '/api/sessions',
+}
+
+
+def run(results, quick=False):
+    rows_total = 50000 if quick else 200000
+    repeat = 10 if quick else 30
+    with tempfile.TemporaryDirectory() as directory:
+        database = Database(os.path.join(directory, 'api.db'))
+        rng = np.random.default_rng(0)
+        end_time = time.time()
+        for offset in range(0, rows_total, 10000):
+            database.store_image_metrics_batch(make_rows(offset, 10000, end_time, rows_total, rng))
+        database.create_session('Benchmark')
+        client = create_app(database).test_client()
+
+        for name, path in ENDPOINTS.items():
+            path = path.format(last_id=rows_total - 500)
+            separator = '&' if '?' in path else '?'
+            counter = iter(range(10 ** 9))
+
+            def uncached():
+                response = client.get(f"{path}{separator}_={next(counter)}")
+                assert response.status_code == 200, response.status_code
+
+            results.add(f"api/{name}/uncached", measure(uncached, repeat=repeat), rows=rows_total)
+            results.add(f"api/{name}/cached", measure(lambda: client.get(path), repeat=repeat))
+        database.close()
@@ -0,0 +1,88 @@
+"""
+Database insert rate and query latency on a large history.
+
+The database is filled with rows_total image metrics rows (four trays, one
+row every few seconds, spread over several sessions) through the batch
+insert path, which also maintains the rollup tables. Queries then run
+against the full table the way the dashboard and exporters use it.
+"""
+
+import os
+import tempfile
+import time
+import numpy as np
+
+from common import measure, throughput
+
+from data_storage.database import Database
+
+TRAYS = 4
+ROW_SPACING = 2.5  # seconds between rows across all trays
+
+
+def make_rows(start_index, count, end_time, rows_total, rng):
+    indices = np.arange(start_index, start_index + count)
+    timestamps = end_time - (rows_total - indices) * ROW_SPACING
+    values = rng.random((count, 4))
+    return [{
+        'timestamp': float(timestamps[row]),
+        'volume_change': float(values[row, 0] * 100),
+        'surface_activity': float(values[row, 1] * 10),
+        'bubble_count': int(values[row, 2] * 50),
+        'texture_variance': float(values[row, 3] * 500),
+        'dough_area': float(values[row, 0] * 1e5),
+        'area_change': float(values[row, 0] * 100),
+        'source_id': f"tray-{indices[row] % TRAYS}",
+        'session_id': int(indices[row] // 20000) + 1,
+    } for row in range(count)]
+
+
+def run(results, quick=False, rows_total=None):
+    rows_total = rows_total or (100000 if quick else 1000000)
+    repeat = 5 if quick else 20
+    rng = np.random.default_rng(0)
+    end_time = time.time()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = Database(os.path.join(directory, 'bench.db'))
+
+        batch = 10000
+        start = time.perf_counter()
+        for offset in range(0, rows_total, batch):
+            database.store_image_metrics_batch(
+                make_rows(offset, min(batch, rows_total - offset), end_time, rows_total, rng))
+        results.add('database/insert/batch', throughput(rows_total, time.perf_counter() - start, 'rows/s'),
+                    rows=rows_total, batch_size=batch)
+
+        single = Database(os.path.join(directory, 'single.db'))
+        rows = make_rows(0, 2000, end_time, 2000, rng)
+        start = time.perf_counter()
+        for row in rows:
+            single.store_image_metrics(row)
+        results.add('database/insert/single', throughput(len(rows), time.perf_counter() - start, 'rows/s'))
+        single.close()
+
+        writer = Database(os.path.join(directory, 'write_behind.db'), write_behind=True)
+        start = time.perf_counter()
+        for row in rows:
+            writer.store_image_metrics(row)
+        writer.flush()
+        results.add('database/insert/write_behind', throughput(len(rows), time.perf_counter() - start,
+                                                                'rows/s'))
+        writer.close()
+
+        last_id = rows_total
+        queries = {
+            'latest': lambda: database.get_latest_image_metrics(),
+            'recent_1h': lambda: database.get_recent_image_metrics(1),
+            'recent_1h_source': lambda: database.get_recent_image_metrics(1, source_id='tray-1'),
+            'since_id_1000': lambda: database.get_image_metrics_since(after_id=last_id - 1000),
+            'series_24h': lambda: database.get_image_metrics_series(end_time - 86400),
+            'series_7d': lambda: database.get_image_metrics_series(end_time - 7 * 86400),
+            'series_all': lambda: database.get_image_metrics_series(0),
+            'session_points': lambda: database.get_session_metric_points('volume_change',
+                                                                         last_id - 20000, 20000),
+        }
+        for name, query in queries.items():
+            results.add(f"database/query/{name}", measure(query, repeat=repeat), rows=rows_total)
+        database.close()
@@ -0,0 +1,60 @@
+"""
+ImageProcessor.load_from_file throughput for JPEG and PNG captures, decoded,
+from the image cache and as reduced previews.
+"""
+
+import os
+import tempfile
+import time
+import cv2
+
+from common import throughput
+
+from image_processing.frame_sources import SyntheticSource
+from image_processing.image_cache import ImageCache
+from image_processing.image_processor import ImageProcessor
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+
+
+def run(results, quick=False):
+    resolutions = RESOLUTIONS[:2] if quick else RESOLUTIONS
+    count = 10 if quick else 40
+    # A zero budget caches nothing, so every load decodes
+    processor = ImageProcessor(cache=ImageCache(max_bytes=0))
+    with tempfile.TemporaryDirectory() as directory:
+        for width, height in resolutions:
+            frames = [frame for _, frame in SyntheticSource(count, width, height)]
+            for extension in ('jpg', 'png'):
+                paths = []
+                for index, frame in enumerate(frames):
+                    path = os.path.join(directory, f"frame_{width}_{index}.{extension}")
+                    cv2.imwrite(path, frame)
+                    paths.append(path)
+
+                processor.load_from_file(paths[0])
+                start = time.perf_counter()
+                for path in paths:
+                    if not processor.load_from_file(path).is_valid:
+                        raise RuntimeError(f"Could not load {path}")
+                elapsed = time.perf_counter() - start
+                results.add(f"image_io/load/{extension}/{width}x{height}",
+                            throughput(len(paths), elapsed, 'images/s'),
+                            megapixels_per_s=len(paths) * width * height / 1e6 / elapsed)
+
+                cached = ImageProcessor(cache=ImageCache())
+                for path in paths:
+                    cached.load_from_file(path)
+                start = time.perf_counter()
+                for path in paths:
+                    cached.load_from_file(path)
+                elapsed = time.perf_counter() - start
+                results.add(f"image_io/load_cached/{extension}/{width}x{height}",
+                            throughput(len(paths), elapsed, 'images/s'))
+
+                start = time.perf_counter()
+                for path in paths:
+                    processor.load_from_file(path, reduction=4)
+                elapsed = time.perf_counter() - start
+                results.add(f"image_io/load_reduced_4/{extension}/{width}x{height}",
+                            throughput(len(paths), elapsed, 'images/s'))
@@ -0,0 +1,131 @@
+"""
+Timing helpers and JSON result format shared by the benchmark suites.
+
+Every measurement is stored under a stable name such as
+"analysis/metric/bubble_count/1920x1080", either as a latency distribution
+(milliseconds) or as a throughput (higher is better). compare() matches two
+result files by name and reports what got slower.
+"""
+
+from typing import Callable, Dict, List
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src/python'))
+
+
+def measure(func: Callable[[], object], repeat: int = 20, warmup: int = 2,
+            max_seconds: float = 10.0) -> dict:
+    """
+    Time repeated calls of func.
+
+    Args:
+        func: Function under test, called without arguments
+        repeat: Number of timed calls
+        warmup: Untimed calls made first (caches, lazy imports)
+        max_seconds: Stop early once this much time has been spent timing
+
+    Returns:
+        Latency statistics in milliseconds
+    """
+    for _ in range(warmup):
+        func()
+    samples = []
+    deadline = time.perf_counter() + max_seconds
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+        if time.perf_counter() > deadline:
+            break
+    samples = np.array(samples)
+    return {
+        'median_ms': float(np.median(samples)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'min_ms': float(samples.min()),
+        'mean_ms': float(samples.mean()),
+        'runs': len(samples),
+    }
+
+
+def throughput(count: int, seconds: float, unit: str) -> dict:
+    return {'rate': count / seconds if seconds > 0 else float('inf'), 'unit': unit,
+            'count': count, 'seconds': seconds}
+
+
+def environment() -> dict:
+    """Machine and software versions the results were measured with."""
+    import cv2
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {
+        'timestamp': time.time(),
+        'commit': commit or None,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+    }
+
+
+class BenchmarkResults:
+    """Named measurements of one benchmark run."""
+
+    def __init__(self, quick: bool = False):
+        self.quick = quick
+        self.results = {}  # type: Dict[str, dict]
+
+    def add(self, name: str, stats: dict, **params):
+        entry = dict(stats)
+        if params:
+            entry['params'] = params
+        self.results[name] = entry
+        if 'rate' in entry:
+            print(f"  {name:<58} {entry['rate']:>12.1f} {entry['unit']}")
+        else:
+            print(f"  {name:<58} {entry['median_ms']:>9.2f} ms  (p95 {entry['p95_ms']:.2f})")
+
+    def to_dict(self) -> dict:
+        return {'environment': environment(), 'quick': self.quick, 'results': self.results}
+
+    def save(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as out:
+            json.dump(self.to_dict(), out, indent=2, sort_keys=True)
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.2,
+            min_delta_ms: float = 0.1) -> List[str]:
+    """
+    Regressions of current against baseline, as readable lines.
+
+    Latencies regress when the median grows by more than tolerance,
+    throughputs when the rate falls by more than tolerance. Latency changes
+    below min_delta_ms are timer noise and never count.
+    """
+    regressions = []
+    for name, entry in sorted(current['results'].items()):
+        previous = baseline['results'].get(name)
+        if previous is None:
+            continue
+        if 'rate' in entry and 'rate' in previous:
+            if entry['rate'] < previous['rate'] / (1.0 + tolerance):
+                regressions.append(f"{name}: {previous['rate']:.1f} -> {entry['rate']:.1f} {entry['unit']}")
+        elif 'median_ms' in entry and 'median_ms' in previous:
+            slower = entry['median_ms'] - previous['median_ms']
+            if entry['median_ms'] > previous['median_ms'] * (1.0 + tolerance) and slower >= min_delta_ms:
+                regressions.append(f"{name}: {previous['median_ms']:.2f} -> {entry['median_ms']:.2f} ms")
+    return regressions
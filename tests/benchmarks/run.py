@@ -0,0 +1,71 @@
+"""
+Benchmark runner for the analysis, storage and API hot paths.
+
+Usage (from the repository root):
+    python tests/benchmarks/run.py                          # all suites, JSON to build/benchmarks.json
+    python tests/benchmarks/run.py --quick analysis api     # smaller inputs, selected suites
+    python tests/benchmarks/run.py --baseline pi4.json      # exit 1 if anything got >20% slower
+
+Results are only comparable between runs on the same machine; keep one
+baseline file per target (e.g. the Raspberry Pi 4) and compare against it
+before deploying.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import common
+import bench_analysis
+import bench_api
+import bench_database
+import bench_image_io
+
+SUITES = {
+    'analysis': bench_analysis.run,
+    'image_io': bench_image_io.run,
+    'database': bench_database.run,
+    'api': bench_api.run,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the fermentation monitor benchmarks")
+    parser.add_argument('suites', nargs='*',
+                        help=f"Suites to run: {', '.join(SUITES)} (default: all)")
+    parser.add_argument('--quick', action='store_true', help="Smaller inputs and fewer repetitions")
+    parser.add_argument('--output', default=os.path.join(common.REPO_ROOT, 'build/benchmarks.json'),
+                        help="Where to write the JSON results")
+    parser.add_argument('--baseline', help="Earlier results to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Allowed relative slowdown before a result counts as a regression")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.suites if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown suite(s): {', '.join(unknown)}")
+
+    results = common.BenchmarkResults(quick=args.quick)
+    for name in args.suites or list(SUITES):
+        print(f"[{name}]")
+        SUITES[name](results, quick=args.quick)
+    results.save(args.output)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = common.compare(results.to_dict(), baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
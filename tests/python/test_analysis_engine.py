@@ -0,0 +1,236 @@
+"""
+Tests for AnalysisEngine class.
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+import cv2
+import numpy as np
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from image_processing import analysis_engine
+from image_processing.analysis_engine import AnalysisEngine
+from image_processing.frame_sources import SyntheticSource
+from image_processing.scheduler import AdaptiveScheduler
+from data_storage.database import Database
+
+
+class FakeCamera:
+    """Camera stand-in that always returns the same synthetic frame."""
+
+    def __init__(self, seed):
+        rng = np.random.default_rng(seed)
+        self.frame = rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)
+
+    def start(self):
+        pass
+
+    @contextmanager
+    def latest_frame(self, timeout=5.0, newer_than=0):
+        yield self.frame
+
+
+class SequenceCamera:
+    """Camera stand-in returning the given frames in turn, then the last one."""
+
+    def __init__(self, frames):
+        self.frames = list(frames)
+        self.reads = 0
+
+    def start(self):
+        pass
+
+    @contextmanager
+    def latest_frame(self, timeout=5.0, newer_than=0):
+        frame = self.frames[min(self.reads, len(self.frames) - 1)]
+        self.reads += 1
+        yield frame
+
+
+class BrokenCamera:
+    """Camera stand-in whose frame grab always raises."""
+
+    def start(self):
+        pass
+
+    @contextmanager
+    def latest_frame(self, timeout=5.0, newer_than=0):
+        raise IOError("device unplugged")
+        yield
+
+
+def segmenter_counts():
+    """Frames each source's segmenter has seen in this worker process."""
+    analyzer = analysis_engine._worker_analyzer
+    return {source_id: (segmenter.detections, segmenter.tracked)
+            for source_id, segmenter in analyzer._segmenters.items()}
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.02)
+    return predicate()
+
+
+class TestAnalysisEngine:
+    """Test cases for AnalysisEngine class."""
+
+    def test_inline_results_are_tagged_by_source(self, tmp_path):
+        """Test that results land in the database tagged with source and session."""
+        db = Database(str(tmp_path / "test.db"))
+        engine = AnalysisEngine(db, workers=0, data_dir=str(tmp_path))
+        engine.add_source('tray-0', FakeCamera(0), interval=60, session_id=7)
+        engine.add_source('tray-1', FakeCamera(1), interval=60, roi=(0, 0, 32, 24))
+        engine.start()
+        try:
+            assert wait_for(lambda: len(db.get_recent_image_metrics(1)) == 2)
+        finally:
+            engine.stop()
+
+        rows = db.get_recent_image_metrics(1, source_id='tray-0')
+        assert len(rows) == 1
+        assert rows[0]['session_id'] == 7
+        assert os.path.exists(engine.reference_path('tray-1'))
+
+    def test_failing_source_does_not_stop_the_others(self, tmp_path):
+        """Test that an exception while dispatching one source is counted and retried."""
+        db = Database(str(tmp_path / "test.db"))
+        engine = AnalysisEngine(db, workers=0, data_dir=str(tmp_path), retry_interval=0.05)
+        broken = engine.add_source('tray-0', BrokenCamera(), interval=60)
+        healthy = engine.add_source('tray-1', FakeCamera(1), interval=60)
+        engine.start()
+        try:
+            assert wait_for(lambda: healthy.completed == 1 and broken.failed >= 2, timeout=5.0)
+            assert engine._thread.is_alive()
+            assert not broken.in_flight
+            assert engine.get_stats()['pending'] == 0
+        finally:
+            engine.stop()
+
+    def test_blank_first_frame_is_not_the_reference(self, tmp_path):
+        """Test that the reference is taken from the first frame showing a scene."""
+        dough = [frame for _, frame in SyntheticSource(2, 160, 120)]
+        camera = SequenceCamera([np.zeros((120, 160, 3), np.uint8)] + dough)
+        db = Database(str(tmp_path / "test.db"))
+        engine = AnalysisEngine(db, workers=0, data_dir=str(tmp_path), retry_interval=0.05)
+        source = engine.add_source('tray-0', camera, interval=60)
+        engine.start()
+        try:
+            assert wait_for(lambda: source.completed == 1, timeout=5.0)
+        finally:
+            engine.stop()
+
+        assert source.failed == 1
+        reference = cv2.imread(engine.reference_path('tray-0'))
+        assert reference.std() > 10
+        # JPEG round trip of the first dough frame
+        assert np.abs(reference.astype(int) - dough[0]).mean() < 3
+        rows = db.get_recent_image_metrics(1)
+        assert len(rows) == 1
+        assert rows[0]['volume_change'] < 3
+
+    def test_lighting_change_relights_reference(self, tmp_path):
+        """Test that the stored reference follows a lighting change that persisted."""
+        dough = [frame for _, frame in SyntheticSource(1, 320, 240)][0]
+        brighter = cv2.convertScaleAbs(dough, alpha=1.3)
+        camera = SequenceCamera([dough, brighter, brighter, brighter])
+        db = Database(str(tmp_path / "test.db"))
+        engine = AnalysisEngine(db, workers=0, data_dir=str(tmp_path))
+        source = engine.add_source('tray-0', camera, interval=0.05)
+        engine.start()
+        try:
+            assert wait_for(lambda: source.completed >= 5)
+        finally:
+            engine.stop()
+
+        assert source.rejected == 2
+        reference = cv2.imread(engine.reference_path('tray-0'))
+        assert abs(float(reference.mean()) - float(brighter.mean())) < 3.0
+        rows = db.get_recent_image_metrics(1)
+        assert all(row['volume_change'] < 3.0 for row in rows)
+
+    def test_change_detection_spans_worker_processes(self, tmp_path):
+        """Test that a source's change history holds whichever worker runs its jobs."""
+        dough = [frame for _, frame in SyntheticSource(1, 320, 240)][0]
+        covered = dough.copy()
+        covered[:, :130] = (120, 150, 200)
+        camera = SequenceCamera([dough, covered, covered, covered])
+        db = Database(str(tmp_path / "test.db"))
+        engine = AnalysisEngine(db, workers=2, data_dir=str(tmp_path))
+        source = engine.add_source('tray-0', camera, interval=0.05)
+        engine.start()
+        try:
+            assert wait_for(lambda: source.completed >= 7, timeout=30.0)
+        finally:
+            engine.stop()
+
+        # Analyzed: the first frame and the occlusion once it persisted for
+        # three checks; every later frame is unchanged from the last analysis
+        assert source.rejected == 2
+        assert source.reused == source.completed - 4
+        assert source.failed == 0
+
+    def test_process_pool_analysis(self, tmp_path):
+        """Test that jobs complete when run in worker processes."""
+        db = Database(str(tmp_path / "test.db"))
+        engine = AnalysisEngine(db, workers=2, data_dir=str(tmp_path))
+        for tray in range(3):
+            engine.add_source(f"tray-{tray}", FakeCamera(tray), interval=60)
+        engine.start()
+        try:
+            assert wait_for(lambda: len(db.get_recent_image_metrics(1)) == 3, timeout=30.0)
+            stats = engine.get_stats()
+            assert stats['pending'] == 0
+            assert all(s['completed'] == 1 for s in stats['sources'].values())
+            # Frames went to the workers through shared memory
+            assert stats['frame_bus']['published'] == 3
+        finally:
+            engine.stop()
+
+    def test_sources_stay_on_one_worker(self, tmp_path):
+        """Test that a tray's dough region is tracked by a single worker process."""
+        dough = [frame for _, frame in SyntheticSource(1, 320, 240)][0]
+        db = Database(str(tmp_path / "test.db"))
+        engine = AnalysisEngine(db, workers=2, data_dir=str(tmp_path),
+                                change_detection=False)
+        sources = [engine.add_source(f"tray-{tray}", SequenceCamera([dough]),
+                                     interval=0.05)
+                   for tray in range(2)]
+        engine.start()
+        try:
+            assert wait_for(lambda: all(s.completed >= 4 for s in sources),
+                            timeout=30.0)
+            counts = [executor.submit(segmenter_counts).result()
+                      for executor in engine._executors]
+        finally:
+            engine.stop()
+
+        for source in sources:
+            held = [worker[source.source_id] for worker in counts
+                    if source.source_id in worker]
+            assert len(held) == 1
+            detections, tracked = held[0]
+            # Detected once, then followed from frame to frame
+            assert detections == 1
+            assert detections + tracked >= source.completed
+
+    def test_adaptive_scheduler_sets_interval(self, tmp_path):
+        """Test that a scheduler's interval is applied to the source after each result."""
+        db = Database(str(tmp_path / "test.db"))
+        scheduler = AdaptiveScheduler(min_interval=0.05, max_interval=0.2)
+        engine = AnalysisEngine(db, workers=0, data_dir=str(tmp_path), scheduler=scheduler)
+        source = engine.add_source('tray-0', FakeCamera(0), interval=60)
+        engine.start()
+        try:
+            # An unchanging frame is idle dough, so the maximum interval applies
+            assert wait_for(lambda: source.completed >= 3, timeout=5.0)
+        finally:
+            engine.stop()
+
+        assert source.interval == 0.2
+        assert engine.get_stats()['schedule']['tray-0']['phase'] == 'lag'
@@ -0,0 +1,85 @@
+"""
+Tests for multi-scale bubble detection.
+"""
+
+import os
+import sys
+import cv2
+import numpy as np
+import pytest
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from image_processing.bubble_detection import BubbleDetector, detect_bubbles
+from image_processing.frame_context import FrameContext
+from image_processing.segmentation import detect_dough
+
+
+def make_surface(scale=1, diameters=(3.5, 7, 14, 28), per_size=8, seed=0):
+    """Noisy dough surface with rows of dark bubbles, sizes given at 640x480."""
+    height, width = 480 * scale, 640 * scale
+    rng = np.random.default_rng(seed)
+    surface = 200 + rng.integers(-12, 12, (height, width))
+    image = surface.clip(0, 255).astype(np.uint8)
+    for row, diameter in enumerate(diameters):
+        for column in range(per_size):
+            center = ((40 + column * 70) * scale, (60 + row * 110) * scale)
+            cv2.circle(image, center, round(diameter * scale / 2), 140, -1)
+    return image
+
+
+class TestBubbleDetector:
+    """Test cases for BubbleDetector."""
+
+    def test_counts_bubbles_per_size_band(self):
+        """Test that each drawn size lands in its own band."""
+        distribution = detect_bubbles(make_surface(scale=2))
+        assert distribution.count == 32
+        assert distribution.histogram.tolist() == [8, 8, 8, 8]
+
+    @pytest.mark.parametrize('scale', [2, 4])
+    def test_bands_are_resolution_independent(self, scale):
+        """Test that the same scene gives the same distribution at higher resolution."""
+        low = detect_bubbles(make_surface(scale=2))
+        high = detect_bubbles(make_surface(scale=scale))
+        assert high.histogram.tolist() == low.histogram.tolist()
+        assert high.median_diameter == pytest.approx(low.median_diameter, rel=0.1)
+        assert high.coverage == pytest.approx(low.coverage, rel=0.1)
+
+    def test_large_bands_use_coarse_levels(self):
+        """Test that bands are searched on coarser pyramid levels as they grow."""
+        levels = BubbleDetector().levels(1920)
+        band_levels = [level for level in sorted(levels) for _ in levels[level]]
+        assert band_levels == sorted(band_levels)
+        assert band_levels[-1] - band_levels[0] >= 3
+
+    def test_noise_is_not_counted(self):
+        """Test that surface texture alone does not produce bubbles."""
+        distribution = detect_bubbles(make_surface(scale=1, diameters=()))
+        assert distribution.count == 0
+        assert distribution.median_diameter is None
+        assert distribution.coverage == 0.0
+
+    def test_rejects_unordered_edges(self):
+        """Test that band edges must increase."""
+        with pytest.raises(ValueError):
+            BubbleDetector(edges=(0.02, 0.01))
+
+
+class TestBubbleMetrics:
+    """Test cases for the bubble metrics on a frame context."""
+
+    def test_sizes_are_relative_to_dough(self):
+        """Test that with a region bubble sizes are relative to the dough diameter."""
+        frame = np.full((720, 1280, 3), (60, 60, 70), dtype=np.uint8)
+        cv2.circle(frame, (640, 360), 300, (170, 215, 235), -1)
+        for offset in range(-200, 201, 100):
+            cv2.circle(frame, (640 + offset, 360), 12, (120, 160, 180), -1)
+
+        context = FrameContext(frame, region=detect_dough(frame))
+        bubbles = context.bubbles
+        assert bubbles.count == 5
+        # 24 px bubbles on a 600 px dough
+        assert bubbles.median_diameter == pytest.approx(24 / 600, rel=0.15)
+        assert bubbles.coverage == pytest.approx(5 * 12 ** 2 / 300 ** 2, rel=0.2)
@@ -0,0 +1,110 @@
+"""
+Tests for CameraCapture class.
+"""
+
+import os
+import sys
+import time
+import numpy as np
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from image_processing import camera_capture
+from image_processing.camera_capture import CameraCapture, CameraManager
+
+
+class FakeVideoCapture:
+    """Stand-in for cv2.VideoCapture producing numbered frames."""
+
+    def __init__(self, index, fail_after=None):
+        self.index = index
+        self.count = 0
+        self.fail_after = fail_after
+        self.released = False
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop, value):
+        return True
+
+    def grab(self):
+        return True
+
+    def read(self, image=None):
+        time.sleep(0.001)
+        self.count += 1
+        if self.fail_after is not None and self.count > self.fail_after:
+            return False, None
+        if image is None or image.shape != (4, 6, 3):
+            image = np.empty((4, 6, 3), dtype=np.uint8)
+        image[...] = self.count % 256
+        return True, image
+
+    def release(self):
+        self.released = True
+
+
+class TestCameraCapture:
+    """Test cases for CameraCapture class."""
+
+    def test_latest_frame_is_zero_copy_view(self, monkeypatch):
+        """Test that latest_frame yields a read-only view of the ring buffer."""
+        monkeypatch.setattr(camera_capture.cv2, 'VideoCapture', FakeVideoCapture)
+        camera = CameraCapture(0, buffer_size=3, warmup_frames=0)
+        camera.start()
+        try:
+            with camera.latest_frame(timeout=2.0) as frame:
+                assert frame is not None
+                assert frame.shape == (4, 6, 3)
+                assert frame.flags.writeable is False
+                assert np.shares_memory(frame, camera._buffer)
+        finally:
+            camera.stop()
+
+    def test_pinned_frame_is_not_overwritten(self, monkeypatch):
+        """Test that a borrowed frame keeps its contents while capture continues."""
+        monkeypatch.setattr(camera_capture.cv2, 'VideoCapture', FakeVideoCapture)
+        camera = CameraCapture(0, buffer_size=2, warmup_frames=0)
+        camera.start()
+        try:
+            with camera.latest_frame(timeout=2.0) as frame:
+                value = int(frame[0, 0, 0])
+                time.sleep(0.05)
+                assert int(frame[0, 0, 0]) == value
+            assert camera.get_stats()['frames_captured'] > 1
+        finally:
+            camera.stop()
+
+    def test_reconnects_after_failures(self, monkeypatch):
+        """Test that the device is reopened after repeated read failures."""
+        monkeypatch.setattr(camera_capture.cv2, 'VideoCapture',
+                            lambda index: FakeVideoCapture(index, fail_after=3))
+        camera = CameraCapture(0, warmup_frames=0, max_failures=2, reconnect_delay=0.01)
+        camera.start()
+        try:
+            deadline = time.time() + 2.0
+            while camera.stats.reconnects == 0 and time.time() < deadline:
+                time.sleep(0.01)
+            stats = camera.get_stats()
+            assert stats['reconnects'] >= 1
+            assert stats['read_failures'] >= 2
+        finally:
+            camera.stop()
+
+    def test_manager_tracks_multiple_cameras(self, monkeypatch):
+        """Test that CameraManager reports stats per camera."""
+        monkeypatch.setattr(camera_capture.cv2, 'VideoCapture', FakeVideoCapture)
+        manager = CameraManager()
+        manager.add_camera('tray-0', 0, warmup_frames=0)
+        manager.add_camera('tray-1', 1, warmup_frames=0)
+        manager.start_all()
+        try:
+            with manager.get('tray-1').latest_frame(timeout=2.0) as frame:
+                assert frame is not None
+            stats = manager.get_stats()
+            assert set(stats.keys()) == {'tray-0', 'tray-1'}
+            assert stats['tray-1']['camera_index'] == 1
+        finally:
+            manager.stop_all()
@@ -0,0 +1,195 @@
+"""
+Tests for change detection between analyzed frames.
+"""
+
+import os
+import sys
+import cv2
+import numpy as np
+import pytest
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from image_processing import fermentation_analyzer
+from image_processing.change_detector import (CHANGED, LIGHTING, OCCLUDED, UNCHANGED,
+                                              ChangeDetector)
+from image_processing.fermentation_analyzer import FermentationAnalyzer
+from image_processing.frame_sources import SyntheticSource
+
+
+def make_frames(count=10, width=640, height=480):
+    return [frame for _, frame in SyntheticSource(count, width, height, growth=1.0)]
+
+
+def accepted(frame, **kwargs):
+    detector = ChangeDetector(**kwargs)
+    detector.accept(detector.check(frame))
+    return detector
+
+
+class TestChangeDetector:
+    """Test cases for ChangeDetector."""
+
+    def test_first_frame_is_changed(self):
+        """Test that a frame without a baseline needs analysis."""
+        assert ChangeDetector().check(make_frames(1)[0]).result == CHANGED
+
+    def test_sensor_noise_is_unchanged(self):
+        """Test that per-pixel noise does not count as a change."""
+        frame = make_frames(1)[0]
+        noise = np.random.default_rng(0).normal(0, 6, frame.shape)
+        noisy = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        assert accepted(frame).check(noisy).result == UNCHANGED
+
+    def test_growth_is_changed(self):
+        """Test that the dough spreading is a change, not a lighting jump or occlusion."""
+        frames = make_frames()
+        check = accepted(frames[0]).check(frames[-1])
+        assert check.result == CHANGED
+        assert abs(check.brightness_change) < 0.05
+
+    def test_small_changes_accumulate(self):
+        """Test that changes below the threshold add up against the last analyzed frame."""
+        frames = make_frames(40, 1280, 720)
+        detector = accepted(frames[0])
+        results = [detector.check(frame).result for frame in frames[1:]]
+        assert results[0] == UNCHANGED
+        assert CHANGED in results
+
+    def test_lighting_jump(self):
+        """Test that a global brightness change is rejected until it persists."""
+        frame = make_frames(1)[0]
+        detector = accepted(frame, confirm_after=3)
+        brighter = cv2.convertScaleAbs(frame, alpha=1.3)
+
+        first = detector.check(brighter)
+        assert first.result == LIGHTING
+        assert first.rejected
+        assert first.brightness_change > 0.2
+        assert detector.check(brighter).result == LIGHTING
+        confirmed = detector.check(brighter)
+        assert confirmed.result == CHANGED
+        assert confirmed.confirmed == LIGHTING
+        assert first.confirmed is None
+
+    def test_occlusion(self):
+        """Test that an object covering much of the scene is rejected."""
+        frame = make_frames(1)[0]
+        covered = frame.copy()
+        covered[:, :250] = (120, 150, 200)
+        assert accepted(frame).check(covered).result == OCCLUDED
+
+    def test_blank_frame_is_never_accepted(self):
+        """Test that a covered lens stays rejected however long it lasts."""
+        detector = accepted(make_frames(1)[0], confirm_after=2)
+        dark = np.zeros((480, 640, 3), dtype=np.uint8)
+        assert [detector.check(dark).result for _ in range(4)] == [OCCLUDED] * 4
+
+    def test_blank_first_frame_is_rejected(self):
+        """Test that starting with the lens covered never yields a baseline."""
+        detector = ChangeDetector()
+        dark = np.zeros((480, 640, 3), dtype=np.uint8)
+        checks = [detector.check(dark) for _ in range(4)]
+        assert [check.result for check in checks] == [OCCLUDED] * 4
+        with pytest.raises(ValueError):
+            detector.accept(checks[0])
+        assert detector.check(make_frames(1)[0]).result == CHANGED
+
+    def test_reuse_is_limited(self):
+        """Test that a full analysis is forced after max_reuse unchanged frames."""
+        frame = make_frames(1)[0]
+        detector = accepted(frame, max_reuse=2)
+        assert [detector.check(frame).result for _ in range(3)] == [UNCHANGED, UNCHANGED, CHANGED]
+
+
+class TestAnalyzerChangeDetection:
+    """Test cases for change detection in FermentationAnalyzer."""
+
+    def count_metric_runs(self, monkeypatch):
+        calls = []
+        original = fermentation_analyzer.compute_metrics
+
+        def counting(*args, **kwargs):
+            calls.append(args)
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(fermentation_analyzer, 'compute_metrics', counting)
+        return calls
+
+    def test_unchanged_frame_reuses_metrics(self, tmp_path, monkeypatch):
+        """Test that an unchanged frame returns the last metrics without computing them."""
+        frame = make_frames(1)[0]
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False)
+        calls = self.count_metric_runs(monkeypatch)
+
+        first = analyzer.analyze_frame(frame)
+        first['volume_change'] = -1.0
+        second = analyzer.analyze_frame(frame.copy())
+        assert len(calls) == 1
+        assert second['volume_change'] == 0.0
+        assert second is not first
+
+    def test_new_reference_forces_analysis(self, tmp_path, monkeypatch):
+        """Test that metrics are recomputed after the reference is replaced."""
+        frames = make_frames()
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False)
+        calls = self.count_metric_runs(monkeypatch)
+
+        analyzer.set_reference(frames[0])
+        analyzer.analyze_frame(frames[-1])
+        analyzer.set_reference(frames[-1])
+        assert analyzer.analyze_frame(frames[-1])['volume_change'] == 0.0
+        assert len(calls) == 2
+
+    def test_blank_start_produces_no_metrics(self, tmp_path):
+        """Test that a monitor started in the dark stores nothing until there is a scene."""
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False)
+        dark = np.zeros((480, 640, 3), dtype=np.uint8)
+        assert [analyzer.analyze_frame(dark) for _ in range(3)] == [None] * 3
+        assert analyzer.get_reference() is None
+        assert analyzer.analyze_frame(make_frames(1)[0])['volume_change'] == 0.0
+
+    def test_confirmed_lighting_change_relights_reference(self, tmp_path):
+        """Test that the reference follows a lighting change once it is accepted."""
+        frame = make_frames(1)[0]
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False)
+        analyzer.analyze_frame(frame)
+        brighter = cv2.convertScaleAbs(frame, alpha=1.3)
+
+        assert analyzer.analyze_frame(brighter) is None
+        assert analyzer.analyze_frame(brighter) is None
+        metrics = analyzer.analyze_frame(brighter)
+        assert metrics['volume_change'] < 3.0
+        reference = analyzer.get_reference().frame
+        assert abs(float(reference.mean()) - float(brighter.mean())) < 3.0
+
+    def test_occluded_frame_produces_no_metrics(self, tmp_path):
+        """Test that a blank frame is skipped instead of analyzed."""
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False)
+        analyzer.analyze_frame(make_frames(1)[0])
+        assert analyzer.analyze_frame(np.zeros((480, 640, 3), dtype=np.uint8)) is None
+
+    def test_sources_are_tracked_separately(self, tmp_path, monkeypatch):
+        """Test that each source is compared with its own last frame."""
+        frames = make_frames()
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False)
+        calls = self.count_metric_runs(monkeypatch)
+
+        reference = analyzer.set_reference(frames[0])
+        analyzer.compute_metrics(frames[0], reference, 'tray-1')
+        grown = analyzer.compute_metrics(frames[-1], reference, 'tray-2')
+        assert analyzer.compute_metrics(frames[0], reference, 'tray-1')['volume_change'] == 0.0
+        assert analyzer.compute_metrics(frames[-1], reference, 'tray-2')['volume_change'] == \
+            grown['volume_change']
+        assert len(calls) == 2
+
+    def test_can_be_disabled(self, tmp_path, monkeypatch):
+        """Test that every frame is analyzed without change detection."""
+        frame = make_frames(1)[0]
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False,
+                                        change_detection=False)
+        calls = self.count_metric_runs(monkeypatch)
+        analyzer.analyze_frame(frame)
+        analyzer.analyze_frame(frame)
+        assert len(calls) == 2
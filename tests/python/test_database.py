@@ -0,0 +1,425 @@
+"""
+Tests for Database class.
+"""
+
+import os
+import sys
+import gzip
+import io
+import json
+import sqlite3
+import threading
+import time
+import numpy as np
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from data_storage.change_tailer import ChangeTailer
+from data_storage.database import Database, INSERT_IMAGE_METRICS
+from data_storage import export
+from data_storage.write_behind import WriteBehindQueue
+from data_storage.retention import DAY, RetentionManager, RetentionPolicy
+
+
+def sample_metrics(timestamp, **extra):
+    metrics = {
+        'timestamp': timestamp,
+        'volume_change': 1.5,
+        'surface_activity': 2.5,
+        'bubble_count': 3,
+        'texture_variance': 4.5,
+    }
+    metrics.update(extra)
+    return metrics
+
+
+class TestConnectionPool:
+    """Test cases for pooled database connections."""
+
+    def test_connections_are_reused(self, tmp_path):
+        """Test that repeated queries do not open new connections."""
+        db = Database(str(tmp_path / "test.db"))
+        for _ in range(20):
+            db.store_image_metrics(sample_metrics(time.time()))
+            db.get_recent_image_metrics(1)
+
+        stats = db.get_pool_stats()
+        assert stats['connections_opened'] == 1
+        assert stats['acquisitions'] > 40
+        db.close()
+
+    def test_wal_mode_enabled(self, tmp_path):
+        """Test that the database runs in WAL journal mode."""
+        db = Database(str(tmp_path / "test.db"))
+        with db._get_connection() as conn:
+            mode = conn.execute('PRAGMA journal_mode').fetchone()[0]
+        assert mode.lower() == 'wal'
+        db.close()
+
+    def test_concurrent_writers_are_bounded(self, tmp_path):
+        """Test that many threads share a bounded number of connections."""
+        db = Database(str(tmp_path / "test.db"), pool_size=2)
+
+        def writer():
+            for _ in range(10):
+                db.store_image_metrics(sample_metrics(time.time()))
+
+        threads = [threading.Thread(target=writer) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(db.get_recent_image_metrics(1)) == 60
+        assert db.get_pool_stats()['connections_opened'] <= 2
+        db.close()
+
+
+class TestWriteBehind:
+    """Test cases for the batched write path."""
+
+    def test_rows_are_batched(self, tmp_path):
+        """Test that buffered rows are committed together on flush."""
+        db = Database(str(tmp_path / "test.db"), write_behind=True, flush_interval=60.0)
+        for index in range(50):
+            db.store_image_metrics(sample_metrics(time.time()))
+            db.store_sensor_data({'timestamp': time.time(), 'temperature': 25.0, 'humidity': 70.0})
+
+        assert db.flush(timeout=5.0)
+        assert len(db.get_recent_image_metrics(1)) == 50
+        assert len(db.get_recent_sensor_data(1)) == 50
+        stats = db.get_writer_stats()
+        assert stats['rows_written'] == 100
+        assert stats['batches_written'] == 1
+        db.close()
+
+    def test_size_threshold_triggers_flush(self, tmp_path):
+        """Test that reaching batch_size writes without waiting for the interval."""
+        db = Database(str(tmp_path / "test.db"), write_behind=True,
+                      batch_size=10, flush_interval=60.0)
+        for _ in range(10):
+            db.store_image_metrics(sample_metrics(time.time()))
+
+        deadline = time.time() + 5.0
+        while db.get_writer_stats()['rows_written'] < 10 and time.time() < deadline:
+            time.sleep(0.01)
+        assert db.get_writer_stats()['rows_written'] == 10
+        db.close()
+
+    def test_close_flushes_pending_rows(self, tmp_path):
+        """Test that shutting down writes everything still buffered."""
+        path = str(tmp_path / "test.db")
+        db = Database(path, write_behind=True, flush_interval=60.0)
+        db.store_image_metrics(sample_metrics(time.time()))
+        db.close()
+
+        assert len(Database(path).get_recent_image_metrics(1)) == 1
+
+    def test_drop_policy_counts_overflow(self, tmp_path):
+        """Test that a full buffer drops rows when configured to."""
+        db = Database(str(tmp_path / "test.db"))
+        writer = WriteBehindQueue(db.pool, batch_size=1000, flush_interval=60.0,
+                                  max_buffer=5, overflow='drop')
+        for _ in range(8):
+            writer.put(INSERT_IMAGE_METRICS, (time.time(), 0.0, 0.0, 0, 0.0, None, None, None, None,
+                                               None, None))
+
+        assert writer.get_stats()['rows_dropped'] == 3
+        writer.stop()
+        assert len(db.get_recent_image_metrics(1)) == 5
+        db.close()
+
+    def test_bad_row_does_not_block_later_rows(self, tmp_path):
+        """Test that a row that cannot be written is discarded after the retries."""
+        db = Database(str(tmp_path / "test.db"))
+        writer = WriteBehindQueue(db.pool, batch_size=1000, flush_interval=0.05, max_retries=2)
+        row = (time.time(), 0.0, 0.0, 0, 0.0, None, None, None, None, None, None)
+        writer.put(INSERT_IMAGE_METRICS, row[:3])
+        for _ in range(5):
+            writer.put(INSERT_IMAGE_METRICS, row)
+
+        assert writer.flush(timeout=5.0)
+        stats = writer.get_stats()
+        assert stats['rows_failed'] == 1
+        assert stats['rows_written'] == 5
+        assert stats['flush_errors'] == 2
+        writer.stop()
+        assert len(db.get_recent_image_metrics(1)) == 5
+        db.close()
+
+    def test_requeued_rows_stay_within_buffer(self, tmp_path):
+        """Test that a failed batch put back in the buffer does not exceed max_buffer."""
+        db = Database(str(tmp_path / "test.db"))
+        writer = WriteBehindQueue(db.pool, max_buffer=4)
+        writer._buffer = [('sql', ()), ('sql', ())]
+        writer._requeue([('sql', ())] * 3)
+
+        assert writer.pending() == 4
+        assert writer.get_stats()['rows_dropped'] == 1
+        db.close()
+
+
+class TestRollups:
+    """Test cases for time-series indexes and rollup tables."""
+
+    def test_range_queries_use_timestamp_index(self, tmp_path):
+        """Test that recent-history queries are served from an index."""
+        db = Database(str(tmp_path / "test.db"))
+        with db._get_connection() as conn:
+            plan = conn.execute('''
+                EXPLAIN QUERY PLAN SELECT * FROM image_metrics
+                WHERE timestamp > ? ORDER BY timestamp DESC
+            ''', (0,)).fetchall()
+        assert any('idx_image_metrics_timestamp' in row[3] for row in plan)
+        db.close()
+
+    def test_rollup_table_gains_new_metric_columns(self, tmp_path):
+        """Test that rollups created before a metric existed are upgraded in place."""
+        path = str(tmp_path / "test.db")
+        Database(path).close()
+        conn = sqlite3.connect(path)
+        conn.execute('DROP TRIGGER image_metrics_rollup_insert')
+        for kind in ('min', 'max', 'sum'):
+            conn.execute(f'ALTER TABLE image_metrics_rollup DROP COLUMN dough_area_{kind}')
+        conn.commit()
+        conn.close()
+
+        db = Database(path)
+        db.store_image_metrics_batch([sample_metrics(60.0, dough_area=500.0)])
+        series = db.get_image_metrics_series(60.0, 120.0, max_points=0)
+        assert series['points'][0]['dough_area'] == 500.0
+        db.close()
+
+    def test_rollups_follow_inserts(self, tmp_path):
+        """Test that rollup buckets aggregate raw inserts."""
+        db = Database(str(tmp_path / "test.db"))
+        base = 1_000_000 * 60.0
+        db.store_image_metrics_batch([
+            sample_metrics(base + offset, volume_change=float(offset), source_id='tray-0')
+            for offset in range(0, 120, 10)
+        ])
+
+        series = db.get_image_metrics_series(base, base + 120, max_points=5)
+        assert series['resolution'] == 60
+        first = series['points'][0]
+        assert first['timestamp'] == base
+        assert first['count'] == 6
+        assert first['volume_change_min'] == 0.0
+        assert first['volume_change_max'] == 50.0
+        assert first['volume_change'] == 25.0
+        db.close()
+
+    def test_small_ranges_return_raw_rows(self, tmp_path):
+        """Test that raw rows are returned when they fit the budget."""
+        db = Database(str(tmp_path / "test.db"))
+        now = time.time()
+        for offset in range(3):
+            db.store_sensor_data({'timestamp': now - offset, 'temperature': 25.0, 'humidity': 70.0})
+
+        series = db.get_sensor_data_series(now - 3600, max_points=10)
+        assert series['resolution'] == 0
+        assert len(series['points']) == 3
+        db.close()
+
+    def test_coarsest_resolution_for_long_ranges(self, tmp_path):
+        """Test that long ranges fall back to hourly buckets."""
+        db = Database(str(tmp_path / "test.db"))
+        base = 1_000_000 * 3600.0
+        db.store_image_metrics_batch([
+            sample_metrics(base + offset * 300, source_id='tray-%d' % (offset % 2))
+            for offset in range(48)
+        ])
+
+        series = db.get_image_metrics_series(base, base + 4 * 3600, max_points=10)
+        assert series['resolution'] == 3600
+        assert [point['count'] for point in series['points']] == [12, 12, 12, 12]
+        tray = db.get_image_metrics_series(base, base + 4 * 3600, max_points=10, source_id='tray-0')
+        assert [point['count'] for point in tray['points']] == [6, 6, 6, 6]
+        db.close()
+
+    def test_existing_rows_are_backfilled(self, tmp_path):
+        """Test that rollups are built for data written before they existed."""
+        path = str(tmp_path / "test.db")
+        db = Database(path)
+        db.store_image_metrics_batch([sample_metrics(600.0 + i) for i in range(5)])
+        with db._get_connection() as conn:
+            conn.execute('DROP TRIGGER image_metrics_rollup_insert')
+            conn.execute('DROP TABLE image_metrics_rollup')
+            conn.commit()
+        db.close()
+
+        reopened = Database(path)
+        series = reopened.get_image_metrics_series(0, 3600, max_points=1)
+        assert series['points'][0]['count'] == 5
+        reopened.close()
+
+
+class TestRetention:
+    """Test cases for retention and compaction."""
+
+    def test_old_raw_rows_are_deleted_in_batches(self, tmp_path):
+        """Test that rows past the retention period are removed."""
+        db = Database(str(tmp_path / "test.db"))
+        now = time.time()
+        db.store_image_metrics_batch(
+            [sample_metrics(now - 40 * DAY + i) for i in range(25)] +
+            [sample_metrics(now - i) for i in range(5)])
+
+        manager = RetentionManager(db, RetentionPolicy(raw_days=30, batch_size=10, batch_pause=0,
+                                                       archive_after_days=None))
+        result = manager.run_once(now)
+
+        assert result['raw_deleted'] == 25
+        assert len(db.get_recent_image_metrics(24 * 365)) == 5
+        # Rollups outlive the raw rows
+        series = db.get_image_metrics_series(now - 41 * DAY, now - 39 * DAY, max_points=1000)
+        assert sum(point['count'] for point in series['points']) == 25
+        db.close()
+
+    def test_ended_sessions_are_archived(self, tmp_path):
+        """Test that ended sessions are written to a compressed archive."""
+        db = Database(str(tmp_path / "test.db"))
+        session_id = db.create_session("Sourdough #1")
+        db.store_image_metrics_batch([sample_metrics(time.time(), session_id=session_id)
+                                      for _ in range(3)])
+        db.end_session(session_id)
+
+        policy = RetentionPolicy(raw_days=None, archive_after_days=0,
+                                 archive_dir=str(tmp_path / "archive"), batch_pause=0)
+        result = RetentionManager(db, policy).run_once(time.time() + 1)
+
+        assert result['sessions_archived'] == 1
+        archives = list((tmp_path / "archive").glob("session_*.jsonl.gz"))
+        assert len(archives) == 1
+        with gzip.open(archives[0], 'rt') as archive:
+            lines = [json.loads(line) for line in archive]
+        assert lines[0]['session']['name'] == "Sourdough #1"
+        assert len(lines) == 4
+        assert db.get_recent_image_metrics(1) == []
+        db.close()
+
+    def test_incremental_vacuum_reclaims_space(self, tmp_path):
+        """Test that freed pages are returned after deletes."""
+        db = Database(str(tmp_path / "test.db"))
+        now = time.time()
+        db.store_image_metrics_batch([sample_metrics(now - 40 * DAY, source_id='x' * 200)
+                                      for _ in range(2000)])
+        with db._get_connection() as conn:
+            assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+        manager = RetentionManager(db, RetentionPolicy(raw_days=30, batch_pause=0,
+                                                       archive_after_days=None,
+                                                       rollup_days={60: 1, 600: 1, 3600: 1}))
+        result = manager.run_once(now)
+        assert result['pages_freed'] > 0
+        with db._get_connection() as conn:
+            assert conn.execute('PRAGMA freelist_count').fetchone()[0] == 0
+        db.close()
+
+
+    def test_old_database_is_not_vacuumed_by_the_manager(self, tmp_path):
+        """Test that a file without auto_vacuum only gets the deletes."""
+        path = str(tmp_path / "test.db")
+        sqlite3.connect(path).execute('CREATE TABLE legacy (id INTEGER)').connection.close()
+        db = Database(path)
+        now = time.time()
+        db.store_image_metrics_batch([sample_metrics(now - 40 * DAY) for _ in range(100)])
+
+        manager = RetentionManager(db, RetentionPolicy(raw_days=30, batch_pause=0,
+                                                       archive_after_days=None))
+        assert not manager.incremental_vacuum_enabled()
+        result = manager.run_once(now)
+        assert result['raw_deleted'] == 100
+        assert result['pages_freed'] == 0
+        assert not manager.incremental_vacuum_enabled()
+
+        # The explicit maintenance step converts the file
+        assert manager.enable_incremental_vacuum()
+        assert manager.incremental_vacuum_enabled()
+        assert not manager.enable_incremental_vacuum()
+        db.close()
+
+
+class TestChangeTailer:
+    """Test cases for detecting writes made through another connection."""
+
+    def test_reports_tables_written_elsewhere(self, tmp_path):
+        """Test that writes from a second Database bump versions in the first."""
+        reader = Database(str(tmp_path / "test.db"))
+        writer = Database(str(tmp_path / "test.db"))
+        tailer = ChangeTailer(reader)
+        assert tailer.poll() == []
+
+        writer.store_image_metrics(sample_metrics(time.time()))
+        assert tailer.poll() == ['image_metrics']
+        assert reader.get_data_version('image_metrics')[0] == 1
+        assert tailer.poll() == []
+
+        session_id = writer.create_session("Batch")
+        writer.end_session(session_id)
+        assert tailer.poll() == ['fermentation_sessions']
+
+        tailer.stop()
+        writer.close()
+        reader.close()
+
+
+class TestExport:
+    """Test cases for streaming columnar export."""
+
+    def setup_method(self):
+        self.rows = [sample_metrics(1000.0 + index, source_id='tray-0',
+                                    session_id=1 if index < 6 else 2)
+                     for index in range(10)]
+        self.rows[2]['texture_variance'] = None
+
+    def test_csv_export_streams_gzip(self, tmp_path):
+        """Test that the gzip CSV holds a header and every row in the range."""
+        db = Database(str(tmp_path / "test.db"))
+        db.store_image_metrics_batch(self.rows)
+        out = io.BytesIO()
+        count = export.export(db, 'image_metrics', 'csv', out, start=1002, end=1008, batch_size=4)
+        assert count == 6
+
+        lines = gzip.decompress(out.getvalue()).decode().splitlines()
+        assert lines[0] == ','.join(export.EXPORT_COLUMNS['image_metrics'])
+        assert len(lines) == 7
+        assert lines[1].split(',')[5] == ''  # NULL texture_variance
+        db.close()
+
+    def test_npz_export_is_columnar(self, tmp_path):
+        """Test that the npz archive holds one typed array per column."""
+        db = Database(str(tmp_path / "test.db"))
+        db.store_image_metrics_batch(self.rows)
+        out = io.BytesIO()
+        assert export.export(db, 'image_metrics', 'npz', out, session_id=1, batch_size=4) == 6
+
+        out.seek(0)
+        data = np.load(out)
+        assert sorted(data.files) == sorted(export.EXPORT_COLUMNS['image_metrics'])
+        assert data['id'].dtype == np.int64
+        assert list(data['timestamp']) == [1000.0 + index for index in range(6)]
+        assert np.isnan(data['texture_variance'][2])
+        assert list(data['source_id']) == ['tray-0'] * 6
+        db.close()
+
+    def test_session_filter_on_sensor_data_is_rejected(self, tmp_path):
+        """Test that tables without a session column cannot be filtered by session."""
+        db = Database(str(tmp_path / "test.db"))
+        try:
+            export.export(db, 'sensor_data', 'npz', io.BytesIO(), session_id=1)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        db.close()
+
+    def test_unknown_format_is_rejected(self, tmp_path):
+        """Test that unsupported formats raise ValueError."""
+        db = Database(str(tmp_path / "test.db"))
+        try:
+            export.export(db, 'image_metrics', 'xlsx', io.BytesIO())
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        db.close()
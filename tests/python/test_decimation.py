@@ -0,0 +1,50 @@
+"""
+Tests for time series decimation.
+"""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from analytics.decimation import decimate, lttb_indices, minmax_indices
+
+
+class TestDecimation:
+    """Test cases for LTTB and min/max decimation."""
+
+    def setup_method(self):
+        self.x = np.arange(10000, dtype=np.float64)
+        self.y = np.sin(self.x / 500.0)
+        self.y[4321] = 25.0  # single spike
+
+    def test_lttb_bounds_output_and_keeps_endpoints(self):
+        """Test that LTTB returns exactly the requested number of sorted points."""
+        indices = lttb_indices(self.x, self.y, 200)
+        assert len(indices) == 200
+        assert indices[0] == 0 and indices[-1] == len(self.x) - 1
+        assert np.all(np.diff(indices) > 0)
+
+    def test_lttb_preserves_spike(self):
+        """Test that a single outlier survives decimation."""
+        assert 4321 in lttb_indices(self.x, self.y, 100)
+
+    def test_minmax_keeps_extremes(self):
+        """Test that min/max bucketing keeps the global extremes."""
+        indices = minmax_indices(self.x, self.y, 100)
+        assert len(indices) <= 100
+        assert 4321 in indices
+        assert np.argmin(self.y) in indices
+
+    def test_short_series_is_returned_unchanged(self):
+        """Test that series shorter than the threshold are not reduced."""
+        assert list(decimate(self.x[:50], self.y[:50], 100)) == list(range(50))
+        assert len(decimate(np.empty(0), np.empty(0), 100)) == 0
+
+    def test_unknown_method_is_rejected(self):
+        """Test that an unknown method name raises ValueError."""
+        with pytest.raises(ValueError):
+            decimate(self.x, self.y, 100, method='average')
@@ -0,0 +1,106 @@
+"""
+Tests for FermentationAnalyzer class.
+"""
+
+import os
+import sys
+import numpy as np
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from image_processing import fermentation_analyzer, frame_context, metrics
+from image_processing.fermentation_analyzer import FermentationAnalyzer
+
+
+def make_frame(seed, height=120, width=160):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+
+
+class TestFermentationAnalyzer:
+    """Test cases for FermentationAnalyzer class."""
+
+    def test_first_frame_becomes_reference(self, tmp_path):
+        """Test that the first analyzed frame is used as the reference."""
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False)
+        metrics = analyzer.analyze_frame(make_frame(0))
+
+        assert metrics['volume_change'] == 0.0
+        assert metrics['surface_activity'] == 0.0
+        assert analyzer.get_reference() is not None
+
+    def test_reference_is_not_reread_from_disk(self, tmp_path, monkeypatch):
+        """Test that samples are compared against the in-memory reference."""
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False)
+        analyzer.set_reference(make_frame(0))
+
+        def fail_imread(*args, **kwargs):
+            raise AssertionError("reference decoded from disk")
+
+        monkeypatch.setattr(fermentation_analyzer.cv2, 'imread', fail_imread)
+        metrics = analyzer.analyze_frame(make_frame(1))
+        assert metrics['volume_change'] > 0
+
+    def test_frames_are_persisted_asynchronously(self, tmp_path):
+        """Test that current and reference frames reach the disk via the writer."""
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path))
+        analyzer.analyze_frame(make_frame(0))
+        analyzer.close()
+
+        assert os.path.exists(analyzer.current_image_path)
+        assert os.path.exists(analyzer.reference_image_path)
+        assert analyzer.frame_writer.get_stats()['write_errors'] == 0
+
+    def test_saved_reference_is_loaded_once(self, tmp_path):
+        """Test that a reference saved by a previous run is picked up."""
+        first = FermentationAnalyzer(data_dir=str(tmp_path))
+        first.set_reference(make_frame(0))
+        first.close()
+
+        second = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False)
+        reference = second.get_reference()
+        assert reference is not None
+        assert reference.gray.shape == (120, 160)
+        assert second.get_reference() is reference
+
+
+class TestFrameContext:
+    """Test cases for the shared preprocessing stage and metric registry."""
+
+    def test_grayscale_is_computed_once_per_frame(self, tmp_path, monkeypatch):
+        """Test that all metrics share a single cvtColor of the current frame."""
+        # Segmentation converts its own downscaled copy; only the metrics are counted here
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False, segmentation=False)
+        analyzer.set_reference(make_frame(0))
+
+        calls = []
+        original = frame_context.cv2.cvtColor
+
+        def counting_cvt(*args, **kwargs):
+            calls.append(args[1])
+            return original(*args, **kwargs)
+
+        monkeypatch.setattr(frame_context.cv2, 'cvtColor', counting_cvt)
+        analyzer.analyze_frame(make_frame(1))
+        assert len(calls) == 1
+
+    def test_registered_metric_is_reported(self, tmp_path, monkeypatch):
+        """Test that a newly registered metric appears in the results."""
+        monkeypatch.setattr(metrics, 'METRICS', dict(metrics.METRICS))
+
+        @metrics.register_metric('mean_brightness')
+        def mean_brightness(context):
+            return float(context.gray.mean())
+
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False)
+        result = analyzer.analyze_frame(make_frame(0))
+        assert 'mean_brightness' in result
+        assert 0.0 < result['mean_brightness'] < 255.0
+
+    def test_reference_metrics_default_without_reference(self):
+        """Test that reference-based metrics fall back to their defaults."""
+        context = frame_context.FrameContext(make_frame(0))
+        result = metrics.compute_metrics(context, ['volume_change', 'texture_variance'])
+        assert result['volume_change'] == 0.0
+        assert result['texture_variance'] > 0.0
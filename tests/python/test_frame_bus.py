@@ -0,0 +1,124 @@
+"""
+Tests for the shared-memory frame bus.
+"""
+
+import multiprocessing
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from image_processing.analysis_engine import FrameDropped, _run_bus_job
+from image_processing.frame_bus import FrameBus, FrameReader, attach, share_with_children
+
+
+def make_frame(value, height=24, width=32):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def read_checksum(name, sequence, results):
+    frame = attach(name).read(sequence)
+    results.put(None if frame is None else (frame.timestamp, int(frame.array.sum())))
+
+
+@pytest.fixture
+def bus():
+    share_with_children()
+    bus = FrameBus(slots=3, slot_bytes=make_frame(0).nbytes)
+    yield bus
+    bus.close()
+    bus.unlink()
+
+
+class TestFrameBus:
+    """Test cases for FrameBus."""
+
+    def test_read_is_zero_copy_view(self, bus):
+        """Test that a published frame is read back as a view of the slot."""
+        frame = np.arange(24 * 32 * 3, dtype=np.uint8).reshape(24, 32, 3)
+        sequence = bus.publish(frame, timestamp=12.5)
+
+        borrowed = bus.read(sequence)
+        assert borrowed.timestamp == 12.5
+        np.testing.assert_array_equal(borrowed.array, frame)
+        assert np.shares_memory(borrowed.array, bus.read(sequence).array)
+        assert borrowed.consistent
+
+    def test_slots_are_reused(self, bus):
+        """Test that the oldest frame is overwritten once every slot is used."""
+        sequences = [bus.publish(make_frame(value)) for value in range(4)]
+        assert sequences == [1, 2, 3, 4]
+        assert bus.read(1) is None
+        assert bus.read(4).array[0, 0, 0] == 3
+
+    def test_overwrite_during_read_is_detected(self, bus):
+        """Test that a borrowed frame reports when its slot was rewritten."""
+        borrowed = bus.read(bus.publish(make_frame(1)))
+        for value in range(3):
+            bus.publish(make_frame(value))
+        assert not borrowed.consistent
+
+    def test_grayscale_frames(self, bus):
+        """Test that two-dimensional frames keep their shape."""
+        gray = np.full((10, 20), 7, dtype=np.uint8)
+        assert bus.read(bus.publish(gray)).array.shape == (10, 20)
+
+    def test_oversized_frame_is_rejected(self, bus):
+        """Test that a frame larger than a slot cannot be published."""
+        assert not bus.fits(make_frame(0, height=48))
+        with pytest.raises(ValueError):
+            bus.publish(make_frame(0, height=48))
+
+    def test_reader_in_another_process(self, bus):
+        """Test that another process attaches by name and reads the frame."""
+        sequence = bus.publish(make_frame(5), timestamp=3.0)
+        results = multiprocessing.Queue()
+        reader = multiprocessing.Process(target=read_checksum, args=(bus.name, sequence, results))
+        reader.start()
+        assert results.get(timeout=10) == (3.0, 5 * 24 * 32 * 3)
+        reader.join()
+
+
+class TestFrameReader:
+    """Test cases for lag accounting of sequential readers."""
+
+    def test_lagging_reader_skips_to_oldest_frame(self, bus):
+        """Test that frames overwritten before being read are counted."""
+        reader = FrameReader(bus)
+        for value in range(5):
+            bus.publish(make_frame(value))
+
+        frame = reader.next(timeout=1.0)
+        assert frame.sequence == 3
+        assert reader.lagged == 2
+        assert reader.lag == 2
+        assert reader.done(frame)
+
+    def test_torn_frame_is_counted(self, bus):
+        """Test that a frame overwritten while in use is counted as torn."""
+        reader = FrameReader(bus)
+        bus.publish(make_frame(1))
+        frame = reader.next(timeout=1.0)
+        for value in range(3):
+            bus.publish(make_frame(value))
+        assert not reader.done(frame)
+        assert reader.get_stats()['torn'] == 1
+
+    def test_timeout_without_frames(self, bus):
+        """Test that next() gives up when nothing is published."""
+        assert FrameReader(bus).next(timeout=0.01) is None
+
+
+class TestBusJobs:
+    """Test cases for analysis jobs reading from the bus."""
+
+    def test_overwritten_frame_is_dropped(self, bus, tmp_path):
+        """Test that a job whose frame is gone reports a drop instead of analyzing."""
+        for value in range(4):
+            bus.publish(make_frame(value))
+        with pytest.raises(FrameDropped) as error:
+            _run_bus_job('tray-0', bus.name, 1, str(tmp_path / 'reference_tray-0.jpg'))
+        assert error.value.reason == 'lagged'
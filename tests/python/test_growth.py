@@ -0,0 +1,146 @@
+"""
+Tests for growth curve fitting.
+"""
+
+import os
+import sys
+import numpy as np
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from analytics.growth import GompertzModel, GrowthFitter, GrowthTracker, LogisticModel
+from data_storage.database import Database
+from image_processing.fermentation_analyzer import FermentationAnalyzer
+from image_processing.frame_sources import SyntheticSource
+
+START = 1700000000.0
+
+
+def rise(model, hours, capacity=150.0, rate=1.0, midpoint=4.0, noise=0.5, seed=0):
+    """Samples every 5 minutes of a growth curve; returns (timestamps, values)."""
+    t = np.arange(0, hours * 3600, 300.0)
+    values = model.value(t / 3600, capacity, rate, midpoint)
+    values += np.random.default_rng(seed).normal(0, noise, len(t))
+    return START + t, values
+
+
+class TestGrowthFitter:
+    """Test cases for GrowthFitter class."""
+
+    def test_recovers_logistic_parameters(self):
+        """Test that a full noisy rise gives back the capacity, rate and peak."""
+        timestamps, values = rise(LogisticModel, 10)
+        fitter = GrowthFitter('logistic')
+        fitter.add(np.ones(len(values), dtype=int), timestamps, values)
+        fit = fitter.fit(1)
+
+        assert fit.status == 'fitted'
+        assert abs(fit.capacity - 150) < 10
+        assert abs(fit.rate - 1.0) < 0.1
+        assert abs(fit.midpoint - (START + 4 * 3600)) < 900
+        expected_peak = START + (4 + np.log(19)) * 3600
+        assert abs(fit.peak_time - expected_peak) < 1800
+        assert fit.time_to(fit.capacity * 2) is None
+
+    def test_recovers_gompertz_parameters(self):
+        """Test the Gompertz model on its own curve."""
+        timestamps, values = rise(GompertzModel, 10)
+        fitter = GrowthFitter('gompertz')
+        fitter.add(np.ones(len(values), dtype=int), timestamps, values)
+        fit = fitter.fit(1)
+        assert abs(fit.capacity - 150) < 15
+        assert abs(fit.midpoint - (START + 4 * 3600)) < 900
+
+    def test_incremental_matches_batch(self):
+        """Test that adding points in small batches gives the same fit as one batch."""
+        timestamps, values = rise(LogisticModel, 8)
+        incremental = GrowthFitter()
+        for start in range(0, len(values), 5):
+            incremental.add([7] * len(values[start:start + 5]), timestamps[start:start + 5],
+                            values[start:start + 5])
+            incremental.fit(7)
+        batch = GrowthFitter()
+        batch.add([7] * len(values), timestamps, values)
+
+        assert incremental.fit(7).capacity == batch.fit(7).capacity
+        assert abs(incremental.fit(7).rate - batch.fit(7).rate) < 1e-9
+
+    def test_many_sessions_in_one_batch(self):
+        """Test that interleaved points of many sessions are fitted independently."""
+        capacities = np.linspace(60, 240, 50)
+        session_ids, timestamps, values = [], [], []
+        for session_id, capacity in enumerate(capacities):
+            t, v = rise(LogisticModel, 10, capacity=capacity, seed=session_id)
+            session_ids.append(np.full(len(t), session_id))
+            timestamps.append(t)
+            values.append(v)
+        order = np.argsort(np.concatenate(timestamps), kind='stable')
+        fitter = GrowthFitter()
+        fitter.add(np.concatenate(session_ids)[order], np.concatenate(timestamps)[order],
+                   np.concatenate(values)[order])
+
+        fits = fitter.fit_all()
+        assert len(fits) == 50
+        errors = [abs(fits[index].capacity / capacity - 1) for index, capacity in enumerate(capacities)]
+        assert max(errors) < 0.1
+
+    def test_early_fit_is_unconstrained(self):
+        """Test that fits before the inflection point are flagged."""
+        timestamps, values = rise(LogisticModel, 2.5)
+        fitter = GrowthFitter()
+        fitter.add([1] * len(values), timestamps, values)
+        fit = fitter.fit(1)
+        assert fit is None or fit.status == 'unconstrained'
+
+    def test_too_few_points(self):
+        """Test that sessions below min_points are not fitted."""
+        fitter = GrowthFitter(min_points=8)
+        fitter.add([1, 1, 1], [START, START + 300, START + 600], [1.0, 2.0, np.nan])
+        assert fitter.fit(1) is None
+        assert fitter.fit(2) is None
+
+
+class TestGrowthTracker:
+    """Test cases for GrowthTracker class."""
+
+    def test_reads_each_row_once(self, tmp_path):
+        """Test that updates only read rows added since the previous call."""
+        db = Database(str(tmp_path / "test.db"))
+        timestamps, values = rise(LogisticModel, 10)
+        rows = [{'timestamp': t, 'area_change': v, 'session_id': 3}
+                for t, v in zip(timestamps, values)]
+        db.store_image_metrics_batch(rows[:60])
+        db.store_image_metrics({'timestamp': START, 'area_change': 5.0})
+
+        tracker = GrowthTracker(db, batch_size=25)
+        assert tracker.update() == 60
+        db.store_image_metrics_batch(rows[60:])
+        assert tracker.update() == len(rows) - 60
+        assert tracker.update() == 0
+
+        prediction = tracker.predict(3, target=100.0)
+        assert prediction['status'] == 'fitted'
+        assert prediction['points'] > 100
+        assert prediction['target_time'] < prediction['peak_time']
+        assert tracker.predict(4) is None
+        db.close()
+
+    def test_fits_analyzer_output(self, tmp_path):
+        """Test that the default metric puts a doubling dough inside the capacity grid."""
+        db = Database(str(tmp_path / "test.db"))
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False,
+                                        change_detection=False)
+        # Ten hours sampled every ten minutes; the dough doubles its area
+        frames = list(SyntheticSource(61, 320, 240, interval=600, start_time=START))
+        reference = analyzer.set_reference(frames[0][1])
+        db.store_image_metrics_batch([
+            dict(analyzer.compute_metrics(frame, reference), timestamp=t, session_id=1)
+            for t, frame in frames])
+
+        prediction = GrowthTracker(db).predict(1)
+        assert prediction['metric'] == 'area_change'
+        assert prediction['status'] == 'fitted'
+        assert 85 < prediction['capacity'] < 115
+        assert abs(prediction['inflection_time'] - (START + 5 * 3600)) < 3600
+        db.close()
@@ -0,0 +1,108 @@
+"""
+Tests for the decoded image cache.
+"""
+
+import os
+import sys
+import cv2
+import numpy as np
+import pytest
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from image_processing import image_cache
+from image_processing.image_cache import ImageCache
+from image_processing.image_processor import ImageProcessor
+
+
+def write_image(path, value=128, width=64, height=48):
+    cv2.imwrite(str(path), np.full((height, width, 3), value, dtype=np.uint8))
+    return str(path)
+
+
+class TestImageCache:
+    """Test cases for ImageCache."""
+
+    def test_repeated_loads_decode_once(self, tmp_path, monkeypatch):
+        """Test that an unchanged file is decoded only on the first load."""
+        path = write_image(tmp_path / "sample.png")
+        decodes = []
+        original = image_cache.cv2.imread
+        monkeypatch.setattr(image_cache.cv2, 'imread',
+                            lambda *args: decodes.append(args) or original(*args))
+
+        cache = ImageCache()
+        first = cache.load(path)
+        second = cache.load(path)
+        assert second is first
+        assert len(decodes) == 1
+        stats = cache.get_stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['bytes'] == first.nbytes
+
+    def test_cached_images_are_read_only(self, tmp_path):
+        """Test that callers cannot modify the shared array."""
+        image = ImageCache().load(write_image(tmp_path / "sample.png"))
+        with pytest.raises(ValueError):
+            image[0, 0, 0] = 0
+
+    def test_changed_file_is_reloaded(self, tmp_path):
+        """Test that a rewritten file is decoded again."""
+        path = write_image(tmp_path / "sample.png", value=10)
+        cache = ImageCache()
+        assert cache.load(path)[0, 0, 0] == 10
+
+        write_image(path, value=200, width=80)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        reloaded = cache.load(path)
+        assert reloaded[0, 0, 0] == 200
+        assert cache.get_stats()['entries'] == 1
+        assert cache.get_stats()['bytes'] == reloaded.nbytes
+
+    def test_byte_budget_evicts_least_recently_used(self, tmp_path):
+        """Test that the oldest unused images are evicted to stay within budget."""
+        paths = [write_image(tmp_path / f"image{index}.png", value=index) for index in range(3)]
+        image_bytes = 64 * 48 * 3
+        cache = ImageCache(max_bytes=2 * image_bytes)
+
+        cache.load(paths[0])
+        cache.load(paths[1])
+        cache.load(paths[0])
+        cache.load(paths[2])
+
+        stats = cache.get_stats()
+        assert stats['evictions'] == 1
+        assert stats['bytes'] <= 2 * image_bytes
+        cache.load(paths[0])
+        assert cache.get_stats()['hits'] == 2
+        cache.load(paths[1])
+        assert cache.get_stats()['misses'] == 4
+
+    def test_reduced_decode(self, tmp_path):
+        """Test that previews are decoded at a fraction of the size and cached separately."""
+        path = write_image(tmp_path / "sample.jpg", width=640, height=480)
+        cache = ImageCache()
+        assert cache.load(path, reduction=4).shape == (120, 160, 3)
+        assert cache.load(path).shape == (480, 640, 3)
+        assert cache.get_stats()['entries'] == 2
+        with pytest.raises(ValueError):
+            cache.load(path, reduction=3)
+
+    def test_missing_file(self, tmp_path):
+        """Test that a missing file gives None without counting a miss."""
+        cache = ImageCache()
+        assert cache.load(str(tmp_path / "missing.png")) is None
+        assert cache.get_stats()['misses'] == 0
+
+    def test_processor_uses_cache(self, tmp_path):
+        """Test that ImageProcessor loads through its cache."""
+        path = write_image(tmp_path / "sample.png")
+        cache = ImageCache()
+        processor = ImageProcessor(cache=cache)
+        assert processor.load_from_file(path).is_valid
+        assert processor.load_from_file(path).width == 64
+        assert processor.load_from_file(path, reduction=2).width == 32
+        assert cache.get_stats()['hits'] == 1
@@ -0,0 +1,92 @@
+"""
+Tests for AdaptiveScheduler class.
+"""
+
+import os
+import sys
+import math
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from image_processing.fermentation_analyzer import FermentationAnalyzer
+from image_processing.frame_sources import SyntheticSource
+from image_processing.scheduler import AdaptiveScheduler
+
+
+def logistic(t, capacity=100.0, rate=1.0, midpoint=4.0):
+    """Area change (%) of a dough rising to capacity, t in hours."""
+    return capacity / (1 + math.exp(-rate * (t - midpoint)))
+
+
+def run(scheduler, curve, hours=10.0, duration=0.5):
+    """Sample curve under the scheduler; returns (timestamp, interval, phase) tuples."""
+    t, interval, samples = 0.0, 300.0, []
+    while t < hours * 3600:
+        interval = scheduler.update('tray-0', t, {'area_change': curve(t / 3600)}, duration, interval)
+        samples.append((t, interval, scheduler.get_stats()['tray-0']['phase']))
+        t += interval
+    return samples
+
+
+class TestAdaptiveScheduler:
+    """Test cases for AdaptiveScheduler class."""
+
+    def test_sparse_in_lag_dense_in_rise(self):
+        """Test that intervals shrink during the rise and stay long in the lag phase."""
+        samples = run(AdaptiveScheduler(min_interval=30, max_interval=900), logistic)
+        # The first sample has no rate yet and keeps the initial interval
+        lag = [interval for t, interval, _ in samples[1:] if t < 3600]
+        rise = [interval for t, interval, _ in samples if 3 * 3600 < t < 5 * 3600]
+        assert min(lag) > 3 * max(rise)
+        assert all(30 <= interval <= 900 for _, interval, _ in samples)
+
+    def test_fewer_samples_than_fixed_interval(self):
+        """Test that the adaptive schedule beats the fixed minimum interval on compute."""
+        samples = run(AdaptiveScheduler(min_interval=30, max_interval=900), logistic)
+        assert len(samples) < 10 * 3600 / 120
+
+    def test_dense_around_peak(self):
+        """Test that sampling stays dense while the rise flattens before the peak."""
+        def rise_and_fall(hours):
+            return 100 * math.exp(-((hours - 5) / 1.5) ** 2)
+
+        samples = run(AdaptiveScheduler(min_interval=30, max_interval=900), rise_and_fall)
+        phases = {phase for _, _, phase in samples}
+        assert {'rising', 'peak', 'falling'} <= phases
+        peak = [interval for t, interval, _ in samples if 4.8 * 3600 < t < 5.2 * 3600]
+        assert peak and max(peak) < 300
+
+    def test_cpu_budget_limits_interval(self):
+        """Test that a slow analysis is never scheduled above its CPU budget."""
+        scheduler = AdaptiveScheduler(min_interval=30, max_interval=900, cpu_budget=0.1)
+        samples = run(scheduler, logistic, duration=20.0)
+        assert all(interval >= 200 for _, interval, _ in samples)
+
+    def test_schedule_from_analyzer_output(self, tmp_path):
+        """Test the default metric and target against metrics of a rising dough."""
+        analyzer = FermentationAnalyzer(data_dir=str(tmp_path), save_frames=False,
+                                        change_detection=False)
+        scheduler = AdaptiveScheduler(min_interval=30, max_interval=900)
+        # Ten hours sampled every ten minutes; the dough doubles its area
+        frames = list(SyntheticSource(61, 320, 240, interval=600))
+        reference = analyzer.set_reference(frames[0][1])
+        samples = []
+        for t, frame in frames:
+            metrics = analyzer.compute_metrics(frame, reference)
+            interval = scheduler.update('tray-0', t, metrics, 0.1, 300.0)
+            samples.append((t, interval, metrics[scheduler.metric]))
+
+        # Doubling reads as about 100, the scale target_change is meant for
+        assert 90 < samples[-1][2] < 110
+        lag = [interval for t, interval, _ in samples[1:] if t < 3600]
+        rise = [interval for t, interval, _ in samples if 4 * 3600 < t < 6 * 3600]
+        assert all(interval == 900 for interval in lag)
+        # Growing about 4 points per 10 minutes, 1 point takes under 3 minutes
+        assert max(rise) < 200
+
+    def test_missing_metric_keeps_interval(self):
+        """Test that samples without the metric leave the interval unchanged."""
+        scheduler = AdaptiveScheduler(min_interval=30, max_interval=900)
+        assert scheduler.update('tray-0', 0.0, None, 0.1, 300.0) == 300.0
+        assert scheduler.update('tray-0', 300.0, {'area_change': None}, 0.1, 300.0) == 300.0
@@ -0,0 +1,117 @@
+"""
+Tests for the telemetry registry, exporter and profiler.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from telemetry import Registry, SamplingProfiler, render_prometheus, timed
+
+
+class TestRegistry:
+    """Test cases for counters, gauges and histograms."""
+
+    def test_histogram_buckets_are_cumulative(self, tmp_path):
+        """Test that histogram observations render as cumulative buckets."""
+        registry = Registry()
+        histogram = registry.histogram('op_seconds', "Operation time", ['op'], buckets=(0.1, 1.0))
+        child = histogram.labels('read')
+        for value in (0.05, 0.5, 0.5, 5.0):
+            child.observe(value)
+
+        text = render_prometheus(registry, directory=str(tmp_path))
+        assert 'op_seconds_bucket{op="read",le="0.1"} 1' in text
+        assert 'op_seconds_bucket{op="read",le="1.0"} 3' in text
+        assert 'op_seconds_bucket{op="read",le="+Inf"} 4' in text
+        assert 'op_seconds_count{op="read"} 4' in text
+        assert 'op_seconds_sum{op="read"} 6.05' in text
+
+    def test_timer_counts_errors(self):
+        """Test that a timed function records its duration and its failures."""
+        registry = Registry()
+        histogram = registry.histogram('work_seconds', "Work time")
+        errors = registry.counter('work_errors_total', "Failed work")
+
+        @timed(histogram, errors)
+        def work(fail):
+            if fail:
+                raise ValueError("failed")
+            return 1
+
+        assert work(False) == 1
+        with pytest.raises(ValueError):
+            work(True)
+
+        assert sum(histogram.snapshot()['samples'][0][1]['counts']) == 2
+        assert errors.value == 1
+
+    def test_labels_must_match(self):
+        """Test that the wrong number of label values is rejected."""
+        registry = Registry()
+        counter = registry.counter('events_total', "Events", ['kind', 'source'])
+        with pytest.raises(ValueError):
+            counter.labels('only-kind')
+
+    def test_reset_keeps_children(self):
+        """Test that reset zeroes values but keeps children held by callers."""
+        registry = Registry()
+        child = registry.counter('frames_total', "Frames", ['camera']).labels('0')
+        child.inc(3)
+        registry.reset()
+        child.inc()
+        assert registry.snapshot()['frames_total']['samples'] == [[['0'], 1.0]]
+
+
+class TestExporter:
+    """Test cases for merging snapshots of several processes."""
+
+    def test_counters_are_summed_across_processes(self, tmp_path):
+        """Test that another process's snapshot is added to this one's."""
+        registry = Registry()
+        registry.counter('frames_total', "Frames", ['camera']).labels('0').inc(2)
+        registry.gauge('queue_depth', "Queued jobs").set(4)
+
+        other = Registry()
+        other.counter('frames_total', "Frames", ['camera']).labels('0').inc(5)
+        other.gauge('queue_depth', "Queued jobs").set(7)
+        # A pid that has exited: its counters still count, its gauges do not
+        with open(tmp_path / 'metrics-999999999.json', 'w') as out:
+            json.dump({'pid': 999999999, 'metrics': other.snapshot()}, out)
+
+        text = render_prometheus(registry, directory=str(tmp_path))
+        assert 'frames_total{camera="0"} 7' in text
+        assert f'queue_depth{{pid="{os.getpid()}"}} 4' in text
+        assert 'pid="999999999"' not in text
+
+
+class TestSamplingProfiler:
+    """Test cases for the sampling profiler."""
+
+    def test_busy_function_is_sampled(self):
+        """Test that a function running in another thread appears in the stacks."""
+        stop = threading.Event()
+
+        def busy_loop():
+            while not stop.is_set():
+                sum(range(1000))
+
+        worker = threading.Thread(target=busy_loop, name="busy")
+        profiler = SamplingProfiler(interval=0.002)
+        worker.start()
+        profiler.start()
+        time.sleep(0.2)
+        profiler.stop()
+        stop.set()
+        worker.join()
+
+        assert profiler.samples > 0
+        assert 'test_telemetry.py:busy_loop' in profiler.folded()
+        assert any(line.startswith('busy;') for line in profiler.folded().splitlines())
@@ -0,0 +1,370 @@
+"""
+Tests for the Flask web API.
+"""
+
+import gzip
+import math
+import os
+import sys
+import socket
+import time
+
+# Add src to Python path so we can import our modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../src/python'))
+
+from data_storage.database import Database
+from web_api.app import create_app
+from web_api.event_hub import EventHub, MetricsPublisher
+from web_api.sse_server import SSEServer
+
+
+def sample_metrics(timestamp, **extra):
+    metrics = {
+        'timestamp': timestamp,
+        'volume_change': 1.5,
+        'surface_activity': 2.5,
+        'bubble_count': 3,
+        'texture_variance': 4.5,
+    }
+    metrics.update(extra)
+    return metrics
+
+
+def make_client(tmp_path):
+    db = Database(str(tmp_path / "test.db"))
+    app = create_app(db)
+    return db, app, app.test_client()
+
+
+class TestResponseCache:
+    """Test cases for cached, ETag-aware API responses."""
+
+    def test_unchanged_poll_returns_304(self, tmp_path):
+        """Test that a poll with the current ETag is answered with 304."""
+        db, app, client = make_client(tmp_path)
+        db.store_image_metrics(sample_metrics(time.time()))
+
+        first = client.get('/api/image-metrics?hours=24')
+        assert first.status_code == 200
+        etag = first.headers['ETag']
+        assert first.headers['Last-Modified']
+
+        second = client.get('/api/image-metrics?hours=24', headers={'If-None-Match': etag})
+        assert second.status_code == 304
+        stats = app.extensions['response_cache'].get_stats()
+        assert stats['hits'] == 1
+        assert stats['not_modified'] == 1
+
+    def test_cache_hit_skips_database(self, tmp_path, monkeypatch):
+        """Test that repeated polls do not query the database."""
+        db, app, client = make_client(tmp_path)
+        db.store_image_metrics(sample_metrics(time.time()))
+        client.get('/api/current-status')
+
+        def fail(*args, **kwargs):
+            raise AssertionError("database queried")
+
+        monkeypatch.setattr(db, 'get_latest_image_metrics', fail)
+        monkeypatch.setattr(db, 'get_latest_sensor_data', fail)
+        assert client.get('/api/current-status').status_code == 200
+
+    def test_writes_invalidate_cached_results(self, tmp_path):
+        """Test that new metrics produce a fresh response and ETag."""
+        db, app, client = make_client(tmp_path)
+        db.store_image_metrics(sample_metrics(time.time()))
+        first = client.get('/api/image-metrics')
+
+        db.store_image_metrics(sample_metrics(time.time()))
+        second = client.get('/api/image-metrics', headers={'If-None-Match': first.headers['ETag']})
+        assert second.status_code == 200
+        assert len(second.get_json()) == 2
+        assert second.headers['ETag'] != first.headers['ETag']
+
+    def test_current_status_reads_latest_rows(self, tmp_path):
+        """Test that current status reports the newest readings."""
+        db, app, client = make_client(tmp_path)
+        now = time.time()
+        db.store_sensor_data({'timestamp': now - 10, 'temperature': 24.0, 'humidity': 60.0})
+        db.store_sensor_data({'timestamp': now, 'temperature': 26.0, 'humidity': 65.0})
+        db.store_image_metrics(sample_metrics(now, bubble_count=9))
+
+        status = client.get('/api/current-status').get_json()
+        assert status['temperature'] == 26.0
+        assert status['bubble_count'] == 9
+
+
+class TestDeltaQueries:
+    """Test cases for cursor-based incremental metric queries."""
+
+    def test_after_id_returns_only_new_rows(self, tmp_path):
+        """Test that a poll with after_id returns rows written since, oldest first."""
+        db, app, client = make_client(tmp_path)
+        now = time.time()
+        for offset in range(3):
+            db.store_image_metrics(sample_metrics(now + offset))
+
+        first = client.get('/api/image-metrics?after_id=0').get_json()
+        assert [row['id'] for row in first['rows']] == [1, 2, 3]
+        assert first['last_id'] == 3
+        assert not first['has_more']
+
+        db.store_image_metrics(sample_metrics(now + 3))
+        delta = client.get(f"/api/image-metrics?after_id={first['last_id']}").get_json()
+        assert [row['id'] for row in delta['rows']] == [4]
+
+        empty = client.get('/api/image-metrics?after_id=4').get_json()
+        assert empty == {'rows': [], 'last_id': 4, 'has_more': False}
+
+    def test_limit_reports_more_rows(self, tmp_path):
+        """Test that hitting the limit sets has_more so clients page forward."""
+        db, app, client = make_client(tmp_path)
+        for offset in range(5):
+            db.store_image_metrics(sample_metrics(1000.0 + offset))
+
+        page = client.get('/api/image-metrics?after_id=0&limit=2').get_json()
+        assert page['has_more']
+        assert page['last_id'] == 2
+
+    def test_since_filters_by_timestamp(self, tmp_path):
+        """Test the timestamp cursor on both metric endpoints."""
+        db, app, client = make_client(tmp_path)
+        for offset in range(4):
+            db.store_image_metrics(sample_metrics(1000.0 + offset))
+            db.store_sensor_data({'timestamp': 1000.0 + offset, 'temperature': 20.0 + offset,
+                                  'humidity': 50.0})
+
+        rows = client.get('/api/image-metrics?since=1001').get_json()['rows']
+        assert [row['timestamp'] for row in rows] == [1002.0, 1003.0]
+        rows = client.get('/api/sensor-data?since=1002').get_json()['rows']
+        assert [row['temperature'] for row in rows] == [23.0]
+
+    def test_empty_since_window_returns_newest_id(self, tmp_path):
+        """Test that an empty time window still hands out a cursor past the older rows."""
+        db, app, client = make_client(tmp_path)
+        for offset in range(3):
+            db.store_image_metrics(sample_metrics(1000.0 + offset))
+
+        empty = client.get('/api/image-metrics?since=5000').get_json()
+        assert empty == {'rows': [], 'last_id': 3, 'has_more': False}
+        (tmp_path / "fresh").mkdir()
+        fresh = make_client(tmp_path / "fresh")[2].get('/api/image-metrics?since=0').get_json()
+        assert fresh['last_id'] == 0
+
+
+
+def read_until(sock, marker, timeout=5.0):
+    sock.settimeout(timeout)
+    data = b''
+    while marker not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+class TestLiveUpdates:
+    """Test cases for the event hub and the SSE push server."""
+
+    def test_hub_fans_out_serialized_events(self):
+        """Test that one publish reaches every subscriber with the same frame."""
+        hub = EventHub()
+        received = []
+        hub.subscribe(received.append)
+        hub.subscribe(received.append)
+
+        event = hub.publish('metrics', {'volume_change': 1.5})
+        assert len(received) == 2
+        assert received[0].frame is received[1].frame
+        assert event.frame == b'id: 1\nevent: metrics\ndata: {"volume_change": 1.5}\n\n'
+
+    def test_hub_replays_after_last_event_id(self):
+        """Test that reconnecting clients can catch up from the history."""
+        hub = EventHub(history=2)
+        for value in range(3):
+            hub.publish('metrics', {'value': value})
+        assert [event.id for event in hub.replay(1)] == [2, 3]
+        assert hub.replay(3) == []
+
+    def test_committed_rows_are_published_with_ids(self, tmp_path):
+        """Test that metrics events are the committed rows, id and source included."""
+        db = Database(str(tmp_path / "test.db"), write_behind=True, flush_interval=60.0)
+        db.store_image_metrics(sample_metrics(1000.0, source_id='tray-0'))
+        db.flush(timeout=5.0)
+        hub = EventHub()
+        received = []
+        hub.subscribe(received.append)
+        MetricsPublisher(db, hub)
+
+        db.store_image_metrics(sample_metrics(1001.0, source_id='tray-0'))
+        db.store_image_metrics(sample_metrics(1001.0, source_id='tray-1'))
+        assert received == []
+        db.flush(timeout=5.0)
+
+        assert [(event.data['id'], event.data['source_id']) for event in received] == \
+            [(2, 'tray-0'), (3, 'tray-1')]
+        db.close()
+
+    def test_sse_server_streams_events(self):
+        """Test that connected clients receive published events."""
+        hub = EventHub()
+        server = SSEServer(hub, host='127.0.0.1', port=0)
+        server.start()
+        try:
+            clients = [socket.create_connection(('127.0.0.1', server.port)) for _ in range(3)]
+            for client in clients:
+                client.sendall(b"GET /api/events HTTP/1.1\r\nHost: localhost\r\n\r\n")
+                assert b'text/event-stream' in read_until(client, b'retry: 3000\n\n')
+            deadline = time.time() + 5
+            while server.get_stats()['clients'] < 3 and time.time() < deadline:
+                time.sleep(0.01)
+
+            hub.publish('metrics', {'volume_change': 2.0})
+            for client in clients:
+                assert b'event: metrics' in read_until(client, b'\n\n')
+                client.close()
+        finally:
+            server.stop()
+
+    def test_sse_server_rejects_other_paths(self):
+        """Test that only the events path is served."""
+        server = SSEServer(EventHub(), host='127.0.0.1', port=0)
+        server.start()
+        try:
+            client = socket.create_connection(('127.0.0.1', server.port))
+            client.sendall(b"GET /other HTTP/1.1\r\n\r\n")
+            assert read_until(client, b'\r\n\r\n').startswith(b'HTTP/1.1 404')
+            client.close()
+        finally:
+            server.stop()
+
+
+class TestChartData:
+    """Test cases for the decimated chart data endpoint."""
+
+    def test_points_are_bounded(self, tmp_path):
+        """Test that the response never exceeds the requested point count."""
+        db, app, client = make_client(tmp_path)
+        now = time.time()
+        db.store_image_metrics_batch([
+            sample_metrics(now - 3000 + index, volume_change=float(index % 17))
+            for index in range(3000)
+        ])
+
+        data = client.get('/api/chart-data?hours=1&points=400&metric=volume_change').get_json()
+        assert data['resolution'] == 0
+        assert data['source_points'] == 3000
+        assert len(data['points']) == 400
+        timestamps = [point[0] for point in data['points']]
+        assert timestamps == sorted(timestamps)
+
+        # Fewer points than the raw budget allows switches to minute rollups
+        data = client.get('/api/chart-data?hours=1&points=20&method=minmax').get_json()
+        assert data['resolution'] == 60
+        assert len(data['points']) <= 20
+
+    def test_invalid_metric_is_rejected(self, tmp_path):
+        """Test that unknown metrics produce a 400 error."""
+        db, app, client = make_client(tmp_path)
+        response = client.get('/api/chart-data?metric=size')
+        assert response.status_code == 400
+        assert response.get_json()['error']['details']['field'] == 'metric'
+
+
+class TestExportEndpoint:
+    """Test cases for the bulk export endpoint."""
+
+    def test_csv_download(self, tmp_path):
+        """Test that the export is a compressed CSV attachment."""
+        db, app, client = make_client(tmp_path)
+        db.store_image_metrics_batch([sample_metrics(1000.0 + index) for index in range(5)])
+
+        response = client.get('/api/export/image-metrics?start=1000&end=1003')
+        assert response.status_code == 200
+        assert 'attachment' in response.headers['Content-Disposition']
+        assert len(gzip.decompress(response.data).decode().splitlines()) == 4
+
+    def test_npz_download(self, tmp_path):
+        """Test that columnar formats are served as files."""
+        db, app, client = make_client(tmp_path)
+        db.store_image_metrics_batch([sample_metrics(1000.0 + index) for index in range(5)])
+        response = client.get('/api/export/image-metrics?format=npz&start=0')
+        assert response.status_code == 200
+        assert response.data[:2] == b'PK'
+        response.close()
+
+    def test_unknown_format(self, tmp_path):
+        """Test that unsupported formats return 400."""
+        db, app, client = make_client(tmp_path)
+        assert client.get('/api/export/image-metrics?format=xml').status_code == 400
+        assert client.get('/api/export/sessions').status_code == 400
+
+    def test_session_filter_needs_session_column(self, tmp_path):
+        """Test that sensor data cannot be filtered by session."""
+        db, app, client = make_client(tmp_path)
+        for fmt in ('csv', 'npz'):
+            response = client.get(f'/api/export/sensor-data?session_id=1&format={fmt}')
+            assert response.status_code == 400
+            assert response.get_json()['error']['details']['field'] == 'session_id'
+        assert client.get('/api/export/sensor-data?start=0').status_code == 200
+
+
+class TestSessionPrediction:
+    """Test cases for the growth prediction endpoint."""
+
+    def test_prediction_follows_new_data(self, tmp_path):
+        """Test that the prediction appears once enough of the rise is stored."""
+        db, app, client = make_client(tmp_path)
+        session_id = db.create_session('First Rise')
+        start = time.time() - 10 * 3600
+
+        data = client.get(f'/api/sessions/{session_id}/prediction').get_json()
+        assert data['status'] == 'insufficient_data'
+
+        db.store_image_metrics_batch([
+            sample_metrics(start + minute * 60, session_id=session_id,
+                           area_change=120.0 / (1 + math.exp(-(minute / 60 - 4))))
+            for minute in range(0, 600, 5)
+        ])
+        data = client.get(f'/api/sessions/{session_id}/prediction?target=60').get_json()
+        assert data['status'] == 'fitted'
+        assert data['metric'] == 'area_change'
+        assert abs(data['capacity'] - 120) < 6
+        assert abs(data['inflection_time'] - (start + 4 * 3600)) < 600
+        assert data['target_time'] < data['peak_time']
+
+    def test_unknown_session_and_model(self, tmp_path):
+        """Test that unknown sessions and models are rejected."""
+        db, app, client = make_client(tmp_path)
+        assert client.get('/api/sessions/99/prediction').status_code == 404
+        session_id = db.create_session('First Rise')
+        response = client.get(f'/api/sessions/{session_id}/prediction?model=cubic')
+        assert response.status_code == 400
+        assert response.get_json()['error']['details']['field'] == 'model'
+
+
+class TestMetricsEndpoint:
+    """Test cases for the Prometheus metrics endpoint."""
+
+    def test_request_latency_is_exported(self, tmp_path, monkeypatch):
+        """Test that handled requests show up in the Prometheus text."""
+        monkeypatch.delenv('FERMENTATION_TELEMETRY_DIR', raising=False)
+        db, app, client = make_client(tmp_path)
+        client.get('/api/image-metrics?hours=24')
+
+        response = client.get('/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        text = response.get_data(as_text=True)
+        assert '# TYPE http_request_seconds histogram' in text
+        assert ('http_request_seconds_count{endpoint="/api/image-metrics",method="GET"}' in text)
+        assert 'http_requests_total{endpoint="/api/image-metrics",method="GET",status="200"}' in text
+
+    def test_profile_requires_profiler(self, tmp_path, monkeypatch):
+        """Test that /debug/profile is not found unless profiling is enabled."""
+        monkeypatch.delenv('FERMENTATION_PROFILE', raising=False)
+        db, app, client = make_client(tmp_path)
+
+        response = client.get('/debug/profile')
+        assert response.status_code == 404
+        assert response.get_json()['error']['code'] == 'RESOURCE_NOT_FOUND'